@@ -40,19 +40,32 @@ def load_pretrained(path, device="cpu"):
 
 # ====== 3. Инференс ======
 @torch.inference_mode()
-def predict(texts, tok, mdl, max_len=128, batch_size=32, device="cpu"):
+def predict(texts, tok, mdl, max_len=128, batch_size=32, device="cpu", fp16=False):
+    """
+    Тексты токенизируются один раз и сортируются по длине: в батч попадают
+    клаузы близкой длины, и padding до максимума батча почти ничего не стоит.
+    fp16=True на CUDA включает autocast в float16. Порядок ответа — как у texts.
+    """
     mdl.eval()
+    enc_all = tok(texts, truncation=True, max_length=max_len)
+    order = np.argsort([len(ids) for ids in enc_all["input_ids"]], kind="stable")
+    use_fp16 = fp16 and str(device).startswith("cuda")
     preds_all, probs_all = [], []
     for i in range(0, len(texts), batch_size):
-        batch = texts[i:i+batch_size]
-        enc = tok(batch, truncation=True, padding=True, max_length=max_len, return_tensors="pt")
+        idx = order[i:i+batch_size]
+        enc = tok.pad({"input_ids": [enc_all["input_ids"][j] for j in idx],
+                       "attention_mask": [enc_all["attention_mask"][j] for j in idx]},
+                      return_tensors="pt")
         input_ids = enc["input_ids"].to(device)
         attention_mask = enc["attention_mask"].to(device)
-        logits = mdl(input_ids=input_ids, attention_mask=attention_mask)
+        with torch.autocast(device_type="cuda", dtype=torch.float16, enabled=use_fp16):
+            logits = mdl(input_ids=input_ids, attention_mask=attention_mask)
         if isinstance(logits, tuple):
             logits = logits[0]
-        probs = torch.softmax(logits, dim=-1).cpu().numpy()    # [B,13,4]
-        preds = probs.argmax(-1)                               # [B,13]
+        probs = torch.softmax(logits.float(), dim=-1).cpu().numpy()    # [B,13,4]
+        preds = probs.argmax(-1)                                       # [B,13]
         preds_all.append(preds)
         probs_all.append(probs)
-    return np.vstack(preds_all), np.vstack(probs_all)
+    # возвращаем исходный порядок текстов
+    inverse = np.argsort(order)
+    return np.vstack(preds_all)[inverse], np.vstack(probs_all)[inverse]
@@ -1,6 +1,8 @@
 """
 ETL скрипт для загрузки JSON данных в PostgreSQL
 """
+import csv
+import io
 import json
 import os
 import sys
@@ -27,6 +29,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Колонки reviews в порядке строк для COPY
+REVIEW_COPY_COLUMNS = (
+    'review_id', 'product_id', 'review_text', 'review_date', 'url', 'parsed_at',
+    'bank_name', 'rating', 'tonality', 'validation', 'is_valid'
+)
+# Сколько строк отправлять одним COPY (все порции — в одной транзакции)
+COPY_CHUNK_SIZE = 10000
+
 
 class ReviewETL:
     """ETL класс для загрузки отзывов из JSON в PostgreSQL"""
@@ -196,12 +206,14 @@ class ReviewETL:
         
         return True
     
-    def load_reviews_from_json(self, json_file_path: str) -> int:
+    def load_reviews_from_json(self, json_file_path: str, use_copy: bool = False) -> int:
         """
         Загрузка отзывов из JSON файла
         
         Args:
             json_file_path: Путь к JSON файлу
+            use_copy: Грузить отзывы через COPY FROM STDIN (psycopg2) одной транзакцией
+                вместо построчных INSERT через ORM
             
         Returns:
             int: Количество загруженных отзывов
@@ -223,6 +235,9 @@ class ReviewETL:
             self.stats['errors'] += 1
             return 0
         
+        if use_copy:
+            return self._copy_reviews(json_file_path, reviews_data)
+        
         loaded_count = 0
         session = self.SessionLocal()
         
@@ -297,6 +312,109 @@ class ReviewETL:
         
         return loaded_count
     
+    def _copy_reviews(self, json_file_path: str, reviews_data: List[Dict]) -> int:
+        """
+        Массовая загрузка отзывов через COPY FROM STDIN
+        
+        Валидация и парсинг дат — те же, что в построчной загрузке. Продукты
+        кэшируются по имени, дубликаты отсеиваются по множеству review_id
+        (уже лежащих в БД и встреченных в файле). Строки уходят в COPY порциями
+        по COPY_CHUNK_SIZE через соединение сессии, поэтому продукты и отзывы
+        фиксируются одним коммитом.
+        
+        Args:
+            json_file_path: Путь к JSON файлу (для логов)
+            reviews_data: Список записей отзывов
+            
+        Returns:
+            int: Количество загруженных отзывов
+        """
+        loaded_count = 0
+        session = self.SessionLocal()
+        
+        try:
+            product_ids = {}
+            seen_ids = {row[0] for row in session.query(Review.review_id)}
+            
+            cursor = session.connection().connection.cursor()
+            copy_sql = f"COPY reviews ({', '.join(REVIEW_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            
+            def flush():
+                buf.seek(0)
+                cursor.copy_expert(copy_sql, buf)
+                buf.seek(0)
+                buf.truncate()
+            
+            for review_data in reviews_data:
+                try:
+                    # Получение или создание продукта (делаем ДО валидации)
+                    product_name = review_data['product_type']
+                    if product_name in product_ids:
+                        self.stats['products_existing'] += 1
+                    else:
+                        product_ids[product_name] = self.get_or_create_product(session, product_name).id
+                    
+                    # Валидация данных
+                    if not self.validate_review_data(review_data):
+                        self.stats['reviews_skipped'] += 1
+                        continue
+                    
+                    review_date = self.parse_review_date(review_data['review_date'])
+                    parsed_at = self.parse_parsed_at(review_data['parsed_at'])
+                    
+                    unique_review_id = f"{product_name}_{review_data['review_id']}"
+                    if unique_review_id in seen_ids:
+                        self.stats['reviews_skipped'] += 1
+                        logger.debug(f"Пропущен дубликат отзыва {unique_review_id}")
+                        continue
+                    seen_ids.add(unique_review_id)
+                    
+                    writer.writerow((
+                        unique_review_id,
+                        product_ids[product_name],
+                        review_data['review_text'],
+                        review_date.isoformat(),
+                        review_data.get('url'),
+                        parsed_at.isoformat(),
+                        review_data['bank_name'],
+                        review_data['rating'],
+                        review_data['tonality'],
+                        review_data.get('validation'),
+                        review_data.get('is_valid', True)
+                    ))
+                    loaded_count += 1
+                
+                except Exception as e:
+                    logger.error(f"Ошибка обработки отзыва {review_data.get('review_id', 'unknown')}: {e}")
+                    self.stats['errors'] += 1
+                    continue
+                
+                # Порция уходит в COPY вне построчного try: ошибка COPY прерывает файл
+                # и откатывает транзакцию сразу, а не списывается на очередной отзыв
+                if loaded_count % COPY_CHUNK_SIZE == 0:
+                    flush()
+                    logger.info(f"Отправлено в COPY {loaded_count} отзывов из {json_file_path}")
+            
+            if buf.tell():
+                flush()
+            
+            session.commit()
+            self.stats['reviews_loaded'] += loaded_count
+            logger.info(f"Завершена загрузка из {json_file_path} через COPY: {loaded_count} отзывов")
+            
+        except Exception as e:
+            logger.error(f"Критическая ошибка при загрузке из {json_file_path}: {e}")
+            session.rollback()
+            self.stats['errors'] += 1
+            loaded_count = 0
+            
+        finally:
+            session.close()
+        
+        return loaded_count
+    
     def load_all_json_files(self, data_directory: str) -> Dict:
         """
         Загрузка всех JSON файлов из директории
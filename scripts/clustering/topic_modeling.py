@@ -8,9 +8,12 @@
 """
 
 import json
+import orjson
 import numpy as np
 import pandas as pd
 import re
+import matplotlib
+matplotlib.use('Agg')  # графики только сохраняются в файлы
 import matplotlib.pyplot as plt
 import seaborn as sns
 from collections import Counter
@@ -32,6 +35,7 @@ import pyLDAvis
 import pyLDAvis.lda_model
 
 # Для BERTopic
+import torch
 from bertopic import BERTopic
 from sentence_transformers import SentenceTransformer
 from umap import UMAP
@@ -56,7 +60,10 @@ class TopicModeling:
         self.data = None
         self.df = None
         self.processed_texts = None
+        self.sentence_model = None
         self.morph = pymorphy2.MorphAnalyzer()
+        # Кэш токен -> лемма (None, если токен отбрасывается фильтрами)
+        self._lemma_cache = {}
         
         # Загружаем стоп-слова
         try:
@@ -121,17 +128,28 @@ class TopicModeling:
         except LookupError:
             tokens = text.split()
         
-        # Лемматизация и фильтрация
+        # Лемматизация и фильтрация (каждый уникальный токен разбирается один раз)
+        cache = self._lemma_cache
         processed_tokens = []
         for token in tokens:
-            if len(token) > 2 and token not in self.stop_words:
-                # Лемматизация с помощью pymorphy2
-                lemma = self.morph.parse(token)[0].normal_form
-                if lemma not in self.stop_words and len(lemma) > 2:
-                    processed_tokens.append(lemma)
+            if token not in cache:
+                cache[token] = self._lemmatize_token(token)
+            lemma = cache[token]
+            if lemma is not None:
+                processed_tokens.append(lemma)
         
         return ' '.join(processed_tokens)
     
+    def _lemmatize_token(self, token):
+        """Лемма токена или None, если токен или лемма не проходят фильтры"""
+        if len(token) <= 2 or token in self.stop_words:
+            return None
+        # Лемматизация с помощью pymorphy2
+        lemma = self.morph.parse(token)[0].normal_form
+        if lemma in self.stop_words or len(lemma) <= 2:
+            return None
+        return lemma
+    
     def prepare_texts(self):
         """Предобработка всех текстов"""
         print("Предобрабатываем тексты...")
@@ -181,18 +199,23 @@ class TopicModeling:
         
         best_model = None
         best_perplexity = float('inf')
+        total_words = doc_term_matrix.sum()
         
         for n_topics in topics_range:
+            # Online VB с параллельным E-шагом на всех ядрах
             lda_model = LatentDirichletAllocation(
                 n_components=n_topics,
                 random_state=42,
-                max_iter=100,
-                learning_method='batch'
+                max_iter=10,
+                learning_method='online',
+                batch_size=2000,
+                n_jobs=-1
             )
             lda_model.fit(doc_term_matrix)
             
-            perplexity = lda_model.perplexity(doc_term_matrix)
+            # perplexity = exp(-bound / число слов), поэтому считаем bound один раз
             log_likelihood = lda_model.score(doc_term_matrix)
+            perplexity = np.exp(-log_likelihood / total_words)
             
             perplexities.append(perplexity)
             log_likelihoods.append(log_likelihood)
@@ -218,10 +241,10 @@ class TopicModeling:
         ax2.set_title('Log Likelihood vs Количество тем')
         ax2.grid(True)
         
-        plt.tight_layout()
-        plt.savefig('/Users/mishantique/Desktop/Projects/gazprombank_hachaton/reports/clustering/lda_optimization.png', 
-                   dpi=300, bbox_inches='tight')
-        plt.show()
+        fig.tight_layout()
+        fig.savefig('/Users/mishantique/Desktop/Projects/gazprombank_hachaton/reports/clustering/lda_optimization.png', 
+                    dpi=150, bbox_inches='tight')
+        plt.close(fig)
         
         # Анализ лучшей модели
         optimal_topics = best_model.n_components
@@ -254,6 +277,9 @@ class TopicModeling:
         
         topics_info = []
         
+        # Сортируем документы по теме один раз, далее берем непрерывные срезы
+        order, bounds = self._topic_groups(self.df['lda_topic'].to_numpy(), len(model.components_))
+        
         for topic_idx, topic in enumerate(model.components_):
             # Топ слова темы
             top_words_idx = topic.argsort()[-10:][::-1]
@@ -261,12 +287,13 @@ class TopicModeling:
             top_weights = [topic[i] for i in top_words_idx]
             
             # Документы, относящиеся к этой теме
-            topic_docs = self.df[self.df['lda_topic'] == topic_idx]
+            doc_idx = order[bounds[topic_idx]:bounds[topic_idx + 1]]
+            topic_docs = self.df.iloc[doc_idx]
             
             # Наиболее частые типы продуктов в теме
             if len(topic_docs) > 0:
                 top_products = topic_docs['product_type'].value_counts().head(3)
-                avg_confidence = doc_topic_probs[self.df['lda_topic'] == topic_idx, topic_idx].mean()
+                avg_confidence = doc_topic_probs[doc_idx, topic_idx].mean()
             else:
                 top_products = pd.Series(dtype=int)
                 avg_confidence = 0
@@ -291,6 +318,46 @@ class TopicModeling:
             'doc_topic_probs': doc_topic_probs
         }
     
+    @staticmethod
+    def _topic_groups(topic_ids, n_topics, offset=0):
+        """
+        Группировка документов по темам за один проход
+        
+        Args:
+            topic_ids (np.ndarray): Тема каждого документа
+            n_topics (int): Количество тем (после сдвига на offset)
+            offset (int): Сдвиг номеров тем (1 для выбросов BERTopic с темой -1)
+            
+        Returns:
+            tuple: (order, bounds) - документы темы t: order[bounds[t]:bounds[t + 1]]
+        """
+        shifted = np.asarray(topic_ids) + offset
+        order = np.argsort(shifted, kind='stable')
+        bounds = np.searchsorted(shifted[order], np.arange(n_topics + 1))
+        return order, bounds
+    
+    def get_sentence_model(self):
+        """Модель эмбеддингов, загружается один раз на весь объект"""
+        if self.sentence_model is None:
+            self.sentence_model = SentenceTransformer('cointegrated/rubert-tiny2')
+        return self.sentence_model
+    
+    def encode_texts(self, texts, batch_size=64):
+        """
+        Эмбеддинги текстов без построения графа градиентов
+        
+        Args:
+            texts (list): Тексты для кодирования
+            batch_size (int): Размер батча
+            
+        Returns:
+            np.ndarray: Матрица эмбеддингов
+        """
+        model = self.get_sentence_model()
+        with torch.inference_mode():
+            return model.encode(texts, batch_size=batch_size, show_progress_bar=True,
+                                convert_to_numpy=True)
+    
     def bertopic_modeling(self):
         """
         Тематическое моделирование с использованием BERTopic
@@ -301,7 +368,8 @@ class TopicModeling:
         print("Выполняем BERTopic моделирование...")
         
         # Настройка компонентов BERTopic
-        sentence_model = SentenceTransformer('cointegrated/rubert-tiny2')
+        sentence_model = self.get_sentence_model()
+        embeddings = self.encode_texts(self.processed_texts)
         
         umap_model = UMAP(
             n_neighbors=15,
@@ -333,7 +401,7 @@ class TopicModeling:
         )
         
         # Обучаем модель
-        topics, probs = topic_model.fit_transform(self.processed_texts)
+        topics, probs = topic_model.fit_transform(self.processed_texts, embeddings)
         
         # Добавляем результаты в DataFrame
         self.df['bertopic_topic'] = topics
@@ -355,6 +423,11 @@ class TopicModeling:
         topic_info = model.get_topic_info()
         topics_info = []
         
+        # Сдвиг на 1, чтобы выбросы (-1) попали в группу 0
+        bertopic_topics = self.df['bertopic_topic'].to_numpy()
+        n_groups = int(bertopic_topics.max()) + 2 if len(bertopic_topics) else 0
+        order, bounds = self._topic_groups(bertopic_topics, n_groups, offset=1)
+        
         for _, row in topic_info.iterrows():
             topic_id = row['Topic']
             
@@ -363,7 +436,7 @@ class TopicModeling:
                 
             # Получаем информацию о теме
             topic_words = model.get_topic(topic_id)
-            topic_docs = self.df[self.df['bertopic_topic'] == topic_id]
+            topic_docs = self.df.iloc[order[bounds[topic_id + 1]:bounds[topic_id + 2]]]
             
             # Наиболее частые типы продуктов в теме
             if len(topic_docs) > 0:
@@ -467,17 +540,19 @@ class TopicModeling:
         ax4.set_xlabel('Уверенность')
         ax4.set_ylabel('Частота')
         
-        plt.tight_layout()
-        plt.savefig('/Users/mishantique/Desktop/Projects/gazprombank_hachaton/reports/clustering/topic_modeling_comparison.png', 
-                   dpi=300, bbox_inches='tight')
-        plt.show()
+        fig.tight_layout()
+        fig.savefig('/Users/mishantique/Desktop/Projects/gazprombank_hachaton/reports/clustering/topic_modeling_comparison.png', 
+                    dpi=150, bbox_inches='tight')
+        plt.close(fig)
     
     def save_results(self, lda_results, bertopic_results, output_path):
         """Сохранение результатов тематического моделирования"""
         print(f"Сохраняем результаты в {output_path}...")
         
-        # Сохраняем DataFrame с результатами
-        self.df.to_json(output_path, orient='records', indent=2)
+        # Сохраняем DataFrame с результатами (компактный JSON одной записью)
+        records = self.df.to_dict(orient='records')
+        with open(output_path, 'wb') as f:
+            f.write(orjson.dumps(records, option=orjson.OPT_SERIALIZE_NUMPY))
         
         # Сохраняем подробный отчет
         summary_path = output_path.replace('.json', '_summary.txt')
@@ -8,19 +8,92 @@
 """
 
 import pandas as pd
-import json
+import orjson
 import os
+import io
+import hashlib
+import sqlite3
+import zstandard
 import argparse
+import asyncio
 from pathlib import Path
-from label_clauses_ollama import OllamaClauseLabeler, create_summary_stats
+from typing import Tuple
+from label_clauses_ollama import (OllamaClauseLabeler, PROMPT_VERSION, DEFAULT_MODEL, run_async,
+                                  empty_summary_counts, update_summary_counts, merge_summary_counts,
+                                  finalize_summary_stats)
 import logging
 import time
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Колонки CSV, которые использует разметчик
+CLAUSE_COLUMNS = ['review_id', 'clause_id', 'clause']
+
+# Имена файлов батчей: batch_0000.jsonl.zst, batch_0001.jsonl.zst, ...
+BATCH_PREFIX = "batch_"
+BATCH_SUFFIX = ".jsonl.zst"
+
+# Уровень сжатия файлов батчей (быстрый, близкий к скорости копирования)
+BATCH_ZSTD_LEVEL = 3
+
+# Размер буфера записи итогового файла
+MERGE_WRITE_BUFFER = 16 * 1024 * 1024
+
+# Как часто сбрасывать прогресс на диск
+PROGRESS_FLUSH_BATCHES = 10
+PROGRESS_FLUSH_SECONDS = 30
+
+# Поля результата, которые зависят только от текста клаузы и контекста
+CACHED_FIELDS = ('topics', 'sentiments', 'has_full_context')
+
+def tmp_path(path: Path) -> Path:
+    """Временный файл рядом с path для атомарной записи через os.replace"""
+    return path.with_name(path.name + ".tmp")
+
+class ClauseLabelCache:
+    def __init__(self, db_path: Path):
+        """
+        Кэш результатов разметки на диске (SQLite), адресуемый по содержимому
+        
+        Args:
+            db_path: Путь к файлу базы кэша
+        """
+        self.conn = sqlite3.connect(str(db_path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS clause_cache (key TEXT PRIMARY KEY, result_json BLOB)"
+        )
+    
+    def get_many(self, keys: list) -> dict:
+        """Поиск результатов по списку ключей, возвращает {ключ: результат}"""
+        found = {}
+        unique_keys = list(set(keys))
+        # Ограничение SQLite на число параметров в запросе
+        for i in range(0, len(unique_keys), 500):
+            chunk = unique_keys[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT key, result_json FROM clause_cache WHERE key IN ({placeholders})", chunk
+            )
+            for key, result_json in rows:
+                found[key] = orjson.loads(result_json)
+        return found
+    
+    def put_many(self, items: dict):
+        """Сохранение результатов {ключ: результат} одной транзакцией"""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO clause_cache (key, result_json) VALUES (?, ?)",
+            [(key, orjson.dumps(result)) for key, result in items.items()]
+        )
+        self.conn.commit()
+    
+    def close(self):
+        self.conn.close()
+
 class BatchClauseProcessor:
-    def __init__(self, input_file: str, output_dir: str, model_name: str = "llama3.1:8b-instruct-q8_0"):
+    def __init__(self, input_file: str, output_dir: str, model_name: str = DEFAULT_MODEL,
+                 inner_concurrency: int = 4, micro_batch_size: int = 4):
         """
         Инициализация пакетного процессора
         
@@ -28,6 +101,8 @@ class BatchClauseProcessor:
             input_file: Путь к исходному CSV файлу
             output_dir: Директория для сохранения результатов
             model_name: Название модели Ollama
+            inner_concurrency: Количество одновременных запросов к Ollama внутри батча
+            micro_batch_size: Сколько клауз одного отзыва отправлять в LLM одним запросом
         """
         self.input_file = input_file
         self.output_dir = Path(output_dir)
@@ -39,96 +114,287 @@ class BatchClauseProcessor:
         self.batches_dir.mkdir(exist_ok=True)
         
         # Инициализируем классификатор
-        self.labeler = OllamaClauseLabeler(model_name)
+        self.labeler = OllamaClauseLabeler(model_name, max_concurrency=inner_concurrency,
+                                           micro_batch_size=micro_batch_size)
         
         # Файлы для отслеживания прогресса
-        self.progress_file = self.output_dir / "progress.json"
+        self.progress_file = self.output_dir / "progress.log"
         self.final_output = self.output_dir / "clauses_labeled.json"
         self.stats_output = self.output_dir / "clauses_labeled_stats.json"
+        
+        # Кэш результатов LLM между батчами и запусками
+        self.cache = ClauseLabelCache(self.output_dir / "clause_cache.db")
+        
+        # Буферизация записи прогресса
+        self._progress_log = None
+        self._unsaved_progress = 0
+        self._last_progress_flush = time.monotonic()
+        
+        # Готовые к объединению строки батчей, обработанных в текущем запуске (имя файла -> JSON)
+        self._batch_payloads = {}
     
     def load_progress(self) -> dict:
-        """Загрузка информации о прогрессе"""
+        """
+        Загрузка информации о прогрессе из журнала
+        
+        Returns:
+            Словарь {номер батча: {"size": клауз в батче, "stats": счетчики статистики}}
+            для завершенных батчей
+        """
+        done_batches = {}
         if self.progress_file.exists():
-            with open(self.progress_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return {"processed_batches": [], "last_batch_idx": -1, "total_processed": 0}
+            with open(self.progress_file, 'rb') as f:
+                for line in f:
+                    try:
+                        entry = orjson.loads(line)
+                    except orjson.JSONDecodeError:
+                        # Недописанная последняя строка после аварийной остановки
+                        continue
+                    done_batches[entry.pop("batch_idx")] = entry
+        return done_batches
+    
+    def save_progress(self, batch_idx: int, batch_size: int, batch_counts: dict):
+        """
+        Запись завершенного батча в журнал прогресса (одна строка JSON на батч)
+        
+        Вместе с батчем сохраняются его счетчики статистики, поэтому итоговая
+        статистика собирается из журнала без повторного чтения результатов.
+        
+        Журнал только дописывается, буфер сбрасывается на диск не чаще,
+        чем раз в PROGRESS_FLUSH_BATCHES батчей или PROGRESS_FLUSH_SECONDS секунд.
+        Готовые батчи не пересчитываются при потере последних записей прогресса,
+        так как их файлы уже лежат на диске.
+        
+        Args:
+            batch_idx: Номер батча
+            batch_size: Количество клауз в батче
+            batch_counts: Счетчики статистики батча
+        """
+        if self._progress_log is None:
+            self._progress_log = open(self.progress_file, 'ab')
+        entry = {"batch_idx": batch_idx, "size": batch_size, "stats": batch_counts}
+        self._progress_log.write(orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE))
+        
+        self._unsaved_progress += 1
+        if (self._unsaved_progress >= PROGRESS_FLUSH_BATCHES
+                or time.monotonic() - self._last_progress_flush >= PROGRESS_FLUSH_SECONDS):
+            self.flush_progress()
+    
+    def flush_progress(self):
+        """Сброс буфера журнала прогресса на диск"""
+        if self._progress_log is not None:
+            self._progress_log.flush()
+        self._unsaved_progress = 0
+        self._last_progress_flush = time.monotonic()
     
-    def save_progress(self, progress: dict):
-        """Сохранение информации о прогрессе"""
-        with open(self.progress_file, 'w', encoding='utf-8') as f:
-            json.dump(progress, f, ensure_ascii=False, indent=2)
+    def close_progress(self):
+        """Закрытие журнала прогресса"""
+        if self._progress_log is not None:
+            self._progress_log.close()
+            self._progress_log = None
     
-    def process_batch(self, clauses_df: pd.DataFrame, batch_idx: int, 
-                     start_idx: int, batch_size: int) -> str:
+    def batch_path(self, batch_idx: int) -> Path:
+        """Путь к файлу результатов батча (JSON Lines, одна клауза на строку, сжатие zstd)"""
+        return self.batches_dir / f"{BATCH_PREFIX}{batch_idx:04d}{BATCH_SUFFIX}"
+    
+    def cache_key(self, clause: str, review_id) -> str:
+        """Ключ кэша: модель, версия промпта, контекст отзыва и текст клаузы"""
+        context = self.labeler.get_context_section(review_id) or ""
+        payload = f"{self.model_name}|{PROMPT_VERSION}|{context}|{clause}"
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+    
+    async def process_batch(self, batch_df: pd.DataFrame, batch_idx: int) -> Tuple[dict, int]:
         """
         Обработка одного батча
         
+        Батч, в котором есть клаузы с ошибкой LLM, на диск не сохраняется: файл батча
+        считается готовым результатом при возобновлении, а такой батч нужно обработать
+        заново. Успешно размеченные клаузы уже лежат в кэше, поэтому в повторном
+        запуске в LLM уходят только клаузы с ошибкой.
+        
         Args:
-            clauses_df: DataFrame с клаузами
+            batch_df: Срез DataFrame с клаузами батча
             batch_idx: Номер батча
-            start_idx: Начальный индекс
-            batch_size: Размер батча
             
         Returns:
-            Путь к файлу с результатами батча
+            (счетчики статистики батча, количество клауз с ошибкой LLM)
         """
-        batch_file = self.batches_dir / f"batch_{batch_idx:04d}.json"
+        batch_file = self.batch_path(batch_idx)
+        
+        logger.info(f"Обрабатываем батч {batch_idx} (индексы {batch_df.index[0]}-{batch_df.index[-1]})")
+        
+        # Ищем уже размеченные клаузы с тем же текстом и контекстом
+        keys = [self.cache_key(clause, review_id)
+                for clause, review_id in zip(batch_df['clause'], batch_df['review_id'])]
+        cached = self.cache.get_many(keys)
+        
+        # В LLM отправляем только по одной клаузе на каждый новый ключ
+        miss_positions = {}
+        for pos, key in enumerate(keys):
+            if key not in cached and key not in miss_positions:
+                miss_positions[key] = pos
+        
+        if miss_positions:
+            miss_df = batch_df.iloc[list(miss_positions.values())]
+            # Запросы к Ollama идут в общем цикле событий вместе с остальными батчами
+            # Общий прогресс ведется по батчам, прогресс-бар на каждый батч не нужен
+            llm_results = await self.labeler.process_clauses_batch_async(miss_df, 0, len(miss_df),
+                                                                         show_progress=False)
+            new_entries = {}
+            for key, result in zip(miss_positions, llm_results):
+                labels = {field: result[field] for field in CACHED_FIELDS if field in result}
+                # Результаты, завершившиеся ошибкой, не кэшируем: в следующем запуске
+                # клауза снова уйдет в LLM
+                if result.get('llm_error'):
+                    labels['llm_error'] = True
+                else:
+                    new_entries[key] = labels
+                cached[key] = labels
+            if new_entries:
+                self.cache.put_many(new_entries)
+        
+        logger.info(f"Батч {batch_idx}: из кэша {len(keys) - len(miss_positions)}/{len(keys)} клауз")
+        
+        results = []
+        for key, clause_id, review_id, clause in zip(
+                keys, batch_df['clause_id'], batch_df['review_id'], batch_df['clause']):
+            result = {"clause_id": clause_id, "review_id": review_id, "clause": clause}
+            result.update(cached[key])
+            results.append(result)
+        
+        batch_counts = update_summary_counts(empty_summary_counts(), results)
+        llm_errors = sum(1 for result in results if result.get('llm_error'))
+        if llm_errors:
+            logger.warning(f"Батч {batch_idx}: клауз с ошибкой LLM {llm_errors}, батч не сохраняем")
+            return batch_counts, llm_errors
+        
+        encoded = [orjson.dumps(result, option=orjson.OPT_SERIALIZE_NUMPY) for result in results]
+        
+        # Сохраняем результаты батча атомарно: недописанный файл не будет принят за готовый батч
+        tmp_file = tmp_path(batch_file)
+        with open(tmp_file, 'wb') as raw, \
+                zstandard.ZstdCompressor(level=BATCH_ZSTD_LEVEL).stream_writer(raw) as f:
+            f.write(b'\n'.join(encoded) + b'\n')
+        os.replace(tmp_file, batch_file)
+        
+        # Файл нужен только для возобновления: при объединении используем строки из памяти
+        self._batch_payloads[batch_file.name] = b','.join(encoded)
         
-        # Если батч уже обработан, пропускаем
-        if batch_file.exists():
-            logger.info(f"Батч {batch_idx} уже обработан, пропускаем")
-            return str(batch_file)
-        
-        logger.info(f"Обрабатываем батч {batch_idx} (индексы {start_idx}-{start_idx + batch_size - 1})")
+        logger.info(f"Батч {batch_idx} сохранен в {batch_file}")
+        return batch_counts, 0
+    
+    def merge_batches(self, total_batches: int):
+        """
+        Потоковое объединение батчей в итоговый файл
         
-        # Обрабатываем батч
-        results = self.labeler.process_clauses_batch(clauses_df, start_idx, batch_size)
+        Объединяются только батчи 0..total_batches-1 текущего разбиения: файлы
+        batch_* от прошлых запусков с другим размером батча или входом игнорируются.
+        Каждая строка батча уже является JSON-объектом, поэтому строки дописываются
+        в итоговый массив без повторного разбора и сериализации. Батчи, обработанные
+        в текущем запуске, берутся из памяти; с диска читаются только батчи из прошлых запусков.
         
-        # Сохраняем результаты батча
-        with open(batch_file, 'w', encoding='utf-8') as f:
-            json.dump(results, f, ensure_ascii=False, indent=2)
+        Args:
+            total_batches: Количество батчей в текущем запуске
+        """
+        logger.info("Объединяем результаты всех батчей...")
         
-        logger.info(f"Батч {batch_idx} сохранен в {batch_file}")
-        return str(batch_file)
+        merged_batches = 0
+        tmp_file = tmp_path(self.final_output)
+        with open(tmp_file, 'wb', buffering=MERGE_WRITE_BUFFER) as out:
+            out.write(b'[')
+            for batch_idx in range(total_batches):
+                batch_file = self.batch_path(batch_idx)
+                body = self._batch_payloads.pop(batch_file.name, None)
+                if body is None:
+                    with open(batch_file, 'rb') as raw, \
+                            zstandard.ZstdDecompressor().stream_reader(raw) as f:
+                        body = b','.join(f.read().splitlines())
+                if not body:
+                    continue
+                if merged_batches:
+                    out.write(b',')
+                out.write(body)
+                merged_batches += 1
+            out.write(b']')
+        os.replace(tmp_file, self.final_output)
+        
+        logger.info(f"Объединено {merged_batches} батчей в {self.final_output}")
+    
+    def iter_batch_results(self, batch_files: list):
+        """Последовательное чтение результатов из файлов батчей"""
+        for batch_file in batch_files:
+            with open(batch_file, 'rb') as raw, \
+                    zstandard.ZstdDecompressor().stream_reader(raw) as reader:
+                for line in io.BufferedReader(reader):
+                    yield orjson.loads(line)
     
-    def merge_batches(self, batch_files: list) -> list:
+    async def _run_batches(self, clauses_df: pd.DataFrame, pending: list, done_batches: dict,
+                           total_clauses: int, concurrency: int) -> int:
         """
-        Объединение результатов всех батчей
+        Параллельная обработка батчей с ограничением числа одновременных батчей
         
         Args:
-            batch_files: Список путей к файлам батчей
+            clauses_df: DataFrame с клаузами
+            pending: Список (batch_idx, start_idx, batch_size) необработанных батчей
+            done_batches: Завершенные батчи из журнала (обновляется на месте)
+            total_clauses: Общее количество клауз
+            concurrency: Максимальное количество одновременно обрабатываемых батчей
             
         Returns:
-            Объединенный список результатов
+            Количество батчей, завершившихся ошибкой
         """
-        logger.info("Объединяем результаты всех батчей...")
-        
-        all_results = []
-        for batch_file in batch_files:
-            if os.path.exists(batch_file):
-                with open(batch_file, 'r', encoding='utf-8') as f:
-                    batch_results = json.load(f)
-                    all_results.extend(batch_results)
+        semaphore = asyncio.Semaphore(concurrency)
+        progress_lock = asyncio.Lock()
+        
+        async def run_one(batch_idx: int, start_idx: int, batch_size: int):
+            # Передаем в обработку только срез батча, а не весь DataFrame
+            batch_df = clauses_df.iloc[start_idx:start_idx + batch_size]
+            async with semaphore:
+                batch_counts, llm_errors = await self.process_batch(batch_df, batch_idx)
+            if llm_errors:
+                # Батч не отмечаем готовым: он будет обработан заново в следующем запуске
+                raise RuntimeError(f"клауз с ошибкой LLM: {llm_errors}")
+            
+            # Обновляем прогресс
+            async with progress_lock:
+                done_batches[batch_idx] = {"size": batch_size, "stats": batch_counts}
+                self.save_progress(batch_idx, batch_size, batch_counts)
+                self._total_processed += batch_size
+            
+            logger.info(f"Прогресс: {self._total_processed}/{total_clauses} клауз ({self._total_processed/total_clauses*100:.1f}%)")
         
-        logger.info(f"Объединено {len(all_results)} результатов")
-        return all_results
+        try:
+            outcomes = await asyncio.gather(
+                *(run_one(*batch) for batch in pending), return_exceptions=True
+            )
+        finally:
+            await self.labeler.aclose()
+        
+        failed = 0
+        for (batch_idx, _, _), outcome in zip(pending, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Ошибка при обработке батча {batch_idx}: {outcome}")
+                failed += 1
+        return failed
     
-    def process_all_clauses(self, batch_size: int = 100, max_clauses: int = None):
+    def process_all_clauses(self, batch_size: int = 100, max_clauses: int = None,
+                            concurrency: int = 2):
         """
         Обработка всех клауз с разбивкой на батчи
         
         Args:
             batch_size: Размер одного батча
             max_clauses: Максимальное количество клауз для обработки (None = все)
+            concurrency: Максимальное количество одновременно обрабатываемых батчей
         """
         start_time = time.time()
         
         # Загружаем данные
         logger.info(f"Загружаем данные из {self.input_file}")
-        clauses_df = pd.read_csv(self.input_file)
+        # Читаем только нужные колонки и только первые max_clauses строк
+        clauses_df = pd.read_csv(self.input_file, usecols=CLAUSE_COLUMNS, nrows=max_clauses)
         
         if max_clauses:
-            clauses_df = clauses_df.head(max_clauses)
             logger.info(f"Ограничиваем обработку до {max_clauses} клауз")
         
         total_clauses = len(clauses_df)
@@ -137,64 +403,75 @@ class BatchClauseProcessor:
         logger.info(f"Всего клауз: {total_clauses}")
         logger.info(f"Размер батча: {batch_size}")
         logger.info(f"Всего батчей: {total_batches}")
+        logger.info(f"Параллельных батчей: {concurrency}")
+        
+        # Загружаем прогресс (батчи могут завершаться не по порядку)
+        done_batches = self.load_progress()
+        
+        # Сверяем журнал с файлами батчей одним чтением директории вместо stat() на каждый батч
+        existing_files = {entry.name for entry in os.scandir(self.batches_dir)}
+        missing = [batch_idx for batch_idx in done_batches
+                   if self.batch_path(batch_idx).name not in existing_files]
+        if missing:
+            logger.warning(f"Нет файлов для батчей из журнала, обработаем заново: {sorted(missing)}")
+            for batch_idx in missing:
+                del done_batches[batch_idx]
+        
+        pending = []
+        for batch_idx in range(total_batches):
+            if batch_idx in done_batches:
+                continue
+            start_idx = batch_idx * batch_size
+            current_batch_size = min(batch_size, total_clauses - start_idx)
+            if self.batch_path(batch_idx).name in existing_files:
+                # Файл батча записан, но запись в журнал не успела сброситься на диск.
+                # Файлы прошлых версий скрипта могут содержать клаузы с ошибкой LLM —
+                # такой батч обрабатываем заново
+                batch_results = list(self.iter_batch_results([self.batch_path(batch_idx)]))
+                if not any(result.get('llm_error') for result in batch_results):
+                    batch_counts = update_summary_counts(empty_summary_counts(), batch_results)
+                    done_batches[batch_idx] = {"size": current_batch_size, "stats": batch_counts}
+                    self.save_progress(batch_idx, current_batch_size, batch_counts)
+                    continue
+            pending.append((batch_idx, start_idx, current_batch_size))
         
-        # Загружаем прогресс
-        progress = self.load_progress()
-        start_batch = progress["last_batch_idx"] + 1
-        
-        if start_batch > 0:
-            logger.info(f"Возобновляем работу с батча {start_batch}")
-        
-        batch_files = []
+        self._total_processed = sum(entry["size"] for entry in done_batches.values())
+        if done_batches:
+            logger.info(f"Возобновляем работу, уже обработано батчей: {len(done_batches)}")
         
         try:
-            # Обрабатываем батчи
-            for batch_idx in range(total_batches):
-                start_idx = batch_idx * batch_size
-                current_batch_size = min(batch_size, total_clauses - start_idx)
-                
-                if batch_idx < start_batch:
-                    # Батч уже обработан, добавляем файл в список
-                    batch_file = self.batches_dir / f"batch_{batch_idx:04d}.json"
-                    if batch_file.exists():
-                        batch_files.append(str(batch_file))
-                    continue
-                
-                # Обрабатываем текущий батч
-                batch_file = self.process_batch(clauses_df, batch_idx, start_idx, current_batch_size)
-                batch_files.append(batch_file)
-                
-                # Обновляем прогресс
-                progress["processed_batches"].append(batch_idx)
-                progress["last_batch_idx"] = batch_idx
-                progress["total_processed"] += current_batch_size
-                self.save_progress(progress)
-                
-                logger.info(f"Прогресс: {progress['total_processed']}/{total_clauses} клауз ({progress['total_processed']/total_clauses*100:.1f}%)")
-        
+            failed = run_async(
+                self._run_batches(clauses_df, pending, done_batches, total_clauses, concurrency)
+            )
         except KeyboardInterrupt:
             logger.info("Обработка прервана пользователем. Прогресс сохранен.")
             return
         except Exception as e:
             logger.error(f"Ошибка при обработке: {e}")
             return
+        finally:
+            self.close_progress()
         
-        # Объединяем все результаты
-        all_results = self.merge_batches(batch_files)
+        if failed:
+            logger.error(f"Не удалось обработать батчей: {failed}. Прогресс сохранен, перезапустите обработку.")
+            return
         
-        # Сохраняем итоговый файл
-        with open(self.final_output, 'w', encoding='utf-8') as f:
-            json.dump(all_results, f, ensure_ascii=False, indent=2)
+        # Объединяем все результаты в итоговый файл
+        self.merge_batches(total_batches)
         
-        # Создаем статистику
-        stats = create_summary_stats(all_results)
+        # Создаем статистику из счетчиков, накопленных по батчам
+        counts = empty_summary_counts()
+        for entry in done_batches.values():
+            merge_summary_counts(counts, entry["stats"])
+        stats = finalize_summary_stats(counts)
+        total_labeled = stats["total_clauses"]
         
         end_time = time.time()
         total_time = end_time - start_time
         
         stats["execution_time_seconds"] = total_time
         stats["execution_time_minutes"] = total_time / 60
-        stats["avg_time_per_clause"] = total_time / len(all_results) if all_results else 0
+        stats["avg_time_per_clause"] = total_time / total_labeled if total_labeled else 0
         stats["batch_size"] = batch_size
         stats["total_batches"] = total_batches
         
@@ -203,16 +480,16 @@ class BatchClauseProcessor:
         stats_output = project_root / "reports/labeling/batch_clauses_labeled_stats.json"
         os.makedirs(stats_output.parent, exist_ok=True)
         
-        with open(stats_output, 'w', encoding='utf-8') as f:
-            json.dump(stats, f, ensure_ascii=False, indent=2)
+        with open(stats_output, 'wb') as f:
+            f.write(orjson.dumps(stats, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
         
         # Выводим итоговую статистику
         logger.info("=" * 60)
         logger.info("ОБРАБОТКА ЗАВЕРШЕНА")
         logger.info("=" * 60)
-        logger.info(f"Обработано клауз: {len(all_results)}")
+        logger.info(f"Обработано клауз: {total_labeled}")
         logger.info(f"Общее время: {total_time/60:.1f} минут")
-        logger.info(f"Среднее время на клаузу: {total_time/len(all_results):.2f} секунд")
+        logger.info(f"Среднее время на клаузу: {stats['avg_time_per_clause']:.2f} секунд")
         logger.info(f"Результаты: {self.final_output}")
         logger.info(f"Статистика: {stats_output}")
         logger.info(f"📁 Структура проекта:")
@@ -239,13 +516,22 @@ def main():
                        help='Размер батча для обработки')
     parser.add_argument('--max-clauses', type=int, default=1000,
                        help='Максимальное количество клауз для обработки (None = все)')
-    parser.add_argument('--model', default='llama3.1:8b-instruct-q8_0',
+    parser.add_argument('--model', default=DEFAULT_MODEL,
                        help='Название модели Ollama')
+    parser.add_argument('--outer-concurrency', '--concurrency', dest='outer_concurrency',
+                       type=int, default=2,
+                       help='Максимальное количество одновременно обрабатываемых батчей')
+    parser.add_argument('--inner-concurrency', type=int, default=4,
+                       help='Количество одновременных запросов к Ollama внутри батча')
+    parser.add_argument('--llm-micro-batch', type=int, default=4,
+                       help='Сколько клауз одного отзыва размечать одним запросом к LLM (1 = по одной)')
     
     args = parser.parse_args()
     
     # Создаем процессор
-    processor = BatchClauseProcessor(args.input, args.output_dir, args.model)
+    processor = BatchClauseProcessor(args.input, args.output_dir, args.model,
+                                     inner_concurrency=args.inner_concurrency,
+                                     micro_batch_size=args.llm_micro_batch)
     
     # Загружаем полные тексты отзывов
     merged_json_path = project_root / "data/raw/merged.json"
@@ -253,9 +539,14 @@ def main():
         processor.labeler.load_review_texts(str(merged_json_path))
     else:
         logger.warning("Файл merged.json не найден, обработка без полного контекста")
+    processor.labeler.warm_up()
     
     # Запускаем обработку
-    processor.process_all_clauses(args.batch_size, args.max_clauses)
+    try:
+        processor.process_all_clauses(args.batch_size, args.max_clauses, args.outer_concurrency)
+    finally:
+        processor.cache.close()
+        processor.labeler.close()
 
 if __name__ == "__main__":
     main()
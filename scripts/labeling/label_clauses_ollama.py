@@ -8,27 +8,191 @@
 """
 
 import pandas as pd
+import numpy as np
 import json
-import subprocess
+import orjson
+import hashlib
+import sqlite3
+import httpx
+import msgspec
+import asyncio
 import time
 import os
+import re
 from pathlib import Path
-from typing import List, Dict, Any, Tuple
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import List, Dict, Any, Tuple, Optional, BinaryIO, Literal
 import logging
+import multiprocessing
+from tqdm import tqdm
+
+try:
+    import uvloop
+except ImportError:  # uvloop не поддерживает Windows
+    uvloop = None
+from concurrent.futures import ProcessPoolExecutor
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def _normalize_host(host: str) -> str:
+    """Адрес сервера Ollama со схемой (как принимает переменная OLLAMA_HOST)"""
+    host = host.strip().rstrip("/")
+    return host if "://" in host else f"http://{host}"
+
+# Адрес сервера Ollama (как в переменной окружения самого Ollama)
+OLLAMA_HOST = _normalize_host(os.environ.get("OLLAMA_HOST", "http://localhost:11434"))
+
+# Пул серверов Ollama через запятую (например, по серверу на GPU); по умолчанию только OLLAMA_HOST
+OLLAMA_HOSTS = [_normalize_host(host) for host in os.environ.get("OLLAMA_HOSTS", OLLAMA_HOST).split(",")
+                if host.strip()]
+
+# Сколько модель остается загруженной после последнего запроса (как в переменной окружения Ollama)
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "24h")
+
+# Модели Ollama по задачам: для разметки по 13 продуктам и 3 тональностям
+# достаточно небольшой инструктивной модели с квантизацией q4
+MODELS_FOR_TASKS = {
+    "clause_labeling": "qwen2.5:7b-instruct-q4_K_M",
+    "clause_labeling_quality": "llama3.1:8b-instruct-q8_0",
+}
+DEFAULT_MODEL = MODELS_FOR_TASKS["clause_labeling"]
+
+# Сколько запросов сервер Ollama обрабатывает параллельно (как в переменной окружения самого Ollama)
+OLLAMA_NUM_PARALLEL = int(os.environ.get("OLLAMA_NUM_PARALLEL", "4"))
+
+# Кэш ответов LLM между запусками (ключ - хэш модели и промпта)
+LLM_CACHE_PATH = Path(__file__).parent.parent.parent / "reports/labeling/.llm_cache.sqlite"
+
+# Параметры генерации: детерминированный короткий JSON-ответ без лишних сэмплеров
+GENERATION_OPTIONS = {"temperature": 0, "top_k": 1, "top_p": 1, "repeat_penalty": 1.0, "mirostat": 0}
+
+# Лимит токенов ответа на одну клаузу (разметка в JSON занимает ~60 токенов)
+NUM_PREDICT_PER_CLAUSE = 96
+
+# Границы окна контекста (num_ctx): окно подбирается по самому длинному отзыву
+MIN_NUM_CTX = 2048
+MAX_NUM_CTX = 8192
+
+# Основы слов, по которым клауза может относиться к банковскому продукту или услуге.
+# Список намеренно широкий: клауза без единого совпадения размечается пустыми списками
+# без вызова LLM, поэтому пропуск слова стоит дороже лишнего запроса.
+PRODUCT_KEYWORDS = (
+    # Карты
+    "карт", "кэшб", "кешб", "cashback", "бонус", "балл", "мили", "лимит", "пин", "банкомат", "терминал",
+    # Кредиты, ипотека, автокредит, рефинансирование
+    "кредит", "займ", "заем", "заём", "ипотек", "рефинанс", "рассроч", "долг", "просроч", "погаш",
+    "платеж", "платёж", "ставк", "процент", "одобр", "отказ", "заявк", "страхов", "машин", "авто",
+    # Вклады и счета
+    "вклад", "депозит", "накопит", "сбереж", "счет", "счёт", "начисл", "выписк",
+    # Переводы и платежи
+    "перевод", "перевел", "перевёл", "перечисл", "зачисл", "списа", "списан", "сбп", "оплат", "плат",
+    "комисс", "деньг", "денеж", "средств", "рубл", "снят", "сня", "пополн", "блокир",
+    # Валюта
+    "валют", "обмен", "курс", "доллар", "евро", "юан",
+    # Дистанционное обслуживание и приложение
+    "приложен", "мобильн", "онлайн", "online", "интернет", "личн", "кабинет", "сайт", "app", "смс", "sms",
+    "уведомлен", "push", "обновлен", "вход", "парол", "код",
+    # Обслуживание
+    "обслуж", "отделен", "офис", "филиал", "сотрудник", "менеджер", "оператор", "консультант", "специалист",
+    "поддержк", "горяч", "звон", "чат", "очеред", "персонал", "клиент", "сервис",
+    # Общие слова о банке (тема "Другое")
+    "банк", "услуг", "тариф", "договор", "условия", "документ",
+)
+PRODUCT_KEYWORDS_RE = re.compile("|".join(map(re.escape, PRODUCT_KEYWORDS)), re.IGNORECASE)
+
+# Сколько готовых блоков контекста отзывов держать в памяти (клаузы одного отзыва идут подряд)
+CONTEXT_CACHE_SIZE = 1024
+
+# Как часто сбрасывать потоковый файл результатов на диск (в клаузах)
+RESULTS_FSYNC_EVERY = 100
+
+# Версия промпта: менять при любом изменении текста промпта (сбрасывает кэш разметки)
+PROMPT_VERSION = 4
+
+def run_async(coro):
+    """
+    Запуск корутины в новом цикле событий (uvloop, если установлен)
+    
+    Args:
+        coro: Корутина для выполнения
+        
+    Returns:
+        Результат корутины
+    """
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return asyncio.run(coro)
+
+class LLMResponseCache:
+    def __init__(self, db_path: Path):
+        """
+        Кэш проверенных ответов LLM: в памяти и на диске (SQLite)
+        
+        Args:
+            db_path: Путь к файлу базы кэша
+        """
+        os.makedirs(Path(db_path).parent, exist_ok=True)
+        self.conn = sqlite3.connect(str(db_path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, response_json BLOB)"
+        )
+        self._memory = {}
+    
+    @staticmethod
+    def make_key(model_name: str, prompt: str) -> str:
+        """Ключ кэша: SHA-256 от модели и полного текста промпта"""
+        return hashlib.sha256((model_name + "\0" + prompt).encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Поиск ответа по ключу, None если ответа нет"""
+        if key in self._memory:
+            return self._memory[key]
+        row = self.conn.execute(
+            "SELECT response_json FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        response = orjson.loads(row[0])
+        self._memory[key] = response
+        return response
+    
+    def put(self, key: str, response: Any):
+        """Сохранение проверенного ответа"""
+        self._memory[key] = response
+        self.conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, response_json) VALUES (?, ?)",
+            (key, orjson.dumps(response))
+        )
+        self.conn.commit()
+    
+    def close(self):
+        self.conn.close()
+
 class OllamaClauseLabeler:
-    def __init__(self, model_name: str = "gpt-oss:20b"):
+    def __init__(self, model_name: str = DEFAULT_MODEL, max_concurrency: Optional[int] = None,
+                 micro_batch_size: int = 1, cache_path: Optional[Path] = LLM_CACHE_PATH,
+                 hosts: Optional[List[str]] = None, keyword_filter: bool = True):
         """
         Инициализация класса для разметки клауз
         
         Args:
             model_name: Название модели Ollama
+            max_concurrency: Максимальное количество одновременных запросов к Ollama в батче
+                (по умолчанию OLLAMA_NUM_PARALLEL на каждый сервер пула)
+            micro_batch_size: Сколько клауз одного отзыва размечать одним запросом
+            cache_path: Путь к кэшу ответов LLM (None = без кэша)
+            hosts: Адреса серверов Ollama (по умолчанию OLLAMA_HOSTS)
+            keyword_filter: Не отправлять в LLM клаузы без слов из PRODUCT_KEYWORDS
         """
         self.model_name = model_name
+        self.hosts = [_normalize_host(host) for host in hosts] if hosts else OLLAMA_HOSTS
+        self.max_concurrency = max_concurrency or OLLAMA_NUM_PARALLEL * len(self.hosts)
+        self.micro_batch_size = micro_batch_size
+        self.keyword_filter = keyword_filter
         self.allowed_topics = [
             "Дебетовая карта", "Кредитная карта", "Дистанционное обслуживание", 
             "Другое", "Денежные переводы", "Потребительский кредит", "Ипотека", 
@@ -37,91 +201,332 @@ class OllamaClauseLabeler:
         ]
         self.allowed_sentiments = ["положительно", "нейтрально", "отрицательно"]
         
-        # Словарь для хранения полных текстов отзывов
-        self.review_texts = {}
+        # Правила и примеры не зависят от клаузы: собираем их один раз и отправляем
+        # system-сообщением, чтобы Ollama переиспользовала KV-кэш общего префикса
+        self._system_prompt = self._build_system_prompt()
+        self._batched_system_prompt = self._build_batched_system_prompt()
+        
+        # JSON-схема ответа: Ollama ограничивает генерацию валидным JSON, в котором метки -
+        # только литералы из разрешенных списков, без лишних полей и повторов продуктов
+        self._label_schema = {
+            "type": "object",
+            "properties": {
+                "topics": {"type": "array", "items": {"type": "string", "enum": self.allowed_topics},
+                           "uniqueItems": True, "maxItems": len(self.allowed_topics)},
+                "sentiments": {"type": "array", "items": {"type": "string", "enum": self.allowed_sentiments},
+                               "maxItems": len(self.allowed_topics)}
+            },
+            "required": ["topics", "sentiments"],
+            "additionalProperties": False
+        }
+        
+        # Типизированные декодеры ответа: разбор JSON и проверка меток за один проход
+        topic_label = Literal[tuple(self.allowed_topics)]
+        sentiment_label = Literal[tuple(self.allowed_sentiments)]
+        clause_labels = msgspec.defstruct(
+            "ClauseLabels", [("topics", List[topic_label]), ("sentiments", List[sentiment_label])]
+        )
+        batched_clause_labels = msgspec.defstruct(
+            "BatchedClauseLabels",
+            [("id", int), ("topics", List[topic_label]), ("sentiments", List[sentiment_label])]
+        )
+        batched_response = msgspec.defstruct("BatchedResponse", [("results", List[batched_clause_labels])])
+        self._labels_decoder = msgspec.json.Decoder(clause_labels)
+        self._batched_decoder = msgspec.json.Decoder(batched_response)
+        
+        # Хранилище полных текстов отзывов (SQLite, ключ - review_id), тексты читаются по запросу
+        self._review_store = None
+        
+        # Блок контекста отзыва собирается один раз на отзыв, а не на каждую его клаузу
+        self.get_context_section = lru_cache(maxsize=CONTEXT_CACHE_SIZE)(self._build_context_section)
+        
+        # Окно контекста модели; уточняется после загрузки текстов отзывов
+        self.num_ctx = MIN_NUM_CTX
+        
+        # Повторяющиеся промпты (дубликаты клауз, перезапуски) не отправляются в LLM
+        self._cache = LLMResponseCache(cache_path) if cache_path is not None else None
+        
+        # Одна HTTP/2-сессия с пулом keep-alive соединений на весь запуск
+        self._session = httpx.Client(
+            http2=True,
+            timeout=httpx.Timeout(600, connect=5),
+            limits=httpx.Limits(max_keepalive_connections=32, max_connections=32)
+        )
+        
+        # Асинхронные клиенты (по одному на сервер) создаются в цикле событий, где выполняются запросы;
+        # запрос уходит на сервер с наименьшим числом незавершенных запросов
+        self._clients = None
+        self._clients_loop = None
+        self._inflight = [0] * len(self.hosts)
         
         # Проверяем доступность Ollama
-        self._check_ollama_availability()
+        for host in self.hosts:
+            self._check_ollama_availability(host)
     
-    def _check_ollama_availability(self):
-        """Проверка доступности Ollama и модели"""
+    def _check_ollama_availability(self, host: str):
+        """Проверка доступности сервера Ollama и модели на нем"""
         try:
-            # Проверяем, что Ollama установлена
-            result = subprocess.run(['ollama', 'list'], 
-                                  capture_output=True, text=True, timeout=10)
-            if result.returncode != 0:
-                raise RuntimeError("Ollama не найдена или не запущена")
+            # Проверяем, что сервер Ollama запущен
+            response = self._session.get(f"{host}/api/tags", timeout=10)
+            response.raise_for_status()
             
             # Проверяем наличие модели
-            if self.model_name not in result.stdout:
-                logger.warning(f"Модель {self.model_name} не найдена. Попытка загрузки...")
-                self._pull_model()
+            models = [model["name"] for model in response.json().get("models", [])]
+            if self.model_name not in models:
+                logger.warning(f"Модель {self.model_name} не найдена на {host}. Попытка загрузки...")
+                self._pull_model(host)
             
-            logger.info(f"Ollama и модель {self.model_name} готовы к работе")
+            logger.info(f"Ollama ({host}) и модель {self.model_name} готовы к работе")
             
-        except subprocess.TimeoutExpired:
-            raise RuntimeError("Timeout при проверке Ollama")
-        except FileNotFoundError:
-            raise RuntimeError("Ollama не установлена. Установите с https://ollama.ai/")
+        except httpx.TimeoutException:
+            raise RuntimeError(f"Timeout при проверке Ollama на {host}")
+        except httpx.HTTPError as e:
+            raise RuntimeError(f"Ollama не запущена на {host}. Установите с https://ollama.ai/ ({e})")
     
-    def _pull_model(self):
+    def _pull_model(self, host: str):
         """Загрузка модели если она отсутствует"""
         try:
-            logger.info(f"Загружаем модель {self.model_name}...")
-            result = subprocess.run(['ollama', 'pull', self.model_name], 
-                                  capture_output=True, text=True, timeout=300)
-            if result.returncode != 0:
-                raise RuntimeError(f"Не удалось загрузить модель: {result.stderr}")
+            logger.info(f"Загружаем модель {self.model_name} на {host}...")
+            response = self._session.post(f"{host}/api/pull",
+                                          json={"model": self.model_name, "stream": False},
+                                          timeout=3600)
+            if response.status_code != 200:
+                raise RuntimeError(f"Не удалось загрузить модель: {response.text}")
             logger.info("Модель успешно загружена")
-        except subprocess.TimeoutExpired:
+        except httpx.TimeoutException:
             raise RuntimeError("Timeout при загрузке модели")
     
+    def warm_up(self):
+        """
+        Прогрев модели на всех серверах пула перед разметкой
+        
+        Один запрос с system-промптом и одним токеном ответа загружает модель
+        с итоговым окном контекста (вызывать после load_review_texts: при смене
+        num_ctx Ollama перезагружает модель) и заполняет KV-кэш общего префикса.
+        """
+        payload = {
+            "model": self.model_name,
+            "messages": [
+                {"role": "system", "content": self._system_prompt},
+                {"role": "user", "content": "ok"}
+            ],
+            "stream": False,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "options": {**GENERATION_OPTIONS, "num_predict": 1, "num_ctx": self.num_ctx}
+        }
+        for host in self.hosts:
+            start_time = time.time()
+            try:
+                response = self._session.post(f"{host}/api/chat", json=payload, timeout=600)
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                logger.warning(f"Не удалось прогреть модель на {host}: {e}")
+                continue
+            logger.info(f"Модель {self.model_name} загружена на {host} за {time.time() - start_time:.1f} сек")
+    
+    def close(self):
+        """Закрытие HTTP-сессии с Ollama, кэша ответов и файла текстов отзывов"""
+        self._session.close()
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+        if self._review_store is not None:
+            self._review_store.close()
+            self._review_store = None
+    
+    def _get_clients(self) -> List[httpx.AsyncClient]:
+        """Асинхронные HTTP/2-клиенты серверов пула, общие для всех запросов текущего цикла событий"""
+        loop = asyncio.get_running_loop()
+        if self._clients is None or self._clients_loop is not loop:
+            self._clients = [
+                httpx.AsyncClient(
+                    http2=True,
+                    base_url=host,
+                    timeout=httpx.Timeout(300, connect=10),
+                    limits=httpx.Limits(max_keepalive_connections=32, max_connections=32)
+                )
+                for host in self.hosts
+            ]
+            self._clients_loop = loop
+            self._inflight = [0] * len(self.hosts)
+        return self._clients
+    
+    async def aclose(self):
+        """Закрытие асинхронных клиентов (вызывать в том же цикле событий, где шли запросы)"""
+        if self._clients is not None:
+            for client in self._clients:
+                await client.aclose()
+            self._clients = None
+            self._clients_loop = None
+    
+    async def _chat(self, system_prompt: str, user_message: str, response_format: Optional[dict] = None,
+                    num_predict: int = NUM_PREDICT_PER_CLAUSE, timeout: float = 60) -> str:
+        """
+        Запрос к /api/chat через общий асинхронный клиент
+        
+        Args:
+            system_prompt: Постоянная часть промпта (правила и примеры)
+            user_message: Переменная часть промпта (контекст и клаузы)
+            response_format: JSON-схема, которой должен соответствовать ответ
+            num_predict: Максимальное количество токенов ответа
+            timeout: Таймаут запроса в секундах
+            
+        Returns:
+            Текст ответа модели
+        """
+        payload = {
+            "model": self.model_name,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_message}
+            ],
+            "stream": False,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "options": {**GENERATION_OPTIONS, "num_predict": num_predict, "num_ctx": self.num_ctx}
+        }
+        if response_format is not None:
+            payload["format"] = response_format
+        clients = self._get_clients()
+        # Выбираем наименее загруженный сервер пула
+        host_idx = min(range(len(clients)), key=self._inflight.__getitem__)
+        self._inflight[host_idx] += 1
+        try:
+            response = await clients[host_idx].post("/api/chat", json=payload, timeout=timeout)
+        finally:
+            self._inflight[host_idx] -= 1
+        response.raise_for_status()
+        return response.json()["message"]["content"]
+    
     def load_review_texts(self, merged_json_path: str):
         """
-        Загрузка полных текстов отзывов из merged.json
+        Подключение полных текстов отзывов из merged.json
+        
+        При первом запуске (или после изменения merged.json) рядом с ним создается
+        хранилище merged.texts.sqlite с ключом review_id. Тексты в память не загружаются:
+        каждый читается по запросу, кэшированием страниц занимается ОС.
         
         Args:
             merged_json_path: Путь к файлу merged.json
         """
         logger.info(f"Загружаем полные тексты отзывов из {merged_json_path}")
         
+        merged_path = Path(merged_json_path)
+        store_path = merged_path.with_name(merged_path.stem + ".texts.sqlite")
+        
         try:
-            with open(merged_json_path, 'r', encoding='utf-8') as f:
-                reviews_data = json.load(f)
+            store_is_fresh = (
+                store_path.exists()
+                and store_path.stat().st_mtime >= merged_path.stat().st_mtime
+            )
+            if not store_is_fresh:
+                self._build_review_texts_store(merged_path, store_path)
+            
+            if self._review_store is not None:
+                self._review_store.close()
+            self._review_store = sqlite3.connect(f"file:{store_path}?mode=ro", uri=True)
             
-            for review in reviews_data:
-                review_id = review['review_id']
-                review_text = review['review_text']
-                self.review_texts[review_id] = review_text
+            n_reviews, longest_review = self._review_store.execute(
+                "SELECT COUNT(*), MAX(length(review_text)) FROM reviews"
+            ).fetchone()
+            logger.info(f"Доступно {n_reviews} полных текстов отзывов")
             
-            logger.info(f"Загружено {len(self.review_texts)} полных текстов отзывов")
+            self.get_context_section.cache_clear()
+            self.num_ctx = self._estimate_num_ctx(longest_review or 0)
+            logger.info(f"Окно контекста модели: {self.num_ctx} токенов")
             
         except Exception as e:
             logger.error(f"Ошибка при загрузке текстов отзывов: {e}")
             raise
     
-    def create_prompt(self, clause: str, full_review_text: str = None) -> str:
+    def _estimate_num_ctx(self, longest_review: int) -> int:
         """
-        Создание промпта для LLM
+        Окно контекста, достаточное для самого длинного запроса
+        
+        Оценка сверху: токен кириллического текста не короче одного символа.
+        Запрос содержит system-промпт, контекст отзыва и клаузы (не длиннее отзыва)
+        плюс ответ на micro_batch_size клауз.
         
         Args:
-            clause: Текст клаузы для анализа
-            full_review_text: Полный текст отзыва для контекста
+            longest_review: Длина самого длинного отзыва в символах
+        """
+        system_prompt = max(len(self._system_prompt), len(self._batched_system_prompt))
+        needed = system_prompt + 2 * longest_review + NUM_PREDICT_PER_CLAUSE * self.micro_batch_size
+        # Округляем вверх до кратного 512
+        num_ctx = (needed + 511) // 512 * 512
+        return min(max(num_ctx, MIN_NUM_CTX), MAX_NUM_CTX)
+    
+    def _build_review_texts_store(self, merged_path: Path, store_path: Path):
+        """Разбор merged.json и запись текстов отзывов в хранилище с ключом review_id"""
+        logger.info("Строим хранилище текстов отзывов (однократно)")
+        
+        # orjson разбирает байты напрямую, без промежуточной декодированной строки
+        with open(merged_path, 'rb') as f:
+            reviews_data = orjson.loads(f.read())
+        
+        # Хранилище собирается во временном файле и подменяется атомарно
+        tmp_store_path = store_path.with_name(store_path.name + ".tmp")
+        if tmp_store_path.exists():
+            tmp_store_path.unlink()
+        conn = sqlite3.connect(str(tmp_store_path))
+        try:
+            conn.execute("CREATE TABLE reviews (review_id TEXT PRIMARY KEY, review_text TEXT) WITHOUT ROWID")
+            # review_id храним строкой: в CSV клауз он читается числом, в merged.json бывает строкой
+            conn.executemany(
+                "INSERT OR REPLACE INTO reviews (review_id, review_text) VALUES (?, ?)",
+                ((str(review['review_id']), review['review_text']) for review in reviews_data)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        # Разобранные отзывы больше не нужны
+        del reviews_data
+        
+        os.replace(tmp_store_path, store_path)
+    
+    def get_review_text(self, review_id) -> Optional[str]:
+        """
+        Полный текст отзыва по review_id
+        
+        Args:
+            review_id: Идентификатор отзыва
             
         Returns:
-            Готовый промпт для отправки в LLM
+            Текст отзыва или None, если отзыв не найден
         """
-        context_section = ""
-        if full_review_text:
-            context_section = f"""
-КОНТЕКСТ - полный текст отзыва:
-"{full_review_text}"
-
-"""
-
-        prompt = f"""Ты классификатор банковских клауз. Твоя задача – выделять банковские продукты/услуги и их тональности в конкретной клаузе, используя контекст всего отзыва.
+        if self._review_store is None:
+            return None
+        row = self._review_store.execute(
+            "SELECT review_text FROM reviews WHERE review_id = ?", (str(review_id),)
+        ).fetchone()
+        return row[0] if row is not None else None
+    
+    @staticmethod
+    def format_context(full_review_text: Optional[str]) -> str:
+        """Блок контекста для сообщения LLM (пустая строка, если текста отзыва нет)"""
+        if not full_review_text:
+            return ""
+        return f'КОНТЕКСТ:\n"{full_review_text}"\n\n'
+    
+    def _build_context_section(self, review_id) -> Optional[str]:
+        """
+        Блок контекста отзыва для сообщения LLM (кэшируется через get_context_section)
+        
+        Args:
+            review_id: Идентификатор отзыва
+            
+        Returns:
+            Готовый блок контекста или None, если отзыв не найден
+        """
+        full_review_text = self.get_review_text(review_id)
+        if full_review_text is None:
+            return None
+        return self.format_context(full_review_text)
+    
+    def _build_system_prompt(self) -> str:
+        """Постоянная часть промпта для разметки одной клаузы"""
+        return f"""Ты классификатор банковских клауз. Твоя задача – выделять банковские продукты/услуги и их тональности в конкретной клаузе, используя контекст всего отзыва.
 
-{context_section}Правила:
+Правила:
 - Размечай только по списку категорий: {self.allowed_topics}.
 - Тональности только из списка: {self.allowed_sentiments}.
 - ВАЖНО: Количество продуктов и тональностей должно быть СТРОГО РАВНЫМ. На каждый найденный продукт/услугу должна быть соответствующая тональность.
@@ -151,156 +556,352 @@ class OllamaClauseLabeler:
   "topics": [],
   "sentiments": []
 }}
+"""
+    
+    def _build_batched_system_prompt(self) -> str:
+        """Постоянная часть промпта для разметки нескольких клауз одного отзыва"""
+        return f"""Ты классификатор банковских клауз. Твоя задача – выделять банковские продукты/услуги и их тональности в каждой клаузе из JSON-массива, используя контекст всего отзыва.
 
-Теперь размечай следующую клаузу:
-"{clause}"
+Правила:
+- Размечай только по списку категорий: {self.allowed_topics}.
+- Тональности только из списка: {self.allowed_sentiments}.
+- ВАЖНО: Для каждой клаузы количество продуктов и тональностей должно быть СТРОГО РАВНЫМ.
+- Если в клаузе нет ЯВНЫХ банковских продуктов, оставь оба списка пустыми.
+- Если тональность неясна, используй "нейтрально".
+- Размечай каждую клаузу отдельно, но учитывай контекст всего отзыва для понимания тональности.
+- Верни массив "results" с одним элементом на каждую клаузу, указывая ее "id".
+- Отвечай только JSON без пояснений.
+
+Пример:
+Вход:
+[{{"id": 0, "clause": "Очень понравилось обслуживание в отделении, но мобильное приложение часто зависает."}}, {{"id": 1, "clause": "Пришел в банк утром."}}]
+Выход:
+{{
+  "results": [
+    {{"id": 0, "topics": ["Обслуживание", "Мобильное приложение"], "sentiments": ["положительно", "отрицательно"]}},
+    {{"id": 1, "topics": [], "sentiments": []}}
+  ]
+}}
 """
-        return prompt
     
-    def call_ollama(self, prompt: str, max_retries: int = 3) -> Dict[str, Any]:
+    def create_prompt(self, clause: str, context_section: str = "") -> str:
+        """
+        Создание пользовательского сообщения для LLM (правила передаются system-сообщением)
+        
+        Args:
+            clause: Текст клаузы для анализа
+            context_section: Блок контекста из get_context_section или format_context
+            
+        Returns:
+            Сообщение с контекстом и клаузой
+        """
+        return f'{context_section}КЛАУЗА:\n"{clause}"'
+    
+    def create_batched_prompt(self, clauses: List[str], context_section: str = "") -> str:
+        """
+        Создание пользовательского сообщения для разметки нескольких клауз одного отзыва
+        
+        Args:
+            clauses: Тексты клауз одного отзыва
+            context_section: Блок контекста из get_context_section или format_context
+            
+        Returns:
+            Сообщение с контекстом и JSON-массивом клауз с номерами id
+        """
+        clauses_json = orjson.dumps(
+            [{"id": i, "clause": clause} for i, clause in enumerate(clauses)]
+        ).decode('utf-8')
+        return f'{context_section}КЛАУЗЫ:\n{clauses_json}'
+    
+    async def call_ollama_batch(self, prompt: str, expected_count: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Один вызов Ollama для группы клауз
+        
+        Args:
+            prompt: Сообщение из create_batched_prompt
+            expected_count: Количество клауз в промпте
+            
+        Returns:
+            Список ответов по клаузам или None, если ответ не прошел проверку
+        """
+        cache_key = None
+        if self._cache is not None:
+            cache_key = LLMResponseCache.make_key(self.model_name,
+                                                  self._batched_system_prompt + "\0" + prompt)
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        try:
+            response_text = await self._chat(self._batched_system_prompt, prompt,
+                                             response_format=self._batched_schema(expected_count),
+                                             num_predict=NUM_PREDICT_PER_CLAUSE * expected_count,
+                                             timeout=60 + 15 * expected_count)
+        except httpx.TimeoutException:
+            logger.warning(f"Timeout при групповом вызове Ollama ({expected_count} клауз)")
+            return None
+        except httpx.HTTPError as e:
+            logger.warning(f"Ollama вернула ошибку при групповом вызове: {e}")
+            return None
+        
+        try:
+            results = self._batched_decoder.decode(response_text).results
+        except msgspec.DecodeError as e:
+            logger.warning(f"Групповой ответ не соответствует схеме: {e}")
+            return None
+        
+        # Каждая клауза должна получить ровно одну разметку
+        ids = sorted(item.id for item in results)
+        if ids != list(range(expected_count)):
+            logger.warning(f"Ответ не покрывает id 0..{expected_count - 1}: {ids}")
+            return None
+        
+        if not all(self._labels_match(item.topics, item.sentiments) for item in results):
+            return None
+        
+        items = [{"topics": item.topics, "sentiments": item.sentiments}
+                 for item in sorted(results, key=lambda item: item.id)]
+        if cache_key is not None:
+            self._cache.put(cache_key, items)
+        return items
+    
+    async def call_ollama(self, prompt: str, max_retries: int = 2) -> Optional[Dict[str, Any]]:
         """
         Вызов Ollama для обработки промпта
         
+        Ответ ограничен JSON-схемой, поэтому разбирается напрямую. Повторяются только
+        сетевые ошибки: при temperature=0 повтор того же промпта дает тот же ответ.
+        
         Args:
             prompt: Промпт для LLM
-            max_retries: Максимальное количество попыток
+            max_retries: Максимальное количество попыток при сетевых ошибках
             
         Returns:
-            Ответ LLM в виде словаря
+            Ответ LLM в виде словаря или None, если валидный ответ получить не удалось
         """
+        cache_key = None
+        if self._cache is not None:
+            cache_key = LLMResponseCache.make_key(self.model_name, self._system_prompt + "\0" + prompt)
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         for attempt in range(max_retries):
             try:
-                # Вызываем Ollama через subprocess
-                result = subprocess.run(
-                    ['ollama', 'run', self.model_name],
-                    input=prompt,
-                    capture_output=True,
-                    text=True,
-                    timeout=60  # Таймаут 60 секунд
-                )
-                
-                if result.returncode != 0:
-                    logger.warning(f"Ollama вернула ошибку (попытка {attempt + 1}): {result.stderr}")
-                    continue
-                
-                # Парсим JSON ответ
-                response_text = result.stdout.strip()
-                
-                # Пытаемся извлечь JSON из ответа
-                try:
-                    # Ищем JSON в ответе (может быть обернут в другой текст)
-                    start_idx = response_text.find('{')
-                    end_idx = response_text.rfind('}') + 1
-                    
-                    if start_idx != -1 and end_idx > start_idx:
-                        json_str = response_text[start_idx:end_idx]
-                        response_data = json.loads(json_str)
-                        
-                        # Валидация ответа
-                        if self._validate_response(response_data):
-                            return response_data
-                        else:
-                            logger.warning(f"Невалидный ответ (попытка {attempt + 1}): {response_data}")
-                    else:
-                        logger.warning(f"JSON не найден в ответе (попытка {attempt + 1}): {response_text}")
-                        
-                except json.JSONDecodeError as e:
-                    logger.warning(f"Ошибка парсинга JSON (попытка {attempt + 1}): {e}")
-                    logger.warning(f"Ответ: {response_text}")
-                
-            except subprocess.TimeoutExpired:
+                response_text = await self._chat(self._system_prompt, prompt,
+                                                 response_format=self._label_schema, timeout=60)
+            except httpx.HTTPStatusError as e:
+                logger.warning(f"Ollama вернула ошибку (попытка {attempt + 1}): {e.response.text}")
+                continue
+            except httpx.TimeoutException:
                 logger.warning(f"Timeout при вызове Ollama (попытка {attempt + 1})")
-            except Exception as e:
+                continue
+            except httpx.HTTPError as e:
                 logger.warning(f"Ошибка при вызове Ollama (попытка {attempt + 1}): {e}")
+                continue
+            
+            try:
+                labels = self._labels_decoder.decode(response_text)
+            except msgspec.DecodeError as e:
+                logger.warning(f"Ответ не соответствует схеме: {e}. Ответ: {response_text}")
+                break
+            
+            if self._labels_match(labels.topics, labels.sentiments):
+                response_data = {"topics": labels.topics, "sentiments": labels.sentiments}
+                if cache_key is not None:
+                    self._cache.put(cache_key, response_data)
+                return response_data
+            
+            logger.warning(f"Невалидный ответ: {response_text}")
+            break
         
-        # Если все попытки неудачны, возвращаем пустой результат
-        logger.error("Все попытки вызова Ollama неудачны")
-        return {"topics": [], "sentiments": []}
+        # Неудачу возвращаем явно: пустая разметка неотличима от «продуктов нет»
+        logger.error("Не удалось получить валидный ответ Ollama")
+        return None
     
-    def _validate_response(self, response: Dict[str, Any]) -> bool:
+    def _batched_schema(self, count: int) -> dict:
+        """JSON-схема группового ответа: массив "results" из count разметок с id клауз"""
+        item_schema = {
+            "type": "object",
+            "properties": {
+                "id": {"type": "integer", "minimum": 0, "maximum": count - 1},
+                **self._label_schema["properties"]
+            },
+            "required": ["id", "topics", "sentiments"],
+            "additionalProperties": False
+        }
+        return {
+            "type": "object",
+            "properties": {
+                "results": {"type": "array", "items": item_schema,
+                            "minItems": count, "maxItems": count}
+            },
+            "required": ["results"],
+            "additionalProperties": False
+        }
+    
+    @staticmethod
+    def _labels_match(topics: List[str], sentiments: List[str]) -> bool:
         """
-        Валидация ответа от LLM
+        Проверка разметки, которую не выражает схема ответа
+        
+        Допустимость самих меток проверяется при декодировании ответа.
         
         Args:
-            response: Ответ от LLM
+            topics: Продукты из ответа LLM
+            sentiments: Тональности из ответа LLM
             
         Returns:
-            True если ответ валидный
+            True если на каждый продукт приходится ровно одна тональность
         """
-        if not isinstance(response, dict):
-            return False
-        
-        if "topics" not in response or "sentiments" not in response:
-            return False
-        
-        if not isinstance(response["topics"], list) or not isinstance(response["sentiments"], list):
-            return False
-        
         # ВАЖНО: Проверяем равенство количества продуктов и тональностей
-        if len(response["topics"]) != len(response["sentiments"]):
-            logger.warning(f"Количество продуктов ({len(response['topics'])}) не равно количеству тональностей ({len(response['sentiments'])})")
+        if len(topics) != len(sentiments):
+            logger.warning(f"Количество продуктов ({len(topics)}) не равно количеству тональностей ({len(sentiments)})")
             return False
-        
-        # Проверяем, что все топики из разрешенного списка
-        for topic in response["topics"]:
-            if topic not in self.allowed_topics:
-                logger.warning(f"Неразрешенный топик: {topic}")
-                return False
-        
-        # Проверяем, что все тональности из разрешенного списка
-        for sentiment in response["sentiments"]:
-            if sentiment not in self.allowed_sentiments:
-                logger.warning(f"Неразрешенная тональность: {sentiment}")
-                return False
-        
         return True
     
-    def process_clause(self, clause_row: pd.Series) -> Dict[str, Any]:
+    def may_mention_product(self, clause_text: str) -> bool:
+        """Есть ли в клаузе слова, связанные с банковскими продуктами (быстрая проверка без LLM)"""
+        return not self.keyword_filter or PRODUCT_KEYWORDS_RE.search(clause_text) is not None
+    
+    def _empty_result(self, clause_id, review_id, clause_text: str) -> Dict[str, Any]:
+        """Результат для клаузы без банковских продуктов, полученный без вызова LLM"""
+        return {
+            "clause_id": clause_id,
+            "review_id": review_id,
+            "clause": clause_text,
+            "topics": [],
+            "sentiments": [],
+            "has_full_context": self.get_context_section(review_id) is not None
+        }
+    
+    async def process_clause(self, clause_id, review_id, clause_text: str) -> Dict[str, Any]:
         """
         Обработка одной клаузы
         
         Args:
-            clause_row: Строка DataFrame с данными клаузы
+            clause_id: ID клаузы
+            review_id: ID отзыва, к которому относится клауза
+            clause_text: Текст клаузы
             
         Returns:
             Результат разметки клаузы
         """
-        clause_text = clause_row['clause']
-        clause_id = clause_row['clause_id']
-        review_id = clause_row['review_id']
+        if not self.may_mention_product(clause_text):
+            return self._empty_result(clause_id, review_id, clause_text)
         
-        # Получаем полный текст отзыва для контекста
-        full_review_text = self.review_texts.get(review_id, None)
-        if full_review_text is None:
+        # Получаем блок с полным текстом отзыва для контекста
+        context_section = self.get_context_section(review_id)
+        if context_section is None:
             logger.warning(f"Полный текст отзыва {review_id} не найден, используем только клаузу")
         
         # Создаем промпт с контекстом
-        prompt = self.create_prompt(clause_text, full_review_text)
+        prompt = self.create_prompt(clause_text, context_section or "")
         
         # Вызываем LLM
-        llm_response = self.call_ollama(prompt)
+        llm_response = await self.call_ollama(prompt)
         
         # Формируем результат
         result = {
             "clause_id": clause_id,
             "review_id": review_id,
             "clause": clause_text,
-            "topics": llm_response.get("topics", []),
-            "sentiments": llm_response.get("sentiments", []),
-            "has_full_context": full_review_text is not None
+            "topics": llm_response["topics"] if llm_response else [],
+            "sentiments": llm_response["sentiments"] if llm_response else [],
+            "has_full_context": context_section is not None
         }
+        if llm_response is None:
+            # Пустая разметка из-за ошибки LLM: такой результат нельзя кэшировать
+            result["llm_error"] = True
         
         return result
     
+    async def process_clause_group(self, clause_rows: List[Tuple[Any, Any, str]]) -> List[Dict[str, Any]]:
+        """
+        Обработка группы клауз одного отзыва одним запросом к LLM
+        
+        При невалидном групповом ответе клаузы размечаются по одной.
+        
+        Args:
+            clause_rows: Кортежи (clause_id, review_id, clause) клауз одного отзыва
+            
+        Returns:
+            Результаты разметки в порядке клауз
+        """
+        if len(clause_rows) == 1:
+            return [await self.process_clause(*clause_rows[0])]
+        
+        # Клаузы без признаков банковских продуктов размечаются сразу, в LLM идут остальные
+        candidates = [self.may_mention_product(clause) for _, _, clause in clause_rows]
+        if not all(candidates):
+            candidate_rows = [row for row, candidate in zip(clause_rows, candidates) if candidate]
+            candidate_results = iter(await self.process_clause_group(candidate_rows) if candidate_rows else [])
+            return [next(candidate_results) if candidate else self._empty_result(*row)
+                    for row, candidate in zip(clause_rows, candidates)]
+        
+        review_id = clause_rows[0][1]
+        context_section = self.get_context_section(review_id)
+        if context_section is None:
+            logger.warning(f"Полный текст отзыва {review_id} не найден, используем только клаузы")
+        
+        prompt = self.create_batched_prompt([clause for _, _, clause in clause_rows], context_section or "")
+        responses = await self.call_ollama_batch(prompt, len(clause_rows))
+        
+        if responses is None:
+            logger.warning(f"Групповая разметка не удалась, размечаем {len(clause_rows)} клауз по одной")
+            return [await self.process_clause(*row) for row in clause_rows]
+        
+        return [
+            {
+                "clause_id": clause_id,
+                "review_id": row_review_id,
+                "clause": clause,
+                "topics": response["topics"],
+                "sentiments": response["sentiments"],
+                "has_full_context": context_section is not None
+            }
+            for (clause_id, row_review_id, clause), response in zip(clause_rows, responses)
+        ]
+    
     def process_clauses_batch(self, clauses_df: pd.DataFrame, 
-                            start_idx: int = 0, batch_size: int = 1000) -> List[Dict[str, Any]]:
+                            start_idx: int = 0, batch_size: int = 1000,
+                            results_file: Optional[BinaryIO] = None,
+                            show_progress: bool = True) -> List[Dict[str, Any]]:
         """
-        Обработка батча клауз
+        Обработка батча клауз (синхронная обертка над process_clauses_batch_async)
         
         Args:
             clauses_df: DataFrame с клаузами
             start_idx: Индекс начала обработки
             batch_size: Размер батча
+            results_file: Файл (JSON Lines), в который результаты дописываются по мере готовности
+            show_progress: Показывать прогресс-бар по клаузам
+            
+        Returns:
+            Список результатов разметки
+        """
+        async def run() -> List[Dict[str, Any]]:
+            try:
+                return await self.process_clauses_batch_async(clauses_df, start_idx, batch_size,
+                                                              results_file, show_progress)
+            finally:
+                await self.aclose()
+        
+        return run_async(run())
+    
+    async def process_clauses_batch_async(self, clauses_df: pd.DataFrame,
+                                          start_idx: int = 0, batch_size: int = 1000,
+                                          results_file: Optional[BinaryIO] = None,
+                                          show_progress: bool = True) -> List[Dict[str, Any]]:
+        """
+        Асинхронная обработка батча клауз
+        
+        Args:
+            clauses_df: DataFrame с клаузами
+            start_idx: Индекс начала обработки
+            batch_size: Размер батча
+            results_file: Файл (JSON Lines), в который результаты дописываются по мере готовности
+            show_progress: Показывать прогресс-бар по клаузам
             
         Returns:
             Список результатов разметки
@@ -308,34 +909,103 @@ class OllamaClauseLabeler:
         end_idx = min(start_idx + batch_size, len(clauses_df))
         batch_df = clauses_df.iloc[start_idx:end_idx]
         
-        results = []
         total_clauses = len(batch_df)
         
         logger.info(f"Начинаем обработку {total_clauses} клауз (индексы {start_idx}-{end_idx-1})")
         
-        for idx, (_, row) in enumerate(batch_df.iterrows()):
+        # Ставим клаузы одного отзыва подряд (устойчивая сортировка сохраняет их порядок):
+        # запросы с общим префиксом (system + контекст) идут друг за другом, и сервер
+        # переиспользует его KV-кэш. Результаты возвращаются в исходном порядке.
+        review_ids = batch_df['review_id'].to_numpy()
+        order = np.argsort(review_ids, kind='stable')
+        
+        # Колонки берем массивами один раз, без создания Series на каждую строку
+        sorted_rows = zip(batch_df['clause_id'].to_numpy()[order].tolist(),
+                          review_ids[order].tolist(),
+                          batch_df['clause'].to_numpy()[order].tolist())
+        
+        # Группируем клаузы одного отзыва (не больше micro_batch_size),
+        # чтобы контекст отзыва передавался один раз на группу
+        groups = []
+        for row in sorted_rows:
+            if (groups and len(groups[-1]) < self.micro_batch_size
+                    and groups[-1][0][1] == row[1]):
+                groups[-1].append(row)
+            else:
+                groups.append([row])
+        
+        group_offsets = []
+        offset = 0
+        for group in groups:
+            group_offsets.append(offset)
+            offset += len(group)
+        
+        # Разные отзывы размечаются параллельно (до max_concurrency запросов),
+        # группы одного отзыва - последовательно, чтобы попадать в кэш префикса
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        review_locks = defaultdict(asyncio.Lock)
+        unsynced = 0
+        
+        def write_results(group_results: List[Dict[str, Any]]):
+            nonlocal unsynced
+            # Клаузы с ошибкой LLM в файл не пишем: по нему возобновляется запуск,
+            # и такие клаузы должны уйти в модель повторно
+            labeled = [result for result in group_results if not result.get('llm_error')]
+            results_file.write(b''.join(
+                orjson.dumps(result, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE)
+                for result in labeled
+            ))
+            unsynced += len(labeled)
+            if unsynced >= RESULTS_FSYNC_EVERY:
+                results_file.flush()
+                os.fsync(results_file.fileno())
+                unsynced = 0
+        
+        async def label_group(offset: int, group: List[Tuple[Any, Any, str]]) -> List[Dict[str, Any]]:
             try:
-                logger.info(f"Обрабатываем клаузу {idx + 1}/{total_clauses} (ID: {row['clause_id']})")
+                async with review_locks[group[0][1]], semaphore:
+                    logger.debug(f"Обрабатываем клаузы {offset + 1}-{offset + len(group)}/{total_clauses} (ID: {group[0][0]})")
+                    
+                    group_results = await self.process_clause_group(group)
                 
-                result = self.process_clause(row)
-                results.append(result)
+                # Результаты по клаузам пишем только в отладочный лог, общий ход - в прогресс-бар
+                if logger.isEnabledFor(logging.DEBUG):
+                    for result in group_results:
+                        logger.debug(f"Результат: topics={result['topics']}, sentiments={result['sentiments']}")
                 
-                # Логируем результат
-                logger.info(f"Результат: topics={result['topics']}, sentiments={result['sentiments']}")
+                if results_file is not None:
+                    write_results(group_results)
+                progress.update(len(group))
                 
-                # Небольшая пауза между запросами
-                time.sleep(0.5)
+                return group_results
                 
             except Exception as e:
-                logger.error(f"Ошибка при обработке клаузы {row['clause_id']}: {e}")
-                # Добавляем пустой результат в случае ошибки
-                results.append({
-                    "clause_id": row['clause_id'],
-                    "review_id": row['review_id'],
-                    "clause": row['clause'],
+                logger.error(f"Ошибка при обработке клауз {[clause_id for clause_id, _, _ in group]}: {e}")
+                progress.update(len(group))
+                # Добавляем пустые результаты в случае ошибки
+                return [{
+                    "clause_id": clause_id,
+                    "review_id": review_id,
+                    "clause": clause,
                     "topics": [],
-                    "sentiments": []
-                })
+                    "sentiments": [],
+                    "llm_error": True
+                } for clause_id, review_id, clause in group]
+        
+        with tqdm(total=total_clauses, desc="Разметка клауз", unit="клауз",
+                  disable=not show_progress) as progress:
+            outcomes = await asyncio.gather(
+                *(label_group(offset, group) for offset, group in zip(group_offsets, groups))
+            )
+        if results_file is not None:
+            results_file.flush()
+            os.fsync(results_file.fileno())
+        
+        # gather сохраняет порядок групп; возвращаем результаты в порядке исходного батча
+        results = [None] * total_clauses
+        sorted_results = (result for group_results in outcomes for result in group_results)
+        for position, result in zip(order, sorted_results):
+            results[position] = result
         
         return results
 
@@ -373,71 +1043,269 @@ def save_results(results: List[Dict[str, Any]], output_path: str):
     # Создаем директорию если не существует
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     
-    # Сохраняем результаты
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    # Сохраняем результаты без отступов: файл читается программами, а не людьми
+    # (для просмотра: python -m json.tool clauses_labeled.json)
+    with open(output_path, 'wb') as f:
+        f.write(orjson.dumps(results, option=orjson.OPT_SERIALIZE_NUMPY))
     
     logger.info("Результаты успешно сохранены")
 
-def create_summary_stats(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+def clause_key(review_id: Any, clause_id: Any) -> Tuple[str, int]:
     """
-    Создание статистики по результатам разметки
+    Ключ клаузы для возобновления разметки
+    
+    clause_id — номер клаузы внутри отзыва, поэтому клаузу однозначно задает только
+    пара с review_id. review_id приводится к строке: в CSV числовые ID отзывов
+    соседствуют с hex-идентификаторами, и pandas может прочитать их по-разному.
+    """
+    return str(review_id), int(clause_id)
+
+def load_labeled_clause_ids(results_path: Path) -> set:
+    """
+    Ключи клауз, уже записанных в потоковый файл результатов
+    
+    Недописанная последняя строка (обрыв во время записи) отрезается,
+    чтобы следующие результаты дописывались с новой строки. Строки с llm_error
+    (файлы прошлых версий скрипта) удаляются из файла: такие клаузы размечаются
+    заново, а в итоговом JSON не появляется двух записей об одной клаузе.
     
     Args:
-        results: Список результатов разметки
+        results_path: Путь к файлу результатов (JSON Lines)
         
     Returns:
-        Словарь со статистикой
+        Множество ключей (review_id, clause_id) размеченных клауз, см. clause_key
     """
-    total_clauses = len(results)
+    if not results_path.exists():
+        return set()
     
-    # Статистика по топикам
-    all_topics = []
-    for result in results:
-        all_topics.extend(result['topics'])
-    topic_counts = pd.Series(all_topics).value_counts().to_dict()
+    with open(results_path, 'rb') as f:
+        data = f.read()
+    complete_size = data.rfind(b'\n') + 1
+    if complete_size < len(data):
+        logger.warning(f"Отрезаем недописанную строку в {results_path}")
+        with open(results_path, 'r+b') as f:
+            f.truncate(complete_size)
     
-    # Статистика по тональностям
-    all_sentiments = []
-    for result in results:
-        all_sentiments.extend(result['sentiments'])
-    sentiment_counts = pd.Series(all_sentiments).value_counts().to_dict()
+    lines = [line for line in data[:complete_size].splitlines() if line]
+    records = [orjson.loads(line) for line in lines]
+    failed = sum(1 for record in records if record.get('llm_error'))
+    if failed:
+        logger.warning(f"Убираем из {results_path} клауз с ошибкой LLM: {failed}, они будут размечены заново")
+        tmp_results_path = results_path.with_name(results_path.name + ".tmp")
+        with open(tmp_results_path, 'wb') as f:
+            f.writelines(line + b'\n' for line, record in zip(lines, records) if not record.get('llm_error'))
+        os.replace(tmp_results_path, results_path)
     
-    # Статистика по количеству топиков/тональностей на клаузу
-    topics_per_clause = [len(result['topics']) for result in results]
-    sentiments_per_clause = [len(result['sentiments']) for result in results]
+    return {clause_key(record['review_id'], record['clause_id'])
+            for record in records if not record.get('llm_error')}
+
+def drop_labeled_clauses(clauses_df: pd.DataFrame, done_keys: set) -> pd.DataFrame:
+    """
+    Клаузы, которых еще нет среди размеченных
     
-    # Статистика по контексту
-    clauses_with_context = sum(1 for result in results if result.get('has_full_context', False))
+    Args:
+        clauses_df: DataFrame с клаузами
+        done_keys: Ключи размеченных клауз из load_labeled_clause_ids
+        
+    Returns:
+        DataFrame без уже размеченных клауз
+    """
+    done_mask = np.fromiter(
+        (clause_key(review_id, clause_id) in done_keys
+         for review_id, clause_id in zip(clauses_df['review_id'].tolist(), clauses_df['clause_id'].tolist())),
+        dtype=bool, count=len(clauses_df)
+    )
+    return clauses_df[~done_mask]
+
+def export_results_json(results_path: Path, output_path: str):
+    """
+    Сборка итогового JSON-массива из потокового файла результатов
+    
+    Строки JSON Lines уже являются JSON-объектами и склеиваются без повторного разбора.
+    
+    Args:
+        results_path: Путь к файлу результатов (JSON Lines)
+        output_path: Путь к итоговому JSON
+    """
+    logger.info(f"Собираем {output_path} из {results_path}")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(results_path, 'rb') as f:
+        body = b','.join(line for line in f.read().splitlines() if line)
+    with open(output_path, 'wb') as f:
+        f.write(b'[' + body + b']')
+
+def stats_worker(results_path: str, done_event, poll_interval: float = 1.0) -> Dict[str, Any]:
+    """
+    Подсчет статистики в отдельном процессе по мере записи результатов
+    
+    Читает только новые полные строки файла результатов и добавляет их в счетчики,
+    пока основной процесс не выставит done_event; затем дочитывает остаток.
     
+    Args:
+        results_path: Путь к файлу результатов (JSON Lines)
+        done_event: Событие завершения разметки (multiprocessing.Manager().Event())
+        poll_interval: Пауза между проверками файла в секундах
+        
+    Returns:
+        Итоговая статистика (finalize_summary_stats)
+    """
+    counts = empty_summary_counts()
+    position = 0
+    partial = b''
+    while True:
+        # Флаг проверяем до чтения: после него в файл уже ничего не допишется
+        finished = done_event.is_set()
+        with open(results_path, 'rb') as f:
+            f.seek(position)
+            chunk = f.read()
+        position += len(chunk)
+        
+        data = partial + chunk
+        complete_size = data.rfind(b'\n') + 1
+        complete, partial = data[:complete_size], data[complete_size:]
+        if complete:
+            update_summary_counts(counts, (orjson.loads(line) for line in complete.splitlines() if line))
+        
+        if finished:
+            break
+        time.sleep(poll_interval)
+    
+    return finalize_summary_stats(counts)
+
+def empty_summary_counts() -> Dict[str, Any]:
+    """
+    Пустые счетчики для накопления статистики разметки
+    
+    Returns:
+        Словарь счетчиков, который можно сериализовать в JSON
+    """
+    return {
+        "total_clauses": 0,
+        "clauses_with_topics": 0,
+        "clauses_with_sentiments": 0,
+        "clauses_with_full_context": 0,
+        "clauses_with_equal_counts": 0,
+        "total_topics": 0,
+        "total_sentiments": 0,
+        "topic_distribution": {},
+        "sentiment_distribution": {}
+    }
+
+def update_summary_counts(counts: Dict[str, Any], results) -> Dict[str, Any]:
+    """
+    Добавление результатов разметки в счетчики статистики
+    
+    Args:
+        counts: Счетчики из empty_summary_counts (обновляются на месте)
+        results: Итерируемые результаты разметки
+        
+    Returns:
+        Обновленные счетчики
+    """
+    # Одна таблица на все результаты: длины, флаги и распределения считаются в pandas
+    results_df = pd.DataFrame.from_records(list(results),
+                                           columns=['topics', 'sentiments', 'has_full_context'])
+    topic_lengths = results_df['topics'].str.len()
+    sentiment_lengths = results_df['sentiments'].str.len()
+    
+    counts["total_clauses"] += len(results_df)
+    counts["clauses_with_topics"] += int((topic_lengths > 0).sum())
+    counts["clauses_with_sentiments"] += int((sentiment_lengths > 0).sum())
+    # У результатов, завершившихся ошибкой, флага контекста нет
+    counts["clauses_with_full_context"] += int(results_df['has_full_context'].eq(True).sum())
     # Проверяем равенство количества продуктов и тональностей
-    equal_counts = sum(1 for result in results if len(result['topics']) == len(result['sentiments']))
+    counts["clauses_with_equal_counts"] += int((topic_lengths == sentiment_lengths).sum())
+    counts["total_topics"] += int(topic_lengths.sum())
+    counts["total_sentiments"] += int(sentiment_lengths.sum())
+    
+    def value_counts(column: str) -> Dict[str, int]:
+        exploded = results_df[column].explode().value_counts(dropna=True)
+        return {label: int(count) for label, count in exploded.items()}
+    
+    topic_distribution = Counter(counts["topic_distribution"])
+    topic_distribution.update(value_counts('topics'))
+    sentiment_distribution = Counter(counts["sentiment_distribution"])
+    sentiment_distribution.update(value_counts('sentiments'))
+    
+    counts["topic_distribution"] = dict(topic_distribution)
+    counts["sentiment_distribution"] = dict(sentiment_distribution)
+    return counts
+
+def merge_summary_counts(counts: Dict[str, Any], other: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Объединение двух наборов счетчиков статистики
+    
+    Args:
+        counts: Счетчики, в которые добавляются значения (обновляются на месте)
+        other: Добавляемые счетчики
+        
+    Returns:
+        Обновленные счетчики
+    """
+    for key, value in other.items():
+        if isinstance(value, dict):
+            distribution = Counter(counts[key])
+            distribution.update(value)
+            counts[key] = dict(distribution)
+        else:
+            counts[key] += value
+    return counts
+
+def finalize_summary_stats(counts: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Итоговая статистика по накопленным счетчикам
+    
+    Args:
+        counts: Счетчики статистики
+        
+    Returns:
+        Словарь со статистикой
+    """
+    total_clauses = counts["total_clauses"]
+    
+    def by_frequency(distribution: Dict[str, int]) -> Dict[str, int]:
+        return dict(sorted(distribution.items(), key=lambda item: item[1], reverse=True))
     
     stats = {
         "total_clauses": total_clauses,
-        "clauses_with_topics": sum(1 for result in results if result['topics']),
-        "clauses_with_sentiments": sum(1 for result in results if result['sentiments']),
-        "clauses_with_full_context": clauses_with_context,
-        "clauses_with_equal_counts": equal_counts,
-        "equal_counts_percentage": (equal_counts / total_clauses * 100) if total_clauses > 0 else 0,
-        "topic_distribution": topic_counts,
-        "sentiment_distribution": sentiment_counts,
-        "avg_topics_per_clause": sum(topics_per_clause) / len(topics_per_clause) if topics_per_clause else 0,
-        "avg_sentiments_per_clause": sum(sentiments_per_clause) / len(sentiments_per_clause) if sentiments_per_clause else 0
+        "clauses_with_topics": counts["clauses_with_topics"],
+        "clauses_with_sentiments": counts["clauses_with_sentiments"],
+        "clauses_with_full_context": counts["clauses_with_full_context"],
+        "clauses_with_equal_counts": counts["clauses_with_equal_counts"],
+        "equal_counts_percentage": (counts["clauses_with_equal_counts"] / total_clauses * 100) if total_clauses > 0 else 0,
+        "topic_distribution": by_frequency(counts["topic_distribution"]),
+        "sentiment_distribution": by_frequency(counts["sentiment_distribution"]),
+        "avg_topics_per_clause": counts["total_topics"] / total_clauses if total_clauses else 0,
+        "avg_sentiments_per_clause": counts["total_sentiments"] / total_clauses if total_clauses else 0
     }
     
     return stats
 
+def create_summary_stats(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Создание статистики по результатам разметки
+    
+    Args:
+        results: Список результатов разметки
+        
+    Returns:
+        Словарь со статистикой
+    """
+    return finalize_summary_stats(update_summary_counts(empty_summary_counts(), results))
+
 def main():
     """Основная функция"""
     # Пути к файлам
     project_root = Path(__file__).parent.parent.parent
     input_file = str(project_root / "data/interim/clauses.csv")
     output_file = str(project_root / "data/processed/labeling/clauses_labeled.json")
+    # Результаты пишутся сюда по мере готовности, по нему же возобновляется прерванный запуск
+    results_jsonl = Path(output_file).with_suffix(".jsonl")
     
     # Параметры обработки
     TEST_SIZE = None  # Количество клауз для тестирования (легко изменить) None для всех
     
+    labeler = None
     try:
         # Засекаем время начала
         start_time = time.time()
@@ -451,25 +1319,47 @@ def main():
         # Загружаем полные тексты отзывов для контекста
         merged_json_path = str(project_root / "data/raw/merged.json")
         labeler.load_review_texts(merged_json_path)
+        labeler.warm_up()
         
-        # Обрабатываем клаузы (все если TEST_SIZE=None)
-        batch_size = len(clauses_df) if TEST_SIZE is None else TEST_SIZE
-        results = labeler.process_clauses_batch(clauses_df, start_idx=0, batch_size=batch_size)
+        # Обрабатываем клаузы (все если TEST_SIZE=None), пропуская уже размеченные
+        pending_df = clauses_df if TEST_SIZE is None else clauses_df.iloc[:TEST_SIZE]
+        done_keys = load_labeled_clause_ids(results_jsonl)
+        if done_keys:
+            logger.info(f"Уже размечено клауз: {len(done_keys)}, продолжаем с оставшихся")
+            pending_df = drop_labeled_clauses(pending_df, done_keys)
         
-        # Засекаем время окончания
-        end_time = time.time()
-        total_time = end_time - start_time
+        os.makedirs(results_jsonl.parent, exist_ok=True)
+        results_jsonl.touch()
         
-        # Создаем статистику
-        stats = create_summary_stats(results)
+        # Статистика (по всем размеченным клаузам, включая прошлые запуски) считается
+        # в отдельном процессе параллельно с разметкой
+        with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=1) as executor:
+            labeling_done = manager.Event()
+            stats_future = executor.submit(stats_worker, str(results_jsonl), labeling_done)
+            try:
+                with open(results_jsonl, 'ab') as results_file:
+                    results = labeler.process_clauses_batch(pending_df, start_idx=0, batch_size=len(pending_df),
+                                                            results_file=results_file)
+            finally:
+                labeling_done.set()
+            
+            failed = sum(1 for result in results if result.get('llm_error'))
+            if failed:
+                logger.warning(f"Не размечено из-за ошибок LLM клауз: {failed}. Перезапустите скрипт, чтобы их доразметить")
+            
+            # Засекаем время окончания
+            end_time = time.time()
+            total_time = end_time - start_time
+            
+            # Собираем итоговый JSON для дальнейших шагов пайплайна
+            export_results_json(results_jsonl, output_file)
+            
+            stats = stats_future.result()
         
         # Добавляем информацию о времени выполнения
         stats["execution_time_seconds"] = total_time
         stats["execution_time_minutes"] = total_time / 60
-        stats["avg_time_per_clause"] = total_time / len(results) if results else 0
-        
-        # Сохраняем результаты
-        save_results(results, output_file)
+        stats["avg_time_per_clause"] = total_time / len(pending_df) if len(pending_df) else 0
         
         # Сохраняем статистику в reports/labeling
         stats_file = str(project_root / "reports/labeling/clauses_labeled_stats.json")
@@ -508,6 +1398,9 @@ def main():
     except Exception as e:
         logger.error(f"Критическая ошибка: {e}")
         raise
+    finally:
+        if labeler is not None:
+            labeler.close()
 
 if __name__ == "__main__":
     main()
@@ -9,12 +9,16 @@
 import subprocess
 import json
 import time
-from label_clauses_ollama import OllamaClauseLabeler
+from typing import Optional
+from label_clauses_ollama import OllamaClauseLabeler, DEFAULT_MODEL, run_async
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Минимальная доля верно размеченных тестовых клауз, при которой модель допускается к разметке
+MIN_ACCURACY = 0.8
+
 def check_ollama():
     """Проверка доступности Ollama"""
     try:
@@ -34,7 +38,7 @@ def check_ollama():
         logger.error("❌ Timeout при проверке Ollama")
         return False
 
-def test_model(model_name: str = "llama3.1:8b-instruct-q8_0"):
+def test_model(model_name: str = DEFAULT_MODEL):
     """Тестирование модели на простом примере"""
     try:
         logger.info(f"Тестируем модель {model_name}...")
@@ -64,34 +68,55 @@ def test_model(model_name: str = "llama3.1:8b-instruct-q8_0"):
         logger.error(f"❌ Ошибка при тестировании: {e}")
         return False
 
-def test_clause_labeling():
+async def call_once(labeler: OllamaClauseLabeler, prompt: str) -> Optional[dict]:
+    """Один асинхронный вызов LLM с закрытием клиента в том же цикле событий"""
+    try:
+        return await labeler.call_ollama(prompt)
+    finally:
+        await labeler.aclose()
+
+def is_expected_labeling(response: dict, expected: dict) -> bool:
+    """Совпадают ли продукты и (если задана) тональность с ожидаемыми"""
+    labels = dict(zip(response['topics'], response['sentiments']))
+    if set(labels) != set(expected):
+        return False
+    return all(sentiment is None or labels[topic] == sentiment for topic, sentiment in expected.items())
+
+def test_clause_labeling(model_name: str = DEFAULT_MODEL):
     """Тестирование разметки клауз"""
     test_cases = [
         {
             "clause": "Очень понравилось обслуживание в отделении, сотрудники вежливые и компетентные.",
-            "context": "Пришел в банк решать вопрос с кредитом. Очень понравилось обслуживание в отделении, сотрудники вежливые и компетентные. Все быстро оформили, без лишних вопросов."
+            "context": "Пришел в банк решать вопрос с кредитом. Очень понравилось обслуживание в отделении, сотрудники вежливые и компетентные. Все быстро оформили, без лишних вопросов.",
+            "expected": {"Обслуживание": "положительно"}
         },
         {
             "clause": "Мобильное приложение постоянно зависает, невозможно пользоваться!",
-            "context": "Скачал мобильное приложение банка для удобства. Мобильное приложение постоянно зависает, невозможно пользоваться! Приходится идти в отделение."
+            "context": "Скачал мобильное приложение банка для удобства. Мобильное приложение постоянно зависает, невозможно пользоваться! Приходится идти в отделение.",
+            "expected": {"Мобильное приложение": "отрицательно"}
         },
         {
             "clause": "Взял автокредит под 12%, условия нормальные, одобрили быстро.",
-            "context": "Нужна была машина срочно. Взял автокредит под 12%, условия нормальные, одобрили быстро. В целом доволен."
+            "context": "Нужна была машина срочно. Взял автокредит под 12%, условия нормальные, одобрили быстро. В целом доволен.",
+            "expected": {"Автокредит": "положительно"}
         },
         {
             "clause": "Комиссия за обслуживание карты слишком высокая.",
-            "context": "Пользуюсь дебетовой картой уже год. Комиссия за обслуживание карты слишком высокая. Думаю закрывать счет и переходить в другой банк."
+            "context": "Пользуюсь дебетовой картой уже год. Комиссия за обслуживание карты слишком высокая. Думаю закрывать счет и переходить в другой банк.",
+            "expected": {"Дебетовая карта": "отрицательно"}
         },
         {
             "clause": "Вклад открыл на год под 8%.",
-            "context": "Решил открыть депозит для накоплений. Вклад открыл на год под 8%. Пока доволен процентной ставкой."
+            "context": "Решил открыть депозит для накоплений. Вклад открыл на год под 8%. Пока доволен процентной ставкой.",
+            # Тональность здесь неоднозначна: проверяем только продукт
+            "expected": {"Вклады": None}
         }
     ]
     
     try:
         logger.info("Тестируем разметку клауз...")
-        labeler = OllamaClauseLabeler()
+        labeler = OllamaClauseLabeler(model_name)
+        correct = 0
         
         for i, test_case in enumerate(test_cases, 1):
             logger.info(f"\n--- Тест {i}/5 ---")
@@ -101,17 +126,32 @@ def test_clause_labeling():
             start_time = time.time()
             
             # Создаем промпт с контекстом
-            prompt = labeler.create_prompt(test_case['clause'], test_case['context'])
+            prompt = labeler.create_prompt(test_case['clause'], labeler.format_context(test_case['context']))
             
             # Получаем ответ от модели
-            llm_response = labeler.call_ollama(prompt)
+            llm_response = run_async(call_once(labeler, prompt))
             
             end_time = time.time()
             processing_time = end_time - start_time
             
+            if llm_response is None:
+                logger.warning(f"Модель не вернула валидный ответ за {processing_time:.2f} сек")
+                continue
+            
             logger.info(f"Результат: {llm_response['topics']} | {llm_response['sentiments']}")
             logger.info(f"Равное количество: {len(llm_response['topics']) == len(llm_response['sentiments'])}")
             logger.info(f"Время обработки: {processing_time:.2f} сек")
+            
+            if is_expected_labeling(llm_response, test_case['expected']):
+                correct += 1
+            else:
+                logger.warning(f"Ожидалось: {test_case['expected']}")
+        
+        accuracy = correct / len(test_cases)
+        logger.info(f"\nТочность на тестовых клаузах: {correct}/{len(test_cases)} ({accuracy:.0%})")
+        if accuracy < MIN_ACCURACY:
+            logger.error(f"❌ Точность модели {model_name} ниже порога {MIN_ACCURACY:.0%}")
+            return False
         
         logger.info("\n✅ Тестирование разметки завершено успешно")
         return True
@@ -134,7 +174,7 @@ def main():
     
     # Тестируем модель
     if not test_model():
-        logger.error("Проблемы с моделью. Попробуйте: ollama pull llama3:8b-instruct")
+        logger.error(f"Проблемы с моделью. Попробуйте: ollama pull {DEFAULT_MODEL}")
         return False
     
     # Тестируем разметку
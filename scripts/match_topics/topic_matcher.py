@@ -6,7 +6,9 @@
 Основная идея:
 - Для каждой темы указываются ключевые слова (synonyms/include),
   стоп-слова (exclude) и возможные слова-соседи (cooccur).
-- Каждая клауза проверяется регулярными выражениями на вхождение этих слов.
+- Каждая клауза проверяется регулярными выражениями на вхождение этих слов;
+  при установленном pyahocorasick литеральные токены всех тем ищутся
+  одним проходом автомата Aho-Corasick (build_matcher).
 - На выходе для каждой клаузы сохраняются id предсказанных тем и их скоры.
 
 Применение:
@@ -19,14 +21,64 @@
 
 """
 
-import re, yaml, pandas as pd
-from typing import List, Dict, Any, Tuple
+import os, re, pickle, yaml, numpy as np, pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+from typing import List, Dict, Any, Tuple, Optional
+
+try:
+    from yaml import CSafeLoader as SafeLoader  # libyaml, если PyYAML собран с ним
+except ImportError:
+    from yaml import SafeLoader
+
+try:
+    import ahocorasick  # pyahocorasick — опционально, ускоряет поиск литералов
+except ImportError:
+    ahocorasick = None
+
+try:
+    import re2  # google-re2 — опционально, линейное время без бэктрекинга
+except ImportError:
+    re2 = None
 
 TOPICS_YML = "configs/topics.yml"
 
-def _compile_token(token: str) -> re.Pattern:
+# Версия формата кэша скомпилированных тем (<yml>.compiled.pkl);
+# поднимать при изменении того, как собираются темы
+TOPICS_CACHE_VERSION = 2
+
+# Сколько процессов использовать в label_dataframe (1 — без пула)
+TOPIC_MATCHER_WORKERS = int(os.environ.get("TOPIC_MATCHER_WORKERS", "1"))
+# На меньших порциях запуск процессов дороже самой разметки
+MIN_ROWS_PER_WORKER = 1000
+
+# Виды токенов темы и их вес в скоре (exclude обрабатывается отдельно)
+KINDS = ("include", "exclude", "cooccur")
+KIND_WEIGHTS = np.array([1.0, 0.0, 0.5])
+
+REGEX_CHARS = "().?+[]{}|"
+
+# \w и \b в RE2 только ASCII — для кириллицы класс слова задаём явно,
+# а левую границу слова — как «начало строки или не-буква».
+# \p{L} не берём: с ним DFA RE2 разрастается и упирается в лимит памяти.
+RE2_WORD = r"[\wа-яё]"
+RE2_WORD_START = r"(?:^|[^\wа-яё])"
+
+# Больше токенов в одной альтернации не склеиваем — остаёмся на списке паттернов
+MAX_FUSED_TOKENS = 200
+
+def _is_regex_token(token: str) -> bool:
+    """Токен уже записан как regex (скобки/квантификаторы)."""
+    return any(ch in token for ch in REGEX_CHARS)
+
+def _is_word_char(ch: str) -> bool:
+    """Аналог \\w из re для одного символа."""
+    return ch.isalnum() or ch == "_"
+
+def _token_pattern(token: str) -> str:
     """
-    Превращает строковый токен в регулярное выражение.
+    Превращает строковый токен в строку регулярного выражения.
     
     - Если токен уже похож на regex (содержит спецсимволы) → берём как есть.
     - Если обычное слово/фраза → строим regex с поддержкой окончаний.
@@ -34,18 +86,174 @@ def _compile_token(token: str) -> re.Pattern:
     """
 
     # если это уже regex (скобки/квантификаторы) — используем как есть
-    if any(ch in token for ch in "().?+[]{}|"):
+    if _is_regex_token(token):
         pat = token
     else:
-        # Разбиваем фразу на слова и разрешаем окончания для каждого
-        words = token.split()
+        # Разбиваем фразу на слова и разрешаем окончания для каждого;
+        # текст сравнивается уже в нижнем регистре
+        words = token.lower().split()
         pats = [rf"{re.escape(w)}\w*" for w in words]
         pat = r"\b" + r"\s+".join(pats) + r"\b"
-    return re.compile(pat, flags=re.IGNORECASE | re.UNICODE)
+    return pat
+
+def _token_pattern_re2(token: str) -> str:
+    """
+    То же, что _token_pattern, но в диалекте RE2: окончания через RE2_WORD,
+    граница слова слева через RE2_WORD_START (правая \\b после жадного
+    \\w* выполняется всегда, поэтому её не пишем).
+    """
+    if _is_regex_token(token):
+        return token
+    words = token.lower().split()
+    pats = [re.escape(w) + RE2_WORD + "*" for w in words]
+    return RE2_WORD_START + r"\s+".join(pats)
+
+def _needs_python_re(token: str) -> bool:
+    """
+    Regex-токен с escape-последовательностями (\\w, \\b, \\d ...) в RE2
+    работал бы только по ASCII — такие оставляем движку re.
+    """
+    return _is_regex_token(token) and "\\" in token
+
+def _token_group(token: str, pattern: str) -> str:
+    """
+    Оборачивает паттерн токена в группу. Литералы уже в нижнем регистре
+    и сравниваются с опущенным текстом без IGNORECASE; regex-токены
+    из конфига могут содержать заглавные буквы — им оставляем (?i:...).
+    """
+    return f"(?i:{pattern})" if _is_regex_token(token) else f"(?:{pattern})"
+
+def _compile_python(pattern: str) -> re.Pattern:
+    return re.compile(pattern, flags=re.UNICODE)
+
+def _compile_re2(tokens: List[str]):
+    """
+    Компилирует альтернацию токенов в RE2; None, если RE2 нет,
+    токены ему не подходят или паттерн не поддерживается (lookaround и т.п.).
+    """
+    if re2 is None or any(_needs_python_re(x) for x in tokens):
+        return None
+    pattern = "|".join(_token_group(x, _token_pattern_re2(x)) for x in tokens)
+    try:
+        return re2.compile(pattern)
+    except re2.error:
+        return None
+
+class _LiteralToken:
+    """
+    Однословный токен без спецсимволов (r"\\bслово\\w*\\b"): ищется через
+    str.find с проверкой границы слова слева, без движка регулярок.
+    Правую границу проверять не нужно — \\w* добирает окончание до конца слова.
+    Повторяет метод search у re.Pattern: True при совпадении, иначе None.
+    """
+    __slots__ = ("word",)
+
+    def __init__(self, word: str):
+        self.word = word
+
+    def search(self, text: str):
+        start = text.find(self.word)
+        while start != -1:
+            if start == 0 or not _is_word_char(text[start - 1]):
+                return True
+            start = text.find(self.word, start + 1)
+        return None
+
+def _plain_word(token: str) -> Optional[str]:
+    """Единственное слово токена в нижнем регистре, если токен — одно слово из \\w."""
+    if _is_regex_token(token):
+        return None
+    words = token.lower().split()
+    if len(words) != 1 or not all(_is_word_char(ch) for ch in words[0]):
+        return None
+    return words[0]
+
+def _compile_token(token: str):
+    """
+    Компилирует один токен (см. _token_pattern).
+    Однословные литералы ищутся через str.find (_LiteralToken); остальное —
+    google-re2, если установлен, иначе re.
+    Результат поддерживает только search и ждёт текст в нижнем регистре.
+    """
+    word = _plain_word(token)
+    if word is not None:
+        return _LiteralToken(word)
+    return _compile_re2([token]) or _compile_python(_token_group(token, _token_pattern(token)))
+
+def _fuse_tokens(tokens: List[str]):
+    """
+    Склеивает токены одного вида в одну альтернацию `(?:p1)|(?:p2)|...`,
+    чтобы тема проверялась одним поиском, а не циклом по паттернам.
+
+    Args:
+        tokens (list): токены темы (include/exclude/cooccur)
+
+    Returns:
+        общий паттерн (RE2 или re); None, если токенов нет
+            или их больше MAX_FUSED_TOKENS
+    """
+    if not tokens or len(tokens) > MAX_FUSED_TOKENS:
+        return None
+    fused = "|".join(_token_group(x, _token_pattern(x)) for x in tokens)
+    return _compile_re2(tokens) or _compile_python(fused)
+
+def _count_hits(patterns: list, fused, text: str) -> int:
+    """
+    Число токенов, нашедшихся в тексте (каждый считается один раз).
+    Общий паттерн отсекает темы без единого совпадения за один поиск;
+    поштучно считаем только там, где что-то нашлось.
+    """
+    if fused is not None and fused.search(text) is None:
+        return 0
+    return sum(1 for r in patterns if r.search(text))
+
+def _has_hit(patterns: list, fused, text: str) -> bool:
+    """Есть ли хотя бы одно совпадение (ранний выход)."""
+    if fused is not None:
+        return fused.search(text) is not None
+    return any(r.search(text) for r in patterns)
+
+def any_token_re(topics: List[Dict[str, Any]]):
+    """
+    Быстрый отсев клауз: общий паттерн по include и cooccur всех тем.
+    Клауза, в которой он ничего не находит, ни по одной теме не наберёт
+    скор выше нуля — её можно не скорить.
+
+    От литерального токена берётся только самое длинное слово с границей
+    слова слева: любое вхождение токена его содержит, а короткие слова
+    вроде «по» отсеивали бы мало. Regex-токены входят целиком.
+    Паттерн — надмножество совпадений тем, а не их точная проверка.
+
+    Returns:
+        паттерн (RE2 или re); None, если токенов нет
+    """
+    tokens = [x for t in topics for kind in ("include", "cooccur") for x in t[kind]]
+    words = sorted({max(x.lower().split(), key=len)
+                    for x in tokens if not _is_regex_token(x) and x.split()})
+    regex_tokens = [x for x in tokens if _is_regex_token(x)]
+    if not words and not regex_tokens:
+        return None
+
+    def build(word_start: str) -> str:
+        parts = [_token_group(x, x) for x in regex_tokens]
+        if words:
+            parts.insert(0, word_start + "(?:" + "|".join(re.escape(w) for w in words) + ")")
+        return "|".join(parts)
+
+    if re2 is not None and not any(_needs_python_re(x) for x in regex_tokens):
+        try:
+            return re2.compile(build(RE2_WORD_START))
+        except re2.error:
+            pass
+    return _compile_python(build(r"\b"))
 
 def load_topics_cfg(path: str):
     """
     Загружает конфигурацию тем из YAML и компилирует regex-паттерны.
+    Результат кэшируется по (path, mtime): повторные вызовы не перечитывают
+    YAML и не перекомпилируют регулярки, пока файл не изменился.
+    Между запусками темы хранятся в pickle рядом с YAML (<path>.compiled.pkl)
+    и берутся оттуда, если он не старше YAML.
 
     Args:
         path (str): путь к topics.yml
@@ -53,8 +261,49 @@ def load_topics_cfg(path: str):
     Returns:
         List[Dict[str, Any]]: список тем с их id, именем и регулярками
     """
+    return _load_topics_cfg(path, os.path.getmtime(path))
+
+@lru_cache(maxsize=None)
+def _load_topics_cfg(path: str, mtime: float):
+    cache_path = path + ".compiled.pkl"
+    # паттерны RE2 и re несовместимы — кэш привязан к движку
+    engine = "re2" if re2 is not None else "re"
+    topics = _read_compiled_cache(cache_path, mtime, engine)
+    if topics is not None:
+        return topics
+
+    with open(path, encoding="utf-8") as f:
+        cfg = yaml.load(f, Loader=SafeLoader)
+    topics = _compile_topics(cfg)
+    _write_compiled_cache(cache_path, engine, topics)
+    return topics
 
-    cfg = yaml.safe_load(open(path, encoding="utf-8"))
+def _read_compiled_cache(cache_path: str, mtime: float, engine: str):
+    """Темы из pickle-кэша; None, если его нет, он устарел или не читается."""
+    try:
+        if os.path.getmtime(cache_path) < mtime:
+            return None
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    if cached.get("version") != TOPICS_CACHE_VERSION or cached.get("engine") != engine:
+        return None
+    return cached["topics"]
+
+def _write_compiled_cache(cache_path: str, engine: str, topics: List[Dict[str, Any]]):
+    """Атомарно сохраняет темы в pickle-кэш; недоступный для записи каталог не ошибка."""
+    tmp_path = cache_path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"version": TOPICS_CACHE_VERSION, "engine": engine, "topics": topics},
+                        f, protocol=5)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+def _compile_topics(cfg: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Компилирует паттерны всех тем из разобранного YAML."""
     topics = []
     for t in cfg["topics"]:
         include = t.get("include") or t.get("synonyms") or [] 
@@ -63,13 +312,19 @@ def load_topics_cfg(path: str):
         topics.append({
             "id": t["id"],
             "name": t.get("name", t["id"]),
+            "include": include,
+            "exclude": exclude,
+            "cooccur": cooccur,
             "include_re": [_compile_token(x) for x in include],
             "exclude_re": [_compile_token(x) for x in exclude],
             "cooccur_re": [_compile_token(x) for x in cooccur],
+            "include_re_fused": _fuse_tokens(include),
+            "exclude_re_fused": _fuse_tokens(exclude),
+            "cooccur_re_fused": _fuse_tokens(cooccur),
         })
     return topics
 
-def score_topic(text: str, topic: Dict[str, Any]) -> float:
+def score_topic(text_lower: str, topic: Dict[str, Any]) -> float:
     """
     Считает скор одной темы для данного текста.
 
@@ -78,51 +333,280 @@ def score_topic(text: str, topic: Dict[str, Any]) -> float:
     - cooccur → +0.5 за совпадение.
 
     Args:
-        text (str): клауза
+        text_lower (str): клауза в нижнем регистре
         topic (dict): описание темы
 
     Returns:
         float: суммарный скор
     """
-    t = text.lower()
     # hard stop
-    for r in topic["exclude_re"]:
-        if r.search(t):
-            return -1e9
+    if _has_hit(topic["exclude_re"], topic["exclude_re_fused"], text_lower):
+        return -1e9
     s = 0.0
     # include — основной сигнал
-    inc_hits = sum(1 for r in topic["include_re"] if r.search(t))
+    inc_hits = _count_hits(topic["include_re"], topic["include_re_fused"], text_lower)
     s += inc_hits * 1.0
     # cooccur — вспомогательный
-    coc_hits = sum(1 for r in topic["cooccur_re"] if r.search(t))
+    coc_hits = _count_hits(topic["cooccur_re"], topic["cooccur_re_fused"], text_lower)
     s += coc_hits * 0.5
     return s
 
-def match_topics_for_clause(text: str, topics: List[Dict[str, Any]],
-                            threshold: float = 1.0, top_k: int = 2) -> List[Tuple[str, float]]:
+def build_matcher(topics: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Собирает один автомат Aho-Corasick по литеральным токенам всех тем,
+    чтобы клауза сканировалась за один проход, а не паттерн за паттерном.
+
+    - Ключ автомата — первое слово токена (стем, окончание добираем \\w*).
+    - Однословный токен засчитывается, если слева от вхождения граница слова.
+    - Многословный токен дополнительно сверяется своей регуляркой с позиции вхождения.
+    - Токены-regex (редкие) остаются скомпилированными и проверяются отдельно.
+
+    Args:
+        topics (list): список тем из load_topics_cfg
+
+    Returns:
+        Optional[Dict[str, Any]]: автомат и regex-токены;
+            None, если pyahocorasick не установлен (тогда работает score_topic)
+    """
+    if ahocorasick is None:
+        return None
+
+    automaton = ahocorasick.Automaton()
+    regex_tokens = []
+    token_id = 0
+    for ti, topic in enumerate(topics):
+        for ki, kind in enumerate(KINDS):
+            for token in topic[kind]:
+                token_id += 1
+                if _is_regex_token(token):
+                    regex_tokens.append((ti, ki, _compile_token(token)))
+                    continue
+                words = token.lower().split()
+                if not words:
+                    continue
+                key = words[0]
+                # match() с позиции вхождения — только в диалекте re
+                verify = _compile_python(_token_pattern(token)) if len(words) > 1 else None
+                entries = automaton.get(key, None)
+                if entries is None:
+                    entries = []
+                    automaton.add_word(key, entries)
+                entries.append((ti, ki, token_id, len(key), verify))
+    automaton.make_automaton()
+    return {"automaton": automaton, "regex": regex_tokens, "n_topics": len(topics)}
+
+def score_clause(text_lower: str, matcher: Dict[str, Any]) -> np.ndarray:
+    """
+    Считает скоры всех тем для клаузы за один проход автомата.
+
+    Семантика та же, что у score_topic: каждый токен засчитывается один раз,
+    include → +1, cooccur → +0.5, любое совпадение exclude → -∞.
+
+    Args:
+        text_lower (str): клауза в нижнем регистре
+        matcher (dict): результат build_matcher
+
+    Returns:
+        np.ndarray: скоры тем в порядке списка topics
+    """
+    counts = np.zeros((matcher["n_topics"], len(KINDS)), dtype=np.int32)
+    seen = set()
+    for end, entries in matcher["automaton"].iter(text_lower):
+        for ti, ki, token_id, key_len, verify in entries:
+            if token_id in seen:
+                continue
+            start = end - key_len + 1
+            if start > 0 and _is_word_char(text_lower[start - 1]):
+                continue
+            if verify is not None and not verify.match(text_lower, start):
+                continue
+            seen.add(token_id)
+            counts[ti, ki] += 1
+    for ti, ki, r in matcher["regex"]:
+        if r.search(text_lower):
+            counts[ti, ki] += 1
+
+    scores = counts @ KIND_WEIGHTS
+    scores[counts[:, 1] > 0] = -1e9
+    return scores
+
+def topic_ids(topics: List[Dict[str, Any]]) -> np.ndarray:
+    """Массив id тем в порядке списка topics (для выборки по индексам)."""
+    return np.array([t["id"] for t in topics], dtype=object)
+
+def match_topics_for_clause(text_lower: str, topics: List[Dict[str, Any]],
+                            threshold: float = 1.0, top_k: int = 2,
+                            matcher: Optional[Dict[str, Any]] = None,
+                            ids: Optional[np.ndarray] = None,
+                            any_re=None) -> List[Tuple[str, float]]:
     """
     Возвращает список топ-N тем для клаузы.
 
     Args:
-        text (str): клауза
+        text_lower (str): клауза в нижнем регистре
         topics (list): список тем
         threshold (float): минимальный скор, ниже которого тема отбрасывается
         top_k (int): сколько тем максимум возвращать
+        matcher (dict, optional): автомат из build_matcher; без него — regex по темам
+        ids (np.ndarray, optional): заранее посчитанный topic_ids(topics)
+        any_re (optional): any_token_re(topics) — быстрый отсев клауз без единого токена
 
     Returns:
         List[Tuple[str, float]]: [(id, score), ...]
     """
 
-    scores = [(t["id"], score_topic(text, t)) for t in topics]
-    scores = [(tid, sc) for tid, sc in scores if sc >= threshold]
-    scores.sort(key=lambda x: x[1], reverse=True)
+    # без совпадений все скоры нулевые — при положительном пороге тем нет
+    if any_re is not None and threshold > 0 and any_re.search(text_lower) is None:
+        return []
+    if matcher is not None:
+        scores = score_clause(text_lower, matcher)
+    else:
+        scores = np.fromiter((score_topic(text_lower, t) for t in topics),
+                             dtype=float, count=len(topics))
+    k = min(top_k, len(topics))
+    if k <= 0:
+        return []
+    # k-й по величине скор без полной сортировки; кандидаты — все темы не ниже него
+    # (включая равные), порядок среди равных — как в topics.yml
+    part = np.argpartition(scores, -k)[-k:]
+    cand = np.flatnonzero((scores >= scores[part].min()) & (scores >= threshold))
+    idx = cand[np.argsort(-scores[cand], kind="stable")][:k]
     # (опц.) margin, чтобы не брать слабую вторую тему
-    if len(scores) >= 2 and scores[1][1] < scores[0][1] - 0.25:
-        scores = scores[:1]
-    return scores[:top_k]
+    if len(idx) >= 2 and scores[idx[1]] < scores[idx[0]] - 0.25:
+        idx = idx[:1]
+    if ids is None:
+        ids = topic_ids(topics)
+    return list(zip(ids[idx].tolist(), scores[idx].tolist()))
+
+def _column_hits(texts, patterns: list, fused) -> np.ndarray:
+    """
+    Для каждой клаузы столбца — число нашедшихся токенов (каждый один раз).
+    Общий паттерн сначала отбирает клаузы хоть с одним совпадением,
+    поштучно токены проверяются только на них.
+    """
+    counts = np.zeros(len(texts), dtype=np.int32)
+    if not patterns:
+        return counts
+    if fused is not None:
+        rows = np.flatnonzero(np.fromiter((fused.search(t) is not None for t in texts),
+                                          dtype=bool, count=len(texts)))
+    else:
+        rows = np.arange(len(texts))
+    sub = [texts[i] for i in rows]
+    for r in patterns:
+        counts[rows] += np.fromiter((r.search(t) is not None for t in sub),
+                                    dtype=np.int32, count=len(sub))
+    return counts
+
+def score_matrix(texts, topics: List[Dict[str, Any]],
+                 matcher: Optional[Dict[str, Any]] = None) -> np.ndarray:
+    """
+    Считает скоры всех тем для всех клауз сразу.
+
+    - С автоматом (build_matcher) — по строкам, один проход на клаузу.
+    - Без него — по столбцам: для каждой темы весь столбец проверяется
+      её паттернами, скоры собираются в матрицу NumPy.
+
+    Args:
+        texts: клаузы в нижнем регистре
+        topics (list): список тем
+        matcher (dict, optional): автомат из build_matcher
+
+    Returns:
+        np.ndarray: матрица скоров (n_clauses, n_topics)
+    """
+    scores = np.zeros((len(texts), len(topics)))
+    if matcher is not None:
+        for i, t in enumerate(texts):
+            scores[i] = score_clause(t, matcher)
+        return scores
+    for j, topic in enumerate(topics):
+        inc = _column_hits(texts, topic["include_re"], topic["include_re_fused"])
+        coc = _column_hits(texts, topic["cooccur_re"], topic["cooccur_re_fused"])
+        exc = _column_hits(texts, topic["exclude_re"], topic["exclude_re_fused"]) > 0
+        scores[:, j] = np.where(exc, -1e9, inc * 1.0 + coc * 0.5)
+    return scores
+
+def _top_topics(scores: np.ndarray, threshold: float, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Отбирает топ-N тем по матрице скоров с теми же правилами,
+    что match_topics_for_clause (порог, margin 0.25 для второй темы).
+
+    Сортировка стабильная: при равных скорах выигрывает тема,
+    стоящая раньше в topics.yml.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: индексы тем (n, k), -1 — пусто; их скоры
+    """
+    k = min(top_k, scores.shape[1])
+    masked = np.where(scores >= threshold, scores, -np.inf)
+    idx = np.argsort(-masked, axis=1, kind="stable")[:, :k]
+    top = np.take_along_axis(masked, idx, axis=1)
+    keep = np.isfinite(top)
+    if k >= 2:
+        # (опц.) margin, чтобы не брать слабую вторую тему
+        keep[top[:, 1] < top[:, 0] - 0.25, 1:] = False
+    return np.where(keep, idx, -1), top
+
+def _label_texts(texts, topics: List[Dict[str, Any]], matcher: Optional[Dict[str, Any]],
+                 threshold: float, top_k: int) -> Tuple[List[str], List[str]]:
+    """
+    Размечает последовательность клауз (уже в нижнем регистре).
+
+    Returns:
+        Tuple[List[str], List[str]]: строки topics_pred и topics_score
+    """
+    scores = np.zeros((len(texts), len(topics)))
+    any_re = any_token_re(topics) if matcher is None and threshold > 0 else None
+    if any_re is not None:
+        # скорим только клаузы, где есть хоть один токен; у остальных скоры нулевые
+        # (с автоматом этот отсев не нужен — он и так проходит клаузу один раз)
+        active = np.flatnonzero(np.fromiter((any_re.search(t) is not None for t in texts),
+                                            dtype=bool, count=len(texts)))
+        scores[active] = score_matrix([texts[i] for i in active], topics, matcher)
+    else:
+        scores = score_matrix(texts, topics, matcher)
+    idx, top = _top_topics(scores, threshold, top_k)
+    return _join_topics(idx, top, topic_ids(topics))
+
+def _join_topics(idx: np.ndarray, top: np.ndarray, ids: np.ndarray) -> Tuple[List[str], List[str]]:
+    """
+    Собирает строки topics_pred/topics_score («A;B», «2.00;1.50») по столбцам
+    матрицы топ-N, без списков на каждую строку. Заполненные позиции
+    в строке идут подряд с начала (пустые — только в хвосте).
+    """
+    n, k = idx.shape
+    labels = np.full(n, "", dtype=object)
+    values = np.full(n, "", dtype=object)
+    if k == 0:
+        return labels.tolist(), values.tolist()
+    valid = idx >= 0
+    names = np.where(valid, ids[np.where(valid, idx, 0)], "").astype(object)
+    formatted = np.where(valid, np.char.mod("%.2f", top), "").astype(object)
+    labels, values = names[:, 0], formatted[:, 0]
+    for j in range(1, k):
+        sep = np.where(valid[:, j], ";", "").astype(object)
+        labels = labels + sep + names[:, j]
+        values = values + sep + formatted[:, j]
+    return labels.tolist(), values.tolist()
+
+# Темы и автомат процесса-воркера (заполняются в _init_worker)
+_worker_topics: Optional[List[Dict[str, Any]]] = None
+_worker_matcher: Optional[Dict[str, Any]] = None
+
+def _init_worker(topics: List[Dict[str, Any]]):
+    """Инициализатор процесса пула: один раз принимает темы и строит автомат."""
+    global _worker_topics, _worker_matcher
+    _worker_topics = topics
+    _worker_matcher = build_matcher(topics)
+
+def _score_batch(texts, threshold: float, top_k: int) -> Tuple[List[str], List[str]]:
+    """Размечает свою часть клауз внутри процесса пула."""
+    return _label_texts(texts, _worker_topics, _worker_matcher, threshold, top_k)
 
 def label_dataframe(df: pd.DataFrame, text_col: str = "clause",
-                    threshold: float = 1.0, top_k: int = 2) -> pd.DataFrame:
+                    threshold: float = 1.0, top_k: int = 2,
+                    topics: Optional[List[Dict[str, Any]]] = None) -> pd.DataFrame:
     """
     Добавляет к DataFrame колонки с предсказанными темами.
 
@@ -131,21 +615,38 @@ def label_dataframe(df: pd.DataFrame, text_col: str = "clause",
         text_col (str): имя колонки с текстом
         threshold (float): порог для темы
         top_k (int): сколько максимум тем присвоить
+        topics (list, optional): заранее загруженные темы; по умолчанию — из TOPICS_YML
+
+    Число процессов задаёт переменная окружения TOPIC_MATCHER_WORKERS
+    (по умолчанию 1 — разметка в текущем процессе).
 
     Returns:
-        pd.DataFrame: тот же df с новыми колонками topics_pred и topics_score
+        pd.DataFrame: тот же df (изменяется на месте) с новыми колонками
+            topics_pred и topics_score
     """
     
-    topics = load_topics_cfg(TOPICS_YML)
-    out_labels, out_scores = [], []
-    for txt in df[text_col].astype(str):
-        hits = match_topics_for_clause(txt, topics, threshold=threshold, top_k=top_k)
-        out_labels.append(";".join([h[0] for h in hits]))
-        out_scores.append(";".join([f"{h[1]:.2f}" for h in hits]))
-    res = df.copy()
-    res["topics_pred"] = out_labels
-    res["topics_score"] = out_scores
-    return res
+    if topics is None:
+        topics = load_topics_cfg(TOPICS_YML)
+    # опускаем регистр один раз для всего столбца — паттерны без IGNORECASE;
+    # одинаковые клаузы (шаблонные фразы) размечаем один раз
+    codes, uniques = pd.factorize(df[text_col].fillna("").astype(str).str.lower(), sort=False)
+    texts = np.asarray(uniques, dtype=object)
+    n_workers = min(TOPIC_MATCHER_WORKERS, len(texts) // MIN_ROWS_PER_WORKER)
+    if n_workers > 1:
+        # клаузы независимы — режем на равные части и размечаем в процессах
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                 initargs=(topics,)) as executor:
+            parts = list(executor.map(_score_batch, np.array_split(texts, n_workers),
+                                      repeat(threshold), repeat(top_k), chunksize=1))
+        out_labels = [x for labels, _ in parts for x in labels]
+        out_scores = [x for _, scores in parts for x in scores]
+    else:
+        out_labels, out_scores = _label_texts(texts, topics, build_matcher(topics),
+                                              threshold, top_k)
+    # колонки добавляются в сам df: полная копия входа на каждой порции не нужна
+    df["topics_pred"] = np.asarray(out_labels, dtype=object)[codes]
+    df["topics_score"] = np.asarray(out_scores, dtype=object)[codes]
+    return df
 
 if __name__ == "__main__":
     # Демо-пример для быстрой проверки
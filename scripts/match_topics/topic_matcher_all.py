@@ -14,13 +14,44 @@
 """
 
 import pandas as pd
-from topic_matcher import label_dataframe
+from topic_matcher import TOPICS_YML, label_dataframe, load_topics_cfg
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv  # опционально: быстрый многопоточный парсер CSV
+except ImportError:
+    pa = None
 
 IN_PATH  = "data/interim/clauses.csv"
 OUT_PATH = "data/interim/clauses_with_topics.csv"
 
 TEXT_COL = "clause" 
 
+# Колонки, тип которых не выводим по первому блоку — всегда строки: review_id бывает
+# числом или hex-идентификатором, review_date — ISO или "DD.MM.YYYY HH:MM"
+STR_COLUMNS = (TEXT_COL, "review_id", "review_date", "source_file")
+
+# Размер блока потокового чтения pyarrow (байт)
+ARROW_BLOCK_SIZE = 8 << 20
+
+def iter_chunks(chunksize: int):
+    """
+    Отдаёт входной CSV порциями в виде DataFrame.
+
+    С pyarrow файл читается потоково блоками по ARROW_BLOCK_SIZE байт
+    нативным парсером; без него — pd.read_csv(chunksize=...).
+    """
+    if pa is None:
+        yield from pd.read_csv(IN_PATH, chunksize=chunksize, dtype={c: str for c in STR_COLUMNS})
+        return
+    reader = pa_csv.open_csv(
+        IN_PATH,
+        read_options=pa_csv.ReadOptions(block_size=ARROW_BLOCK_SIZE),
+        convert_options=pa_csv.ConvertOptions(column_types={c: pa.string() for c in STR_COLUMNS}),
+    )
+    for batch in reader:
+        yield batch.to_pandas()
+
 def main(threshold=1.0, top_k=2, chunksize=10000):
     """
     Основная функция пакетной обработки.
@@ -28,17 +59,20 @@ def main(threshold=1.0, top_k=2, chunksize=10000):
     Args:
         threshold (float): минимальный порог скора темы (темы с меньшим отбрасываются).
         top_k (int): сколько максимум тем сохранять для одной клаузы.
-        chunksize (int): сколько строк CSV читать за один раз (для экономии памяти).
+        chunksize (int): сколько строк CSV читать за один раз (для экономии памяти);
+            при установленном pyarrow порция задаётся ARROW_BLOCK_SIZE.
 
     Workflow:
-        1. Читаем clauses.csv порциями (chunksize строк).
-        2. Для каждой порции применяем label_dataframe().
-        3. Сохраняем результат в clauses_with_topics.csv (построчно дозаписываем).
+        1. Один раз загружаем темы из topics.yml.
+        2. Читаем clauses.csv порциями (chunksize строк).
+        3. Для каждой порции применяем label_dataframe().
+        4. Сохраняем результат в clauses_with_topics.csv (построчно дозаписываем).
     """
+    topics = load_topics_cfg(TOPICS_YML)
     first = True
-    for chunk in pd.read_csv(IN_PATH, chunksize=chunksize):
+    for chunk in iter_chunks(chunksize):
         labeled = label_dataframe(chunk, text_col=TEXT_COL,
-                                  threshold=threshold, top_k=top_k)
+                                  threshold=threshold, top_k=top_k, topics=topics)
         labeled.to_csv(OUT_PATH, index=False, mode="w" if first else "a",
                        header=first, encoding="utf-8")
         first = False
@@ -3,11 +3,13 @@
 Скрипт для объединения всех JSON файлов с отзывами в один файл
 """
 
-import json
+import orjson
 import os
 import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Tuple
 import logging
 
 # Настройка логирования
@@ -17,6 +19,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Сериализация отзывов: отступ как у json.dump(indent=2), нестроковые ключи допускаются
+REVIEW_DUMP_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+
+# Потоки для чтения и парсинга исходных файлов (I/O и orjson отпускают GIL)
+MAX_LOAD_WORKERS = 8
+# Сколько файлов может быть прочитано наперёд — ограничивает память
+LOAD_AHEAD = 8
+
+# Обязательные поля отзыва
+REQUIRED_FIELDS = frozenset(('review_id', 'review_text', 'review_date', 'product_type'))
+
 def find_json_files(directory: Path) -> List[Path]:
     """Найти все JSON файлы в директории"""
     json_files = []
@@ -28,8 +41,8 @@ def find_json_files(directory: Path) -> List[Path]:
 def load_and_validate_json(file_path: Path) -> List[Dict[Any, Any]]:
     """Загрузить и валидировать JSON файл"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with open(file_path, 'rb') as f:
+            data = orjson.loads(f.read())
         
         if isinstance(data, list):
             logger.info(f"✓ {file_path.name}: {len(data)} записей")
@@ -42,29 +55,56 @@ def load_and_validate_json(file_path: Path) -> List[Dict[Any, Any]]:
             logger.warning(f"⚠ {file_path.name}: неожиданная структура данных")
             return []
     
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         logger.error(f"✗ {file_path.name}: ошибка парсинга JSON - {e}")
         return []
     except Exception as e:
         logger.error(f"✗ {file_path.name}: ошибка чтения файла - {e}")
         return []
 
-def validate_review_structure(review: Dict[Any, Any], file_name: str) -> bool:
+def validate_review_structure(review: Dict[Any, Any]) -> bool:
     """Проверить структуру отзыва"""
-    required_fields = ['review_id', 'review_text', 'review_date', 'product_type']
-    
-    for field in required_fields:
-        if field not in review:
-            return False
-    
-    # Проверяем, что текст отзыва не пустой
-    if not review.get('review_text', '').strip():
+    if not isinstance(review, dict) or not REQUIRED_FIELDS <= review.keys():
         return False
     
-    return True
+    # Проверяем, что текст отзыва не пустой (isspace не создаёт копию строки, как strip)
+    text = review['review_text']
+    return isinstance(text, str) and bool(text) and not text.isspace()
+
+
+def iter_loaded_files(json_files: List[Path]) -> Iterator[Tuple[Path, List[Dict[Any, Any]]]]:
+    """
+    Загружать файлы в пуле потоков и отдавать их в исходном порядке.
+    Наперёд читается не больше LOAD_AHEAD файлов.
+    """
+    files = iter(json_files)
+    with ThreadPoolExecutor(max_workers=min(MAX_LOAD_WORKERS, len(json_files))) as executor:
+        pending = deque()
+        for file_path in files:
+            pending.append((file_path, executor.submit(load_and_validate_json, file_path)))
+            if len(pending) >= LOAD_AHEAD:
+                break
+        while pending:
+            file_path, future = pending.popleft()
+            next_path = next(files, None)
+            if next_path is not None:
+                pending.append((next_path, executor.submit(load_and_validate_json, next_path)))
+            yield file_path, future.result()
+
+def write_review(out, review: Dict[Any, Any], first: bool) -> None:
+    """
+    Дописать один отзыв в открытый JSON-массив.
+    Формат совпадает с json.dump(..., indent=2) для всего списка.
+    """
+    out.write(b'\n  ' if first else b',\n  ')
+    out.write(orjson.dumps(review, option=REVIEW_DUMP_OPTIONS).replace(b'\n', b'\n  '))
 
 def merge_json_files(source_dir: str, output_file: str) -> None:
-    """Объединить все JSON файлы в один"""
+    """
+    Объединить все JSON файлы в один.
+    Отзывы пишутся в выходной файл потоково, по мере чтения исходных файлов,
+    поэтому в памяти одновременно держится только один исходный файл.
+    """
     source_path = Path(source_dir)
     output_path = Path(output_file)
     
@@ -81,7 +121,6 @@ def merge_json_files(source_dir: str, output_file: str) -> None:
     
     logger.info(f"Найдено {len(json_files)} JSON файлов")
     
-    all_reviews = []
     stats = {
         'total_files': len(json_files),
         'processed_files': 0,
@@ -91,48 +130,55 @@ def merge_json_files(source_dir: str, output_file: str) -> None:
         'files_stats': {}
     }
     
-    for file_path in json_files:
-        logger.info(f"Обработка {file_path.name}...")
-        
-        reviews = load_and_validate_json(file_path)
-        if not reviews:
-            continue
-        
-        valid_count = 0
-        invalid_count = 0
-        
-        for review in reviews:
-            if validate_review_structure(review, file_path.name):
-                all_reviews.append(review)
-                valid_count += 1
-            else:
-                invalid_count += 1
-        
-        stats['processed_files'] += 1
-        stats['valid_reviews'] += valid_count
-        stats['invalid_reviews'] += invalid_count
-        stats['files_stats'][file_path.name] = {
-            'total': len(reviews),
-            'valid': valid_count,
-            'invalid': invalid_count
-        }
-        
-        logger.info(f"  Валидных отзывов: {valid_count}, невалидных: {invalid_count}")
-    
-    stats['total_reviews'] = len(all_reviews)
-    
     # Создаем директорию для выходного файла если не существует
     output_path.parent.mkdir(parents=True, exist_ok=True)
     
-    # Сохраняем объединенный файл
+    # Пишем объединенный файл по мере обработки исходных
     logger.info(f"Сохранение объединенного файла в {output_path}")
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(all_reviews, f, ensure_ascii=False, indent=2)
+    # пишем во временный файл и подменяем им целевой в конце: при сбое
+    # на месте остаётся прежний merged-файл, а не обрезанный JSON
+    tmp_path = output_path.with_suffix(output_path.suffix + '.tmp')
+    written = 0
+    with open(tmp_path, 'wb') as out:
+        out.write(b'[')
+        for file_path, reviews in iter_loaded_files(json_files):
+            logger.info(f"Обработка {file_path.name}...")
+            
+            if not reviews:
+                continue
+            
+            valid_count = 0
+            invalid_count = 0
+            
+            for review in reviews:
+                if validate_review_structure(review):
+                    write_review(out, review, first=written == 0)
+                    written += 1
+                    valid_count += 1
+                else:
+                    invalid_count += 1
+            
+            stats['processed_files'] += 1
+            stats['valid_reviews'] += valid_count
+            stats['invalid_reviews'] += invalid_count
+            stats['files_stats'][file_path.name] = {
+                'total': len(reviews),
+                'valid': valid_count,
+                'invalid': invalid_count
+            }
+            
+            logger.info(f"  Валидных отзывов: {valid_count}, невалидных: {invalid_count}")
+        out.write(b'\n]' if written else b']')
+    os.replace(tmp_path, output_path)
+    
+    stats['total_reviews'] = written
     
     # Сохраняем статистику
     stats_path = output_path.with_suffix('.stats.json')
-    with open(stats_path, 'w', encoding='utf-8') as f:
-        json.dump(stats, f, ensure_ascii=False, indent=2)
+    stats_tmp_path = stats_path.with_suffix(stats_path.suffix + '.tmp')
+    with open(stats_tmp_path, 'wb') as f:
+        f.write(orjson.dumps(stats, option=orjson.OPT_INDENT_2))
+    os.replace(stats_tmp_path, stats_path)
     
     # Выводим итоговую статистику
     logger.info("=" * 50)
@@ -1,3 +1,4 @@
+import argparse
 import pandas as pd
 import sys
 
@@ -14,14 +15,19 @@ sys.modules["scripts.models.inference_tfidf"] = fake_module
 MODEL_PATH = "models/tfidf_lr/model.pkl"
 CSV_PATH   = "data/interim/clauses.csv"
 
+parser = argparse.ArgumentParser(description="Отладочный прогон TF-IDF модели на клаузах")
+parser.add_argument("--csv", default=CSV_PATH, help="Путь к CSV с клаузами")
+parser.add_argument("--limit", type=int, default=0,
+                    help="Сколько первых строк читать (0 — весь файл)")
+parser.add_argument("--out", default="data/processed/test_tfidf_40.csv",
+                    help="Куда сохранить результат")
+args = parser.parse_args()
+
 # загружаем модель
 clf = TfidfClassifier(MODEL_PATH)
 
-# читаем данные
-df = pd.read_csv(CSV_PATH)
-
-# берём только первые 40
-#df_sample = df.head(40)
+# читаем данные (при --limit парсим только нужные строки, а не весь файл)
+df = pd.read_csv(args.csv, nrows=args.limit or None)
 
 # предсказываем
 res = clf.predict_dataframe(df, text_col="clause")
@@ -30,5 +36,5 @@ res = clf.predict_dataframe(df, text_col="clause")
 print(res[["clause", "pred"]])
 
 # можно сохранить для отладки
-res.to_csv("data/processed/test_tfidf_40.csv", index=False)
-print("✅ Результат сохранён в data/processed/test_tfidf_40.csv")
\ No newline at end of file
+res.to_csv(args.out, index=False)
+print("✅ Результат сохранён в", args.out)
\ No newline at end of file
@@ -1,3 +1,4 @@
+import argparse
 import pandas as pd
 import torch
 from backend.app.ml.xlmr_model import load_pretrained, predict
@@ -7,15 +8,24 @@ MODEL_PATH = "models/xlmr"
 CSV_PATH   = "data/interim/clauses.csv"
 OUT_PATH   = "data/processed/test_xlmr_40.csv"
 
+parser = argparse.ArgumentParser(description="Отладочный прогон XLM-R модели на клаузах")
+parser.add_argument("--csv", default=CSV_PATH, help="Путь к CSV с клаузами")
+parser.add_argument("--limit", type=int, default=40,
+                    help="Сколько первых строк читать (0 — весь файл)")
+parser.add_argument("--out", default=OUT_PATH, help="Куда сохранить результат")
+args = parser.parse_args()
+
 device = "cuda" if torch.cuda.is_available() else "cpu"
 print('device:', device)
 tok, mdl, cfg = load_pretrained(MODEL_PATH, device)
 
 
-df = pd.read_csv(CSV_PATH).head(40)
-preds, probs = predict(df["clause"].astype(str).tolist(), tok, mdl, max_len=cfg.get("max_len", 128), device=device)
+# читаем только нужные строки, а не весь файл
+df = pd.read_csv(args.csv, nrows=args.limit or None)
+preds, probs = predict(df["clause"].astype(str).tolist(), tok, mdl, max_len=cfg.get("max_len", 128),
+                       device=device, fp16=device == "cuda")
 
 res = postprocess(preds, probs, df, cfg["classes"], cfg["id2sent"], tau=0.5)
-res.to_csv(OUT_PATH, index=False)
+res.to_csv(args.out, index=False)
 
-print("✅ Результат сохранён в", OUT_PATH)
+print("✅ Результат сохранён в", args.out)
@@ -1,19 +1,44 @@
 import re
 import time
-import json
 import csv
-from dataclasses import dataclass, asdict
+import logging
+from dataclasses import dataclass, fields
+from functools import lru_cache
 from typing import List, Optional
 from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+import orjson
 import requests
-from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
 import random
 import os
+import queue
+import statistics
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+try:
+    import ahocorasick  # pyahocorasick — опционально, все маркеры текста ищутся за один проход
+except ImportError:
+    ahocorasick = None
+
+try:
+    import requests_cache  # requests-cache — опционально, дисковый кэш страниц отзывов
+except ImportError:
+    requests_cache = None
+
+# Уровень логов: INFO — по строке на страницу, DEBUG — ещё и на каждый отзыв
+logging.basicConfig(
+    level=os.environ.get("BANKI_LOG_LEVEL", "INFO"),
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
 # ===================== CONFIG =====================
 BASE = "https://www.banki.ru"
 
@@ -28,11 +53,37 @@ os.makedirs(RAW_DIR, exist_ok=True)
 # Временной фильтр (включительно)
 DATE_FROM = datetime(2024, 1, 1, 0, 0, 0)
 DATE_TO   = datetime(2025, 5, 31, 23, 59, 59)
+
+# Сколько отзывов качаем одновременно
+DETAIL_CONCURRENCY = 8
+# На сколько страниц списка загрузчик может уйти вперёд обработки отзывов
+LISTING_PREFETCH = 2
+
+# Дисковый кэш страниц отзывов (sqlite, нужен requests-cache): повторный прогон
+# по тем же отзывам не ходит в сеть. None — не кэшировать
+HTTP_CACHE_PATH = os.path.join(RAW_DIR, "http_cache")
+HTTP_CACHE_EXPIRE_SEC = 24 * 3600
 # ==================================================
 
 
 def make_session() -> requests.Session:
-    s = requests.Session()
+    cached = requests_cache is not None and HTTP_CACHE_PATH is not None
+    if cached:
+        s = requests_cache.CachedSession(
+            HTTP_CACHE_PATH,
+            backend="sqlite",
+            expire_after=HTTP_CACHE_EXPIRE_SEC,
+            # списки отзывов меняются от прогона к прогону — кэшируем только сами отзывы
+            urls_expire_after={
+                "*/services/responses/bank/response/*": HTTP_CACHE_EXPIRE_SEC,
+                "*": requests_cache.DO_NOT_CACHE,
+            },
+            allowable_methods=("GET",),
+            # недогруженные страницы (см. fetch_html) не кэшируем
+            filter_fn=lambda r: len(r.content) >= 1500,
+        )
+    else:
+        s = requests.Session()
     s.headers.update({
         "User-Agent": ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
                        "AppleWebKit/537.36 (KHTML, like Gecko) "
@@ -40,19 +91,46 @@ def make_session() -> requests.Session:
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
         "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.7,en;q=0.6",
         "Referer": "https://www.banki.ru/",
-        "Cache-Control": "no-cache",
-        "Pragma": "no-cache",
+        "Connection": "keep-alive",
     })
+    if not cached:
+        # с requests-cache эти заголовки отключили бы чтение из кэша
+        s.headers.update({"Cache-Control": "no-cache", "Pragma": "no-cache"})
+    # на 429/503 ждём столько, сколько просит сервер в Retry-After, иначе — экспоненциальный backoff
     retry = Retry(total=5, connect=3, read=3, backoff_factor=0.6,
                   status_forcelist=[429, 500, 502, 503, 504],
-                  allowed_methods=["HEAD", "GET", "OPTIONS"])
-    adapter = HTTPAdapter(max_retries=retry, pool_connections=10, pool_maxsize=10)
+                  allowed_methods=["HEAD", "GET", "OPTIONS"],
+                  respect_retry_after_header=True)
+    # все запросы идут на один хост: один пул, но с запасом соединений под DETAIL_CONCURRENCY
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=1, pool_maxsize=64, pool_block=False)
     s.mount("https://", adapter)
     s.mount("http://", adapter)
     return s
 
 
 SESSION = make_session()
+# общий лимит одновременных запросов к сайту (страницы списка + отзывы)
+HTTP_SEMAPHORE = threading.Semaphore(DETAIL_CONCURRENCY)
+# время ответа последних сетевых запросов, сек (для polite_delay)
+RECENT_RTT: deque[float] = deque(maxlen=32)
+
+
+def polite_delay(delay_sec: float) -> float:
+    """
+    Пауза между страницами списка с поправкой на скорость сайта.
+
+    Если сайт и так отвечает медленно (медиана последних ответов >= delay_sec),
+    сами не ждём; если быстро — ждём delay_sec минус медиану, но не меньше 0.5 с.
+
+    Returns:
+        float: Сколько секунд спать (с небольшим случайным разбросом).
+    """
+    if not RECENT_RTT:
+        return delay_sec * random.uniform(0.8, 1.2)
+    rtt = statistics.median(list(RECENT_RTT))
+    if rtt >= delay_sec:
+        return 0.0
+    return max(0.5, delay_sec - rtt) * random.uniform(0.8, 1.2)
 
 
 @dataclass
@@ -96,22 +174,125 @@ class Category:
     file_name: Optional[str] = None  # имя файла без .json
 
 
-def set_page_param(url: str, page: int) -> str:
+@lru_cache(maxsize=None)
+def _page_url_parts(url: str) -> tuple[str, str]:
+    """
+    Разбирает URL категории один раз: всё до номера страницы и после него.
+
+    Returns:
+        tuple[str, str]: ("<scheme>://<host><path>?page=", "&<остальные параметры>" или "").
+    """
     u = urlsplit(url)
-    pairs = parse_qsl(u.query, keep_blank_values=True)
-    pairs = [(k, v) for (k, v) in pairs if k != "page"]
-    new_pairs = [("page", str(page))] + pairs
-    return urlunsplit((u.scheme, u.netloc, u.path, urlencode(new_pairs, doseq=True), ""))
+    pairs = [(k, v) for (k, v) in parse_qsl(u.query, keep_blank_values=True) if k != "page"]
+    rest = urlencode(pairs, doseq=True)
+    prefix = urlunsplit((u.scheme, u.netloc, u.path, "", "")) + "?page="
+    return prefix, "&" + rest if rest else ""
+
+
+def set_page_param(url: str, page: int) -> str:
+    prefix, suffix = _page_url_parts(url)
+    return f"{prefix}{page}{suffix}"
+
+
+RE_DATE_DOT = re.compile(r"\b(\d{2})\.(\d{2})\.(\d{4})\s+(\d{2}):(\d{2})\b")
+RE_DATE_ISO = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2})")
+RE_DATE_DOT_TEXT = re.compile(r"\b(\d{2}\.\d{2}\.\d{4}\s+\d{2}:\d{2})\b")
+RE_DATE_ISO_ATTR = re.compile(r"(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2})")
+RE_USER = re.compile(r"\b(user[_\-\d]+)\b")
+RE_LOCATION = re.compile(r"(?:^|\s)(г\.\s*[А-ЯЁA-Za-zё\- ]+|[А-ЯЁ][а-яёA-Za-z\- ]+\s*\([^)]+\))")
+RE_RATING = re.compile(r"\b([1-5])\b")
+RE_RATING_TEXT = (re.compile(r"Оценка\s*([1-5])\b"), re.compile(r"Оценка\D{0,10}([1-5])\b"))
+# Непустая обрезанная строка, состоящая не только из «•-–—»; разрывы строк — как у str.splitlines
+LINE_BREAKS = "\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+RE_TEXT_LINE = re.compile(
+    rf"(?![•\-–—]+[^\S{LINE_BREAKS}]*(?:[{LINE_BREAKS}]|\Z))"
+    rf"\S(?:[^{LINE_BREAKS}]*\S)?"
+)
+RE_UNSAFE_NAME = re.compile(r'[^a-zA-Z0-9_-]+')
+BANK_HEADER_RE = re.compile(
+    r"(?m)^Газпромбанк\s*$"
+    r"(?:\r?\n)+"
+    r"("
+    r"\d{2}\.\d{2}\.\d{4}\s+\d{2}:\d{2}"
+    r"|"
+    r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}(?::\d{2})?(?:[+-]\d{2}:\d{2})?"
+    r")"
+)
+
+
+# Маркеры начала/конца текста отзыва и ответа банка (порядок START_MARKERS — приоритет)
+START_MARKERS = (
+    "Отзыв проверяется", "Отзыв проверяется.",
+    "Отзыв проверен", "Отзыв проверен.",
+    "Документы прикреплены",
+    "Проблема решена",
+)
+END_MARKERS = ("Комментарии", "Ответ банка", "Официальный ответ", "Оставьте отзыв", "Администратор народного рейтинга")
+RESPONSE_END_MARKERS = ("Комментарии", "Оставьте отзыв", "Администратор народного рейтинга")
+SERVICE_MARKERS = (
+    "Документы прикреплены",
+    "Отзыв проверяется", "Отзыв проверяется.",
+    "Отзыв проверен", "Отзыв проверен.",
+    "Проблема решена",
+)
+RE_LEADING_SERVICE_MARKERS = re.compile(
+    "(?:(?:" + "|".join(map(re.escape, sorted(SERVICE_MARKERS, key=len, reverse=True))) + r")\s*)+"
+)
+
+
+def build_marker_automaton(markers) -> Optional["ahocorasick.Automaton"]:
+    """
+    Собирает автомат Ахо-Корасик по маркерам.
+
+    Returns:
+        Automaton | None: None, если pyahocorasick не установлен.
+    """
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for marker in set(markers):
+        automaton.add_word(marker, marker)
+    automaton.make_automaton()
+    return automaton
+
+
+MARKER_AUTOMATON = build_marker_automaton(START_MARKERS + END_MARKERS + RESPONSE_END_MARKERS)
+
+
+def marker_positions(norm: str) -> Optional[dict[str, list[int]]]:
+    """
+    Позиции всех вхождений маркеров в norm за один проход автомата.
+
+    Returns:
+        dict | None: маркер -> возрастающий список позиций;
+            None, если автомата нет (тогда find_marker ищет через str.find).
+    """
+    if MARKER_AUTOMATON is None:
+        return None
+    positions: dict[str, list[int]] = {}
+    for end, marker in MARKER_AUTOMATON.iter(norm):
+        positions.setdefault(marker, []).append(end - len(marker) + 1)
+    return positions
+
+
+def find_marker(norm: str, marker: str, start: int, positions: Optional[dict[str, list[int]]]) -> int:
+    """Аналог norm.find(marker, start) по заранее найденным позициям."""
+    if positions is None:
+        return norm.find(marker, start)
+    for i in positions.get(marker, ()):
+        if i >= start:
+            return i
+    return -1
 
 
 def parse_review_datetime(s: str) -> Optional[datetime]:
     s = (s or "").strip()
-    m = re.search(r"\b(\d{2})\.(\d{2})\.(\d{4})\s+(\d{2}):(\d{2})\b", s)
+    m = RE_DATE_DOT.search(s)
     if m:
         d, mo, y, hh, mm = map(int, m.groups())
         try: return datetime(y, mo, d, hh, mm)
         except ValueError: return None
-    m2 = re.search(r"\b(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2})", s)
+    m2 = RE_DATE_ISO.search(s)
     if m2:
         y, mo, d, hh, mm = map(int, m2.groups())
         try: return datetime(y, mo, d, hh, mm)
@@ -138,31 +319,123 @@ def extract_validation(norm_text: str) -> tuple[Optional[str], Optional[bool]]:
 RE_VIEW = re.compile(r'/services/responses/bank/response/\d+/?', re.I)
 
 
-def get(url: str, referer: str | None = None) -> BeautifulSoup:
+# Теги, текст которых не виден на странице (BeautifulSoup.get_text их тоже пропускал)
+NON_TEXT_TAGS = frozenset(("script", "style", "template", "rt", "rp"))
+
+
+class ReviewPageTarget:
+    """
+    Target для lxml.etree.HTMLParser: за один потоковый проход по странице
+    отзыва собирает то, что нужно parse_detail, не строя DOM.
+
+    Тексты режутся по границам тегов и комментариев и обрезаются, как в
+    BeautifulSoup.get_text(strip=True), поэтому результат совпадает с
+    прежним разбором через дерево.
+    """
+
+    def __init__(self):
+        self.strings: list[str] = []             # весь видимый текст страницы
+        self.title: Optional[list[str]] = None   # первый <h1>
+        self.time: Optional[list[str]] = None    # первый <time>
+        self.time_datetime = ""
+        self.ratings: list[list[str]] = []       # элементы с классом *rating-grade*
+        self.paragraphs: list[list[str]] = []    # все <p>
+        self._stack: list[list] = []
+        self._active: list[list[str]] = []
+        self._skip = 0
+        self._buf: list[str] = []
+
+    def _flush(self):
+        if not self._buf:
+            return
+        text = "".join(self._buf).strip()
+        self._buf = []
+        if text and not self._skip:
+            self.strings.append(text)
+            for cap in self._active:
+                cap.append(text)
+
+    def start(self, tag, attrib):
+        self._flush()
+        caps = []
+        if tag in NON_TEXT_TAGS:
+            self._skip += 1
+        if tag == "h1" and self.title is None:
+            self.title = []
+            caps.append(self.title)
+        elif tag == "time" and self.time is None:
+            self.time = []
+            self.time_datetime = attrib.get("datetime") or ""
+            caps.append(self.time)
+        elif tag == "p":
+            self.paragraphs.append([])
+            caps.append(self.paragraphs[-1])
+        if "rating-grade" in (attrib.get("class") or ""):
+            self.ratings.append([])
+            caps.append(self.ratings[-1])
+        self._stack.append(caps)
+        self._active.extend(caps)
+
+    def end(self, tag):
+        self._flush()
+        if tag in NON_TEXT_TAGS:
+            self._skip -= 1
+        if self._stack:
+            caps = self._stack.pop()
+            if caps:
+                del self._active[-len(caps):]
+
+    def data(self, data):
+        self._buf.append(data)
+
+    def comment(self, text):
+        self._flush()
+
+    def close(self):
+        self._flush()
+        return self
+
+
+def parse_review_page(html: str) -> ReviewPageTarget:
+    parser = etree.HTMLParser(target=ReviewPageTarget())
+    parser.feed(html)
+    return parser.close()
+
+
+def fetch_html(url: str, referer: str | None = None) -> str:
     timeout = (10, 60)
     headers = {"Referer": referer} if referer else {}
-    resp = SESSION.get(url, timeout=timeout, headers=headers)
-    resp.raise_for_status()
-    html = resp.text
-    if not html or len(html) < 1500:
-        time.sleep(1.2 + random.random())
+    with HTTP_SEMAPHORE:
         resp = SESSION.get(url, timeout=timeout, headers=headers)
         resp.raise_for_status()
         html = resp.text
-    return BeautifulSoup(html, "lxml")
+        if not getattr(resp, "from_cache", False):
+            RECENT_RTT.append(resp.elapsed.total_seconds())
+            time.sleep(random.uniform(0.2, 0.5))
+        if not html or len(html) < 1500:
+            time.sleep(1.2 + random.random())
+            resp = SESSION.get(url, timeout=timeout, headers=headers)
+            resp.raise_for_status()
+            html = resp.text
+    return html
+
+
+XPATH_REVIEW_HREFS = './/a[contains(@href, "/services/responses/bank/response/")]/@href'
+# На сколько уровней вверх от ссылки ищем карточку отзыва с <time> на странице списка
+LISTING_ITEM_DEPTH = 6
 
 
-def extract_review_links(soup, reverse=False) -> list[str]:
+def extract_review_links(tree, html: str, reverse=False) -> list[str]:
     seen, links = set(), []
-    for a in soup.select('a[href*="/services/responses/bank/response/"]'):
-        href = (a.get("href") or "").split("#")[0]
+    for href in tree.xpath(XPATH_REVIEW_HREFS):
+        href = href.split("#")[0]
         if "/services/responses/bank/response/" in href:
             url = urljoin(BASE, href)
             if url not in seen:
                 seen.add(url); links.append(url)
     if len(links) < 3:
-        raw = soup.decode()
-        for m in RE_VIEW.finditer(raw):
+        # запасной путь: ссылки прямо в исходном HTML (например, в скриптах)
+        for m in RE_VIEW.finditer(html):
             url = urljoin(BASE, m.group(0))
             if url not in seen:
                 seen.add(url); links.append(url)
@@ -170,85 +443,105 @@ def extract_review_links(soup, reverse=False) -> list[str]:
     return links
 
 
-def extract_rating(soup: BeautifulSoup, norm_text: str) -> Optional[int]:
-    for el in soup.select(".rating-grade, [class*='rating-grade']"):
-        txt = el.get_text(strip=True)
-        m = re.search(r"\b([1-5])\b", txt)
+def extract_listing_dates(tree) -> dict[str, datetime]:
+    """
+    Даты отзывов со страницы списка, чтобы не качать отзывы вне диапазона.
+
+    Для каждой ссылки на отзыв поднимаемся по предкам (не выше
+    LISTING_ITEM_DEPTH) до первого, где есть <time>; если по дороге
+    предок уже содержит ссылки на другие отзывы — карточки нет, дату не берём.
+
+    Returns:
+        dict[str, datetime]: URL отзыва -> дата; отзывов без даты в словаре нет.
+    """
+    dates: dict[str, datetime] = {}
+    for a in tree.xpath('//a[contains(@href, "/services/responses/bank/response/")]'):
+        url = urljoin(BASE, (a.get("href") or "").split("#")[0])
+        if url in dates:
+            continue
+        el = a
+        for _ in range(LISTING_ITEM_DEPTH):
+            el = el.getparent()
+            if el is None:
+                break
+            if any(urljoin(BASE, h.split("#")[0]) != url for h in el.xpath(XPATH_REVIEW_HREFS)):
+                break
+            t = el.find(".//time")
+            if t is not None:
+                dt = parse_review_datetime(t.get("datetime") or t.text_content())
+                if dt:
+                    dates[url] = dt
+                break
+    return dates
+
+
+def extract_rating(page: ReviewPageTarget, norm_text: str) -> Optional[int]:
+    for strings in page.ratings:
+        txt = "".join(strings)
+        m = RE_RATING.search(txt)
         if m: return int(m.group(1))
-    for patt in (r"Оценка\s*([1-5])\b", r"Оценка\D{0,10}([1-5])\b"):
-        m = re.search(patt, norm_text)
+    # оба шаблона начинаются с литерала — до первого "Оценка" искать нечего
+    pos = norm_text.find("Оценка")
+    if pos == -1:
+        return None
+    for patt in RE_RATING_TEXT:
+        m = patt.search(norm_text, pos)
         if m: return int(m.group(1))
     return None
 
 
 def parse_detail(url: str) -> Review:
-    soup = get(url)
+    page = parse_review_page(fetch_html(url))
 
-    title_el = soup.find("h1")
-    title = title_el.get_text(strip=True) if title_el else ""
+    title = "".join(page.title) if page.title is not None else ""
 
     # Дата
     date = ""
-    t = soup.find("time")
-    if t:
-        date = t.get_text(strip=True) or ""
-        if not re.search(r"\d{2}\.\d{2}\.\d{4}\s+\d{2}:\d{2}", date):
-            dt_attr = t.get("datetime") or ""
-            m = re.search(r"(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2})", dt_attr)
+    if page.time is not None:
+        date = "".join(page.time)
+        if not RE_DATE_DOT_TEXT.search(date):
+            dt_attr = page.time_datetime
+            m = RE_DATE_ISO_ATTR.search(dt_attr)
             if m:
                 y, mo, d, hh, mm = m.groups()
                 date = f"{d}.{mo}.{y} {hh}:{mm}"
 
-    norm = soup.get_text("\n", strip=True)
+    norm = "\n".join(page.strings)
     if not date:
-        m_date = re.search(r"\b(\d{2}\.\d{2}\.\d{4}\s+\d{2}:\d{2})\b", norm)
+        m_date = RE_DATE_DOT_TEXT.search(norm)
         date = m_date.group(1) if m_date else ""
     date_dt = parse_review_datetime(date)
 
     # Автор / город (мягко)
     author = None
     location = None
-    m_user = re.search(r"\b(user[_\-\d]+)\b", norm)
+    m_user = RE_USER.search(norm)
     if m_user:
         author = m_user.group(1)
-        m_loc = re.search(r"(?:^|\s)(г\.\s*[А-ЯЁA-Za-zё\- ]+|[А-ЯЁ][а-яёA-Za-z\- ]+\s*\([^)]+\))", norm)
+        m_loc = RE_LOCATION.search(norm)
         if m_loc:
             location = m_loc.group(1).strip()
 
-    rating = extract_rating(soup, norm)
+    rating = extract_rating(page, norm)
     validation, is_valid = extract_validation(norm)
 
     # Основной текст
-    start_markers = [
-        "Отзыв проверяется", "Отзыв проверяется.",
-        "Отзыв проверен", "Отзыв проверен.",
-        "Документы прикреплены",
-        "Проблема решена",
-    ]
-    end_markers = ["Комментарии", "Ответ банка", "Официальный ответ", "Оставьте отзыв", "Администратор народного рейтинга"]
-
+    positions = marker_positions(norm)
     start_idx = None
-    for sm in start_markers:
-        i = norm.find(sm)
+    for sm in START_MARKERS:
+        i = find_marker(norm, sm, 0, positions)
         if i != -1:
             start_idx = i + len(sm)
             break
 
-    BANK_HEADER_RE = re.compile(
-        r"(?m)^Газпромбанк\s*$"
-        r"(?:\r?\n)+"
-        r"("
-        r"\d{2}\.\d{2}\.\d{4}\s+\d{2}:\d{2}"
-        r"|"
-        r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}(?::\d{2})?(?:[+-]\d{2}:\d{2})?"
-        r")"
-    )
-    bank_header = BANK_HEADER_RE.search(norm)
+    # у большинства отзывов ответа банка нет — многострочный regex запускаем только от первого "Газпромбанк"
+    bank_pos = norm.find("Газпромбанк")
+    bank_header = BANK_HEADER_RE.search(norm, bank_pos) if bank_pos != -1 else None
 
     end_candidates = []
     if start_idx is not None:
-        for em in end_markers:
-            j = norm.find(em, start_idx)
+        for em in END_MARKERS:
+            j = find_marker(norm, em, start_idx, positions)
             if j != -1:
                 end_candidates.append(j)
         if bank_header:
@@ -258,24 +551,12 @@ def parse_detail(url: str) -> Review:
 
     if start_idx is not None:
         chunk = norm[start_idx:end_idx].strip() if end_idx is not None else norm[start_idx:].strip()
-        service_markers = [
-            "Документы прикреплены",
-            "Отзыв проверяется", "Отзыв проверяется.",
-            "Отзыв проверен", "Отзыв проверен.",
-            "Проблема решена",
-        ]
-        changed = True
-        while changed:
-            changed = False
-            for sm in service_markers:
-                if chunk.startswith(sm):
-                    chunk = chunk[len(sm):].lstrip()
-                    changed = True
-        lines = [l.strip() for l in chunk.splitlines()]
-        lines = [l for l in lines if l and not re.fullmatch(r"[•\-–—]+", l)]
-        review_text = "\n\n".join(lines).strip()
+        m_lead = RE_LEADING_SERVICE_MARKERS.match(chunk)
+        if m_lead:
+            chunk = chunk[m_lead.end():]
+        review_text = "\n\n".join(RE_TEXT_LINE.findall(chunk))
     else:
-        ps = [p.get_text(" ", strip=True) for p in soup.select("article p, .article p, p")]
+        ps = [" ".join(p) for p in page.paragraphs]
         ps = [p for p in ps if len(p) > 40]
         review_text = "\n\n".join(ps) if ps else ""
 
@@ -286,15 +567,13 @@ def parse_detail(url: str) -> Review:
         bank_response_date = bank_header.group(1)
         resp_start = bank_header.end()
         resp_end_candidates = []
-        for em in ["Комментарии", "Оставьте отзыв", "Администратор народного рейтинга"]:
-            j = norm.find(em, resp_start)
+        for em in RESPONSE_END_MARKERS:
+            j = find_marker(norm, em, resp_start, positions)
             if j != -1:
                 resp_end_candidates.append(j)
         resp_end = min(resp_end_candidates) if resp_end_candidates else None
         resp_chunk = norm[resp_start:resp_end].strip() if resp_end is not None else norm[resp_start:].strip()
-        rlines = [l.strip() for l in resp_chunk.splitlines()]
-        rlines = [l for l in rlines if l and not re.fullmatch(r"[•\-–—]+", l)]
-        bank_response_text = "\n\n".join(rlines).strip()
+        bank_response_text = "\n\n".join(RE_TEXT_LINE.findall(resp_chunk))
 
     return Review(
         title=title,
@@ -312,105 +591,197 @@ def parse_detail(url: str) -> Review:
     )
 
 
+def _put_unless_stopped(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """Кладёт item в очередь, пока обход не остановлен; False — если остановлен."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def listing_producer(start_url: str,
+                     start_page: int,
+                     max_pages: int,
+                     delay_sec: float,
+                     reverse_page_order: bool,
+                     pages: queue.Queue,
+                     stop: threading.Event) -> None:
+    """
+    Поток-загрузчик страниц списка.
+
+    Кладёт в pages кортежи (page_idx, ссылки на отзывы для загрузки,
+    stop_after_page) и None в конце. Работает впереди обработки отзывов
+    не больше чем на размер очереди; выходит, как только выставлен stop.
+    """
+    seen_links = set()
+    prev_url = None
+    try:
+        for page_idx in range(start_page, start_page + max_pages):
+            if stop.is_set():
+                return
+            current_url = set_page_param(start_url, page_idx)
+            logger.info("[PAGE] %d: %s", page_idx, current_url)
+
+            try:
+                html = fetch_html(current_url, referer=prev_url)
+                tree = lxml.html.document_fromstring(html)
+            except Exception as e:
+                logger.warning("Не удалось открыть страницу: %s", e)
+                return
+
+            links_all = extract_review_links(tree, html, reverse=reverse_page_order)
+            new_links = [u for u in links_all if u not in seen_links]
+            logger.info("Найдено ссылок: всего=%d, новых=%d", len(links_all), len(new_links))
+
+            # если на странице нет новых ссылок — конец категории
+            if not new_links:
+                with open(os.path.join(RAW_DIR, f"page_{page_idx}.html"), "w", encoding="utf-8") as f:
+                    f.write(html)
+                logger.info("Пустая страница — сохраняем HTML и завершаем.")
+                return
+
+            seen_links.update(new_links)
+
+            # если дата видна уже в списке — отзывы вне диапазона не качаем
+            listing_dates = extract_listing_dates(tree)
+            to_fetch, stop_after_page = [], False
+            for link in new_links:
+                dt = listing_dates.get(link)
+                if dt is not None and dt < DATE_FROM:
+                    logger.info("  %s: %s < %s (по списку) — дальше не идём.", link, dt, DATE_FROM.date())
+                    stop_after_page = True
+                    break
+                if dt is not None and dt > DATE_TO:
+                    logger.debug("  %s: %s > %s (по списку) — пропускаем.", link, dt, DATE_TO.date())
+                    continue
+                to_fetch.append(link)
+
+            if not _put_unless_stopped(pages, (page_idx, to_fetch, stop_after_page), stop) or stop_after_page:
+                return
+
+            prev_url = current_url
+            # пауза между страницами, а не между отзывами
+            stop.wait(polite_delay(delay_sec))
+    except Exception:
+        logger.exception("Загрузчик страниц списка упал")
+    finally:
+        _put_unless_stopped(pages, None, stop)
+
+
 def crawl_fixed_pagination(start_url: str,
                            start_page: int = 677,
                            max_pages: int = 1200,
                            delay_sec: float = 2.0,
                            limit: Optional[int] = None,
                            reverse_page_order: bool = False,
-                           save_every_n_pages: int = 2,
-                           backup_prefix: str = "gazprombank_debitcards2",
-                           rotate_backups: bool = True) -> List[Review]:
+                           backup_prefix: str = "gazprombank_debitcards2") -> List[Review]:
     """
     Идём по страницам; собираем только в диапазоне дат.
     Досрочно останавливаемся, если встретился отзыв старше DATE_FROM.
+
+    Страницы списка качает отдельный поток (listing_producer), отзывы —
+    общий пул потоков; пока разбираются отзывы страницы N, следующая
+    страница и её отзывы уже загружаются. Результаты разбираются строго
+    в порядке страниц и ссылок, поэтому логика дат та же, что и при
+    последовательном обходе.
+
+    Каждый принятый отзыв сразу дописывается строкой в бэкап
+    RAW_DIR/<backup_prefix>.jsonl (файл открывается на дозапись, так что
+    при перезапуске с другой страницы старые строки сохраняются).
     """
-    seen_links = set()
     out: List[Review] = []
-    prev_url = None
-    last_backup_path: Optional[str] = None
-
-    for page_idx in range(start_page, start_page + max_pages):
-        current_url = set_page_param(start_url, page_idx)
-        print(f"[PAGE] {page_idx}: {current_url}")
+    backup_path = os.path.join(RAW_DIR, f"{backup_prefix}.jsonl")
+
+    pages: queue.Queue = queue.Queue(maxsize=LISTING_PREFETCH)
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=listing_producer,
+        args=(start_url, start_page, max_pages, delay_sec, reverse_page_order, pages, stop),
+        daemon=True,
+    )
+    ex = ThreadPoolExecutor(max_workers=DETAIL_CONCURRENCY)
+    # страницы, отзывы которых уже отправлены в пул: (page_idx, ссылки, futures, stop_after_page)
+    inflight = deque()
+    producer.start()
+    try:
+        with open(backup_path, "ab") as backup:
+            listing_done = False
+            while not listing_done or inflight:
+                if not listing_done:
+                    item = pages.get()
+                    if item is None:
+                        listing_done = True
+                    else:
+                        page_idx, to_fetch, stop_after_page = item
+                        futures = [ex.submit(parse_detail, u) for u in to_fetch]
+                        inflight.append((page_idx, to_fetch, futures, stop_after_page))
+                        # пока качаются отзывы этой страницы, берём из очереди следующую
+                        if len(inflight) < 2 and not stop_after_page:
+                            continue
+                if not inflight:
+                    continue
 
-        try:
-            soup = get(current_url, referer=prev_url)
-        except Exception as e:
-            print(f"[WARN] Не удалось открыть страницу: {e}")
-            break
+                page_idx, to_fetch, futures, stop_after_page = inflight.popleft()
+                accepted_before = len(out)
+                # результаты разбираем в порядке ссылок, чтобы досрочная остановка по дате была корректной
+                for i, (link, fut) in enumerate(zip(to_fetch, futures), 1):
+                    if limit is not None and len(out) >= limit:
+                        logger.info("Достигнут общий лимит записей.")
+                        return out
+                    try:
+                        rev = fut.result()
+                    except Exception as e:
+                        logger.warning("Ошибка парсинга %s: %s", link, e)
+                        continue
 
-        links_all = extract_review_links(soup, reverse=reverse_page_order)
-        new_links = [u for u in links_all if u not in seen_links]
-        print(f"[INFO] Найдено ссылок: всего={len(links_all)}, новых={len(new_links)}")
+                    # --- ключевая логика дат ---
+                    if rev.date_dt:
+                        if rev.date_dt < DATE_FROM:
+                            logger.info("  [%02d] %s < %s — прекращаем парсинг.", i, rev.date, DATE_FROM.date())
+                            return out  # досрочно завершаем обход
+                        if rev.date_dt > DATE_TO:
+                            logger.debug("  [%02d] %s > %s — пропускаем.", i, rev.date, DATE_TO.date())
+                            continue
+                    else:
+                        # если дату распарсить не удалось — пропустим
+                        logger.debug("  [%02d] не удалось распарсить дату — пропуск.", i)
+                        continue
+                    # --------------------------------
 
-        # если на странице нет новых ссылок — конец категории
-        if not new_links:
-            with open(os.path.join(RAW_DIR, f"page_{page_idx}.html"), "w", encoding="utf-8") as f:
-                f.write(soup.decode())
-            print("[INFO] Пустая страница — сохраняем HTML и завершаем.")
-            break
+                    out.append(rev)
+                    backup.write(orjson.dumps(to_parsed([rev], start=len(out))[0]) + b"\n")
+                    backup.flush()
+                    logger.debug("  [%02d] OK: %s — %s — rating=%s — %s", i, rev.title, rev.date, rev.rating, rev.validation)
 
-        seen_links.update(new_links)
-        for i, link in enumerate(new_links, 1):
-            if limit is not None and len(out) >= limit:
-                print("[INFO] Достигнут общий лимит записей.")
-                return out
-            try:
-                rev = parse_detail(link)
-
-                # --- ключевая логика дат ---
-                if rev.date_dt:
-                    if rev.date_dt < DATE_FROM:
-                        print(f"  [{i:02}] {rev.date} < {DATE_FROM.date()} — прекращаем парсинг.")
-                        return out  # досрочно завершаем обход
-                    if rev.date_dt > DATE_TO:
-                        print(f"  [{i:02}] {rev.date} > {DATE_TO.date()} — пропускаем.")
-                        continue
-                else:
-                    # если дату распарсить не удалось — пропустим
-                    print(f"  [{i:02}] не удалось распарсить дату — пропуск.")
-                    continue
-                # --------------------------------
+                logger.info("[PAGE] %d: принято %d, всего: %d", page_idx, len(out) - accepted_before, len(out))
 
-                out.append(rev)
-                print(f"  [{i:02}] OK: {rev.title} — {rev.date} — rating={rev.rating} — {rev.validation}")
-                time.sleep(delay_sec + random.uniform(0.4, 1.1))
-            except Exception as e:
-                print(f"[WARN] Ошибка парсинга {link}: {e}")
-
-        prev_url = current_url
-
-        # бэкап
-        if page_idx % save_every_n_pages == 0 and out:
-            parsed = to_parsed(out)
-            fname = os.path.join(RAW_DIR, f"{backup_prefix}_page{page_idx}.json")
-            if rotate_backups and last_backup_path and os.path.exists(last_backup_path):
-                try:
-                    os.remove(last_backup_path)
-                    print(f"[BACKUP] Удалён предыдущий бэкап: {last_backup_path}")
-                except Exception as e:
-                    print(f"[BACKUP] Не удалось удалить предыдущий бэкап {last_backup_path}: {e}")
-            with open(fname, "w", encoding="utf-8") as f:
-                json.dump([asdict(p) for p in parsed], f, ensure_ascii=False, indent=2)
-            last_backup_path = fname
-            print(f"[BACKUP] Сохранено {len(parsed)} отзывов в {fname}")
+                if stop_after_page:
+                    return out
+    finally:
+        stop.set()
+        ex.shutdown(wait=True, cancel_futures=True)
 
     return out
 
 
 def to_parsed(reviews: List[Review],
               bank_name: str = "gazprombank",
-              product_type_override: Optional[str] = None) -> List[ParsedReview]:
+              product_type_override: Optional[str] = None,
+              start: int = 1) -> List[ParsedReview]:
     parsed = []
-    for idx, r in enumerate(reviews, start=1):
+    # одна отметка времени на весь пакет
+    parsed_at = datetime.now().isoformat()
+    for idx, r in enumerate(reviews, start=start):
         parsed.append(
             ParsedReview(
                 review_id=str(idx),
                 review_text=r.text,
                 review_date=r.date,
                 url=r.url,
-                parsed_at=datetime.now().isoformat(),
+                parsed_at=parsed_at,
                 bank_name=bank_name,
                 product_type=product_type_override or product_type,
                 rating=r.rating,
@@ -425,32 +796,37 @@ def to_parsed(reviews: List[Review],
 def save_csv(items: List[Review], path: str):
     if not items: return
     with open(path, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=list(asdict(items[0]).keys()))
+        # dataclass'ы плоские — asdict с его глубоким копированием не нужен
+        w = csv.DictWriter(f, fieldnames=[fl.name for fl in fields(items[0])])
         w.writeheader()
-        for it in items: w.writerow(asdict(it))
+        w.writerows(vars(it) for it in items)
 
 
-def save_json(items: List[Review], path: str):
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump([asdict(it) for it in items], f, ensure_ascii=False, indent=2)
+def save_json(items: list, path: str):
+    """
+    Пишет список dataclass-объектов в JSON с отступом 2.
+
+    Запись идёт во временный файл и подменяется через os.replace, чтобы
+    прерванный на середине бэкап не портил уже лежащий на диске файл.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(items, option=orjson.OPT_INDENT_2))
+    os.replace(tmp_path, path)
 
 
 def crawl_categories(categories: List[Category],
-                     delay_sec: float = 2.5,
-                     save_every_n_pages: int = 2,
-                     rotate_backups: bool = True) -> List[ParsedReview]:
+                     delay_sec: float = 2.5) -> List[ParsedReview]:
     all_parsed: List[ParsedReview] = []
 
     for cat in categories:
-        print("\n" + "="*80)
-        print(f"[CATEGORY] {cat.product_type} — стартуем: {cat.url} (с {cat.start_page}-й страницы)")
-        print("="*80)
+        logger.info("[CATEGORY] %s — стартуем: %s (с %d-й страницы)", cat.product_type, cat.url, cat.start_page)
 
         global LIST_URL, product_type
         LIST_URL = cat.url
         product_type = cat.product_type
 
-        backup_prefix = cat.backup_prefix or re.sub(r'[^a-zA-Z0-9_-]+', '_', f"{cat.product_type}")
+        backup_prefix = cat.backup_prefix or RE_UNSAFE_NAME.sub('_', f"{cat.product_type}")
 
         reviews = crawl_fixed_pagination(
             start_url=cat.url,
@@ -459,24 +835,21 @@ def crawl_categories(categories: List[Category],
             delay_sec=delay_sec,
             limit=None,
             reverse_page_order=False,
-            save_every_n_pages=save_every_n_pages,
             backup_prefix=backup_prefix,
-            rotate_backups=rotate_backups,
         )
 
         if reviews:
             parsed = to_parsed(reviews, bank_name="gazprombank", product_type_override=cat.product_type)
             all_parsed.extend(parsed)
 
-            out_name = f"{cat.file_name}.json" if cat.file_name else re.sub(
-                r'[^a-zA-Z0-9_-]+', '_', f"{cat.product_type}_parsed.json"
+            out_name = f"{cat.file_name}.json" if cat.file_name else RE_UNSAFE_NAME.sub(
+                '_', f"{cat.product_type}_parsed.json"
             )
             out_path = os.path.join(RAW_DIR, out_name)
-            with open(out_path, "w", encoding="utf-8") as f:
-                json.dump([asdict(p) for p in parsed], f, ensure_ascii=False, indent=2)
-            print(f"[DONE] '{cat.product_type}': сохранено {len(parsed)} отзывов в {out_path}")
+            save_json(parsed, out_path)
+            logger.info("[DONE] '%s': сохранено %d отзывов в %s", cat.product_type, len(parsed), out_path)
         else:
-            print(f"[DONE] '{cat.product_type}': подходящих отзывов не найдено.")
+            logger.info("[DONE] '%s': подходящих отзывов не найдено.", cat.product_type)
 
     return all_parsed
 
@@ -492,12 +865,11 @@ if __name__ == "__main__":
         ),
     ]
 
-    all_parsed = crawl_categories(categories, delay_sec=2.5, save_every_n_pages=2, rotate_backups=True)
+    all_parsed = crawl_categories(categories, delay_sec=2.5)
 
     if all_parsed:
         all_out = os.path.join(RAW_DIR, "all_categories_parsed.json")
-        with open(all_out, "w", encoding="utf-8") as f:
-            json.dump([asdict(p) for p in all_parsed], f, ensure_ascii=False, indent=2)
-        print(f"[TOTAL DONE] Всего сохранено: {len(all_parsed)} отзывов в {all_out}")
+        save_json(all_parsed, all_out)
+        logger.info("[TOTAL DONE] Всего сохранено: %d отзывов в %s", len(all_parsed), all_out)
     else:
-        print("[TOTAL DONE] Отзывов не найдено ни в одной категории.")
+        logger.info("[TOTAL DONE] Отзывов не найдено ни в одной категории.")
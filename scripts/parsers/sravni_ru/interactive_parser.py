@@ -4,92 +4,490 @@
 Пользователь прокручивает страницу вручную, затем парсер собирает все отзывы с датами
 """
 
-import json
 import time
 import logging
+import random
 import re
-from datetime import datetime
+import sys
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Dict, Optional
 from urllib.parse import urlparse, parse_qs
 
+import lxml.html
+import numpy as np
+import orjson
+import requests
+from lxml import etree
+from lxml.cssselect import CSSSelector
+from requests.adapters import HTTPAdapter
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 
-from webdriver_setup import setup_chrome_driver
+from webdriver_setup import setup_chrome_driver, get_driver, get_user_agent
+
+try:
+    import ahocorasick  # pyahocorasick — опционально, стоп-фразы ищутся за один проход по тексту
+except ImportError:
+    ahocorasick = None
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Селекторы, появление которых означает, что нужный контент уже в DOM
+REVIEW_READY_SELECTOR = "div[class*='review-card_text__'], article, main"
+LISTING_READY_SELECTOR = "a[href*='/otzyvy/']"
+REVIEW_TEXT_SELECTOR = "div[class*='review-card_text__']"
+
+# Автопрокрутка ленты: пауза между прокрутками и сколько раз подряд высота
+# страницы не должна меняться, чтобы считать, что отзывы закончились
+AUTO_SCROLL_PAUSE = 0.3
+AUTO_SCROLL_STABLE_ROUNDS = 5
+AUTO_SCROLL_MAX_ROUNDS = 5000
+SCROLL_TO_BOTTOM_JS = "window.scrollTo(0, document.body.scrollHeight); return document.body.scrollHeight;"
+
+# Все ссылки на отзывы одним вызовом JS: href без якорей, дубликаты убираются прямо в браузере
+COLLECT_LINKS_JS = """
+return Array.from(new Set(
+    Array.from(document.querySelectorAll("a[href*='/otzyvy/']"), a => a.href.split('#')[0])
+));
+"""
+
+# Даты отзывов: месяцы в родительном падеже и шаблоны, компилируются один раз
+MONTHS_RU = {
+    'января': '01', 'февраля': '02', 'марта': '03', 'апреля': '04',
+    'мая': '05', 'июня': '06', 'июля': '07', 'августа': '08',
+    'сентября': '09', 'октября': '10', 'ноября': '11', 'декабря': '12'
+}
+RE_DATE_LONG = re.compile(r'(\d{1,2})\s+([а-я]+)\s+(\d{4})')  # "23 августа 2024"
+RE_DATE_DOT = re.compile(r'\d{1,2}\.\d{1,2}\.\d{4}')  # "23.08.2024"
+RE_DATE_ISO = re.compile(r'\d{4}-\d{2}-\d{2}')
+RE_MONTH_NAME = re.compile('|'.join(MONTHS_RU))
+
+# Диапазон дат отзывов, которые попадают в выгрузку
+DATE_RANGE_START = datetime(2024, 1, 1)
+DATE_RANGE_END = datetime(2025, 5, 31)
+DATE_RANGE_START_ISO = DATE_RANGE_START.strftime('%Y-%m-%d')
+
+# Даты отзывов считаются по московскому времени (UTC+3, без перехода на летнее время с 2014 года)
+MOSCOW_TZ = timezone(timedelta(hours=3))
+
+# Лента, отсортированная по дате, идет от новых к старым: после стольких отзывов подряд
+# старше начала диапазона остальные URL заведомо тоже старше, и этап 2 останавливается
+OLD_REVIEWS_STOP_STREAK = 10
+
+# Результат разбора отзыва, который отброшен как более старый, чем начало диапазона
+REVIEW_TOO_OLD = object()
+
+# Sravni.ru — приложение на Next.js: объект отзыва целиком лежит в JSON <script id="__NEXT_DATA__">
+STATE_ID_KEYS = ('id', 'reviewId')
+STATE_TEXT_KEYS = ('text', 'reviewText', 'body')
+STATE_RATING_KEYS = ('rating', 'rate', 'grade')
+STATE_DATE_KEYS = ('date', 'createdAt', 'created', 'publishDate', 'dateCreate')
+
+# Фразы навигации и служебных блоков: кандидат в текст отзыва с ними отбрасывается
+TEXT_BLACKLIST = (
+    'навигация', 'меню', 'войти', 'регистрация',
+    'подбор кредита', 'сравни в мобильном', 'к списку отзывов',
+    'другие отзывы', 'оставьте отзыв', 'рейтинг банков', 'комментарий'
+)
+
+# Словарь соответствий URL-путей и названий продуктов
+PRODUCT_MAP = {
+    'avtokredity': ('Автокредиты', 'avtokredity'),
+    'debetovye-karty': ('Дебетовые карты', 'debetovye_karty'),
+    'kreditnye-karty': ('Кредитные карты', 'kreditnye_karty'), 
+    'karty': ('Кредитные карты', 'kreditnye_karty'),
+    'kredity': ('Кредиты наличными', 'kredity'),
+    'vklady': ('Вклады', 'vklady'),
+    'ipoteka': ('Ипотека', 'ipoteka'),
+    'refinansirovanie-kreditov': ('Рефинансирование кредитов', 'refinansirovanie_kreditov'),
+    'refinansirovanie-ipoteki': ('Рефинансирование ипотеки', 'refinansirovanie_ipoteki'),
+    'obsluzhivanie': ('Обслуживание', 'obsluzhivanie'),
+    'distancionnoe-obsluzhivanie': ('Дистанционное обслуживание', 'distancionnoe_obsluzhivanie'),
+    'mobile-app': ('Мобильное приложение', 'mobile_app'),
+    'exchange': ('Обмен валют', 'exchange'),
+    'other-service': ('Прочие услуги', 'other_service'),
+    'acquiring': ('Acquiring', 'acquiring'),
+    'rko': ('RKO', 'rko'),
+    'remittance': ('Remittance', 'remittance'),
+    'conditions': ('Conditions', 'conditions')
+}
+
+# Путь открытой страницы и ее DOM одним вызовом (вместо current_url + page_source)
+PAGE_SNAPSHOT_JS = "return [location.pathname, document.documentElement.outerHTML];"
+
+# Таймаут загрузки страницы в браузере: зависшая страница не блокирует поток надолго
+PAGE_LOAD_TIMEOUT = 10
+
+# Таймаут HTTP-запроса страницы отзыва без браузера, секунд
+HTTP_TIMEOUT = 10
+
+# Текст элемента собирается как в браузере (innerText): строки разрываются только на границах
+# блочных тегов и <br>, внутри строчных тегов (<b>, <span>, <a>) пробелы не добавляются
+BLOCK_TAGS = frozenset((
+    'address', 'article', 'aside', 'blockquote', 'caption', 'dd', 'details', 'div', 'dl', 'dt',
+    'fieldset', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'header', 'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'summary', 'table',
+    'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'ul'
+))
+HIDDEN_TAGS = frozenset(('template',))
+RE_HIDDEN_STYLE = re.compile(r'display\s*:\s*none|visibility\s*:\s*hidden', re.IGNORECASE)
+RE_WHITESPACE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=None)
+def _css(selector: str) -> CSSSelector:
+    """Компилирует CSS-селектор в XPath один раз на весь прогон"""
+    return CSSSelector(selector)
+
+
+def _is_hidden(element) -> bool:
+    """Скрыт ли элемент атрибутом hidden или inline-стилем"""
+    return (element.tag in HIDDEN_TAGS or element.get('hidden') is not None
+            or RE_HIDDEN_STYLE.search(element.get('style', '')) is not None)
+
+
+def element_text(element) -> str:
+    """
+    Видимый текст элемента lxml в том виде, в каком его отдает WebElement.text
+
+    Текстовые узлы склеиваются без разделителей, перевод строки ставится только на
+    границах блочных тегов и <br>; скрытые элементы и комментарии пропускаются
+    (их хвостовой текст остается). Пробелы внутри строк схлопываются, пустые строки убираются.
+
+    Args:
+        element: Элемент lxml
+
+    Returns:
+        Текст с переводами строк между блоками
+    """
+    chunks = []
+    # (элемент, закрывающий ли это тег): обход без рекурсии, глубина DOM не ограничена
+    stack = [(element, False)]
+    while stack:
+        node, closing = stack.pop()
+        if closing:
+            if node.tag in BLOCK_TAGS:
+                chunks.append("\n")
+        elif isinstance(node.tag, str) and not _is_hidden(node):
+            if node.tag in BLOCK_TAGS or node.tag == 'br':
+                chunks.append("\n")
+            if node.text:
+                chunks.append(RE_WHITESPACE.sub(" ", node.text))
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(node))
+            continue
+        # Хвост после закрывающего тега (а также после комментария или скрытого элемента)
+        if node is not element and node.tail:
+            chunks.append(RE_WHITESPACE.sub(" ", node.tail))
+    lines = (" ".join(line.split()) for line in "".join(chunks).split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def parse_static_page(html: str, url: str) -> Optional["StaticElement"]:
+    """
+    Разбирает HTML страницы отзыва для извлечения без обращений к браузеру
+
+    Args:
+        html: HTML страницы (ответ HTTP-запроса или page_source из браузера)
+        url: URL страницы
+
+    Returns:
+        Корень документа в обертке StaticElement или None, если HTML не разбирается
+    """
+    try:
+        doc = lxml.html.fromstring(html)
+    except (etree.ParserError, ValueError):
+        return None
+    # Состояние Next.js забираем до того, как вырезать скрипты
+    state_script = doc.get_element_by_id("__NEXT_DATA__", None)
+    next_data = state_script.text if state_script is not None else None
+    # Текст скриптов и стилей не должен попадать в текст отзыва
+    etree.strip_elements(doc, "script", "style", "noscript", with_tail=False)
+    return StaticElement(doc, url, next_data)
+
+
+def rating_to_tonality(rating: Optional[int]) -> Optional[str]:
+    """Тональность отзыва по числу звёзд: 1–2 отрицательно, 3 нейтрально, 4–5 положительно"""
+    if rating in (1, 2):
+        return "отрицательно"
+    if rating == 3:
+        return "нейтрально"
+    if rating in (4, 5):
+        return "положительно"
+    return None
+
+
+def build_blacklist_automaton(phrases) -> Optional["ahocorasick.Automaton"]:
+    """
+    Собирает автомат Ахо-Корасик по стоп-фразам
+
+    Returns:
+        Automaton | None: None, если pyahocorasick не установлен
+    """
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for phrase in phrases:
+        automaton.add_word(phrase, phrase)
+    automaton.make_automaton()
+    return automaton
+
+
+BLACKLIST_AUTOMATON = build_blacklist_automaton(TEXT_BLACKLIST)
+
+
+def has_blacklisted_phrase(text_lower: str) -> bool:
+    """Есть ли в тексте (уже в нижнем регистре) хотя бы одна стоп-фраза"""
+    if BLACKLIST_AUTOMATON is not None:
+        return next(BLACKLIST_AUTOMATON.iter(text_lower), None) is not None
+    return any(phrase in text_lower for phrase in TEXT_BLACKLIST)
+
+
+def _fallback_product(path_parts: List[str]) -> tuple[str, str]:
+    """Продукт, которого нет в PRODUCT_MAP: название по части пути перед 'otzyvy'"""
+    if len(path_parts) >= 2:
+        potential_product = path_parts[-2]
+        return potential_product.replace('-', ' ').title(), potential_product.replace('-', '_')
+    return 'Неизвестный продукт', 'unknown_product'
+
+
+def review_id_from_url(review_url: str) -> str:
+    """ID отзыва на Sravni.ru — последний сегмент URL"""
+    return review_url.rstrip('/').split('/')[-1]
+
+
+def _first_value(node: dict, keys, kind):
+    """Первое значение нужного типа среди возможных имен поля"""
+    for key in keys:
+        value = node.get(key)
+        if isinstance(value, kind) and not isinstance(value, bool):
+            return value
+    return None
+
+
+def iso_to_moscow_date(value: str) -> str:
+    """
+    Дата YYYY-MM-DD по московскому времени из ISO-строки состояния Next.js
+
+    Отметка времени в UTC ("2024-08-23T22:30:00Z") относится к 24 августа по Москве,
+    поэтому дата берется после перевода в MOSCOW_TZ, а не срезом первых 10 символов.
+    Время без часового пояса считается московским.
+
+    Args:
+        value: Строка, начинающаяся с даты в формате YYYY-MM-DD
+
+    Returns:
+        Дата в формате YYYY-MM-DD
+    """
+    try:
+        # До Python 3.11 fromisoformat не понимает суффикс Z
+        moment = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    except ValueError:
+        return value[:10]
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(MOSCOW_TZ)
+    return moment.strftime('%Y-%m-%d')
+
+
+def find_review_in_state(state, review_id: str) -> Optional[dict]:
+    """
+    Ищет объект отзыва в состоянии Next.js
+
+    Args:
+        state: Разобранный JSON из __NEXT_DATA__
+        review_id: ID отзыва из URL
+
+    Returns:
+        Словарь отзыва (с нужным ID и текстом) или None
+    """
+    stack = [state]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if (any(str(node.get(key)) == review_id for key in STATE_ID_KEYS)
+                    and _first_value(node, STATE_TEXT_KEYS, str)):
+                return node
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return None
+
+
+class StaticElement:
+    """
+    Обертка над элементом lxml с интерфейсом WebElement из Selenium
+
+    Поддерживает ровно то, чем пользуется парсер (text, find_elements,
+    get_attribute), поэтому одна и та же логика извлечения работает и со
+    страницей в браузере, и с HTML, скачанным через requests.
+    """
+
+    def __init__(self, element, url: str = "", next_data: Optional[str] = None):
+        self._element = element
+        self.current_url = url
+        # Сырой JSON из <script id="__NEXT_DATA__">; скрипты из документа вырезаются
+        self.next_data = next_data
+
+    @property
+    def text(self) -> str:
+        return element_text(self._element)
+
+    def find_elements(self, by, selector: str) -> List["StaticElement"]:
+        return [StaticElement(el, self.current_url) for el in _css(selector)(self._element)]
+
+    def get_attribute(self, name: str) -> Optional[str]:
+        return self._element.get(name)
+
 class InteractiveGazprombankParser:
-    def __init__(self, headless: bool = False):
+    def __init__(self, headless: bool = False, max_workers: int = 4, auto_scroll: bool = True,
+                 resume: bool = True):
         self.headless = headless
+        # Дописывать к результатам прошлых прогонов и не парсить уже собранные отзывы повторно
+        self.resume = resume
+        # Прокручивать ленту программно; False — старый режим с ручной прокруткой
+        self.auto_scroll = auto_scroll
         self.driver = None
+        # Пул драйверов для этапа 2: по одному на поток, создаются лениво
+        self.max_workers = max_workers
+        self._local = threading.local()
+        self._worker_drivers = []
+        # Браузер этапа 1 (self.driver) уже занят одним из потоков этапа 2
+        self._stage1_driver_taken = False
+        self._drivers_lock = threading.Lock()
+        # Страницы отзывов сначала пробуем забрать обычным HTTP-запросом, браузер — только как запасной вариант
+        self.use_http = True
+        self.session = requests.Session()
+        self.session.headers.update({
+            "User-Agent": get_user_agent(),
+            "Accept-Language": "ru-RU,ru;q=0.9",
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(max_workers, 10))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         self.data_dir = Path("data/sravni_ru")
         self.data_dir.mkdir(parents=True, exist_ok=True)
 
     def _setup_driver(self):
-        """Настройка веб-драйвера"""
-        self.driver = setup_chrome_driver(headless=self.headless)
+        """Настройка веб-драйвера (браузер этапа 1 берется из пула webdriver_setup)"""
+        self.driver = get_driver("chrome", headless=self.headless)
+        self._configure_driver(self.driver)
         logger.info("Веб-драйвер успешно инициализирован")
 
+    def _configure_driver(self, driver):
+        """Ограничивает время загрузки страницы и отключает неявные ожидания (используются явные)"""
+        driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+        driver.implicitly_wait(0)
+
+    def _open(self, driver, url: str):
+        """Открывает URL; при превышении таймаута останавливает загрузку и работает с тем DOM, что есть"""
+        try:
+            driver.get(url)
+        except TimeoutException:
+            logger.debug(f"Таймаут загрузки {url}, останавливаем загрузку страницы")
+            driver.execute_script("window.stop();")
+
+    def _get_worker_driver(self):
+        """Возвращает драйвер текущего потока, создавая его при первом обращении"""
+        driver = getattr(self._local, 'driver', None)
+        if driver is None:
+            with self._drivers_lock:
+                # Браузер этапа 1 на этапе 2 простаивает: первый поток, которому понадобился
+                # браузер, забирает его вместо запуска еще одного процесса
+                if self.driver is not None and not self._stage1_driver_taken:
+                    driver = self.driver
+                    self._stage1_driver_taken = True
+            if driver is None:
+                driver = setup_chrome_driver(headless=True)
+                self._configure_driver(driver)
+                with self._drivers_lock:
+                    self._worker_drivers.append(driver)
+            self._local.driver = driver
+        return driver
+
+    def _wait_for_page(self, driver, ready_selector: str, timeout: float = 5):
+        """Ждет готовности документа и появления элемента вместо фиксированной паузы
+
+        Args:
+            driver: Экземпляр WebDriver
+            ready_selector: CSS-селектор элемента, наличие которого означает готовность контента
+            timeout: Максимальное время ожидания элемента, секунд
+        """
+        try:
+            WebDriverWait(driver, 8).until(
+                lambda d: d.execute_script("return document.readyState") == "complete"
+            )
+            WebDriverWait(driver, timeout).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, ready_selector))
+            )
+        except TimeoutException:
+            # Продолжаем с тем DOM, что успел загрузиться: дальше селекторы просто ничего не найдут
+            logger.debug(f"Не дождались элемента {ready_selector} на {driver.current_url}")
+
+    def _close_worker_drivers(self):
+        """Закрывает драйверы пула этапа 2"""
+        with self._drivers_lock:
+            # Браузер этапа 1 здесь не закрываем — это делает close()
+            drivers, self._worker_drivers = self._worker_drivers, []
+            self._stage1_driver_taken = False
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception as e:
+                logger.debug(f"Ошибка при закрытии драйвера пула: {e}")
+        # Потоки пула завершены, их thread-local ссылки больше не нужны
+        self._local = threading.local()
+
     def _extract_product_info(self, url: str) -> tuple[str, str]:
         """Извлекает информацию о продукте из URL"""
-        # Словарь соответствий URL-путей и названий продуктов
-        product_mapping = {
-            'avtokredity': ('Автокредиты', 'avtokredity'),
-            'debetovye-karty': ('Дебетовые карты', 'debetovye_karty'),
-            'kreditnye-karty': ('Кредитные карты', 'kreditnye_karty'), 
-            'karty': ('Кредитные карты', 'kreditnye_karty'),
-            'kredity': ('Кредиты наличными', 'kredity'),
-            'vklady': ('Вклады', 'vklady'),
-            'ipoteka': ('Ипотека', 'ipoteka'),
-            'refinansirovanie-kreditov': ('Рефинансирование кредитов', 'refinansirovanie_kreditov'),
-            'refinansirovanie-ipoteki': ('Рефинансирование ипотеки', 'refinansirovanie_ipoteki'),
-            'obsluzhivanie': ('Обслуживание', 'obsluzhivanie'),
-            'distancionnoe-obsluzhivanie': ('Дистанционное обслуживание', 'distancionnoe_obsluzhivanie'),
-            'mobile-app': ('Мобильное приложение', 'mobile_app'),
-            'exchange': ('Обмен валют', 'exchange'),
-            'other-service': ('Прочие услуги', 'other_service'),
-            'acquiring': ('Acquiring', 'acquiring'),
-            'rko': ('RKO', 'rko'),
-            'remittance': ('Remittance', 'remittance'),
-            'conditions': ('Conditions', 'conditions')
-        }
-        
         # Извлекаем путь из URL
         parsed = urlparse(url)
         path_parts = [part for part in parsed.path.split('/') if part]
         
         # Ищем соответствующий продукт в пути
-        for part in path_parts:
-            if part in product_mapping:
-                return product_mapping[part]
-        
-        # Если не найдено, пытаемся определить по последней части пути
-        if len(path_parts) >= 2:
-            potential_product = path_parts[-2]  # Берем часть перед 'otzyvy'
-            clean_product = potential_product.replace('-', '_')
-            product_name = potential_product.replace('-', ' ').title()
-            return (product_name, clean_product)
-        
-        # Fallback
-        return ('Неизвестный продукт', 'unknown_product')
-
-    def wait_for_manual_scroll(self, main_url: str) -> List[str]:
-        """Ожидает ручной прокрутки пользователем, затем собирает URL отзывов"""
-        self._setup_driver()
-        
-        logger.info(f"Загружаем страницу: {main_url}")
-        self.driver.get(main_url)
-        time.sleep(3)
+        return next((PRODUCT_MAP[part] for part in path_parts if part in PRODUCT_MAP), None) \
+            or _fallback_product(path_parts)
+
+    def _auto_scroll(self, driver):
+        """
+        Прокручивает ленту до конца, пока подгружаются новые отзывы
+
+        Каждая итерация — один вызов JS: прокрутка вниз и текущая высота документа.
+        Останавливаемся, когда высота не растет AUTO_SCROLL_STABLE_ROUNDS раз подряд.
+
+        Args:
+            driver: Экземпляр WebDriver с открытой лентой отзывов
+        """
+        print("🔄 Автоматическая прокрутка ленты отзывов...")
+        last_height = None
+        stable_rounds = 0
         
-        # Определяем продукт для отображения
-        product_name, _ = self._extract_product_info(main_url)
+        for _ in range(AUTO_SCROLL_MAX_ROUNDS):
+            height = driver.execute_script(SCROLL_TO_BOTTOM_JS)
+            if height == last_height:
+                stable_rounds += 1
+                if stable_rounds >= AUTO_SCROLL_STABLE_ROUNDS:
+                    break
+            else:
+                last_height = height
+                stable_rounds = 0
+                print(f"📍 Подгружено, высота страницы: {height}", end="\r")
+            time.sleep(AUTO_SCROLL_PAUSE)
+        else:
+            logger.warning(f"Прокрутка остановлена по лимиту {AUTO_SCROLL_MAX_ROUNDS} итераций")
         
+        print(f"\n✅ Лента прокручена до конца (высота {last_height})")
+
+    def wait_for_manual_scroll(self, product_name: str):
+        """Ожидает, пока пользователь вручную прокрутит ленту и оставит браузер в покое"""
         print("\n" + "="*80)
         print(f"🎮 ИНТЕРАКТИВНЫЙ РЕЖИМ ПАРСИНГА: {product_name.upper()}")
         print("="*80)
@@ -137,6 +535,21 @@ class InteractiveGazprombankParser:
                     print(f"⏳ Ожидание завершения прокрутки: {remaining:.1f} сек", end="\r")
             
             time.sleep(0.5)  # Проверяем каждые 0.5 секунд
+
+    def collect_review_urls(self, main_url: str) -> List[str]:
+        """Прокручивает ленту (автоматически или руками пользователя), затем собирает URL отзывов"""
+        self._setup_driver()
+        
+        logger.info(f"Загружаем страницу: {main_url}")
+        self._open(self.driver, main_url)
+        self._wait_for_page(self.driver, LISTING_READY_SELECTOR)
+        
+        if self.auto_scroll:
+            self._auto_scroll(self.driver)
+        else:
+            # Определяем продукт для отображения
+            product_name, _ = self._extract_product_info(main_url)
+            self.wait_for_manual_scroll(product_name)
         
         print("\n🔍 НАЧИНАЕМ СБОР URL ОТЗЫВОВ...")
         
@@ -144,38 +557,27 @@ class InteractiveGazprombankParser:
         review_links = []
         unique_review_ids = set()
         
-        selectors = [
-            "a[href*='/otzyvy/'][href*='/']",
-            "a[class*='review'][href*='/']", 
-            "a[href*='/bank/gazprombank/otzyvy/']"
-        ]
+        # Прежние селекторы "a[class*='review']" и "a[href*='/bank/gazprombank/otzyvy/']"
+        # после проверки на '/otzyvy/' давали подмножество этого же набора
+        try:
+            hrefs = self.driver.execute_script(COLLECT_LINKS_JS) or []
+        except Exception as e:
+            logger.warning(f"Ошибка при сборе ссылок на отзывы: {e}")
+            hrefs = []
+        logger.info(f"Найдено {len(hrefs)} уникальных ссылок с '/otzyvy/'")
         
-        for selector in selectors:
-            try:
-                elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                logger.info(f"Найдено {len(elements)} элементов с селектором: {selector}")
+        for href in hrefs:
+            clean_url = href.rstrip('/')
+            
+            # Проверяем, что это отзыв с числовым ID
+            url_parts = clean_url.split('/')
+            if len(url_parts) >= 2 and url_parts[-1].isdigit():
+                review_id = url_parts[-1]
                 
-                for element in elements:
-                    href = element.get_attribute('href')
-                    if href and '/otzyvy/' in href:
-                        # Очищаем URL от якорей
-                        clean_url = href.split('#')[0]
-                        if clean_url.endswith('/'):
-                            clean_url = clean_url[:-1]
-                        
-                        # Проверяем, что это отзыв с числовым ID
-                        url_parts = clean_url.split('/')
-                        if len(url_parts) >= 2 and url_parts[-1].isdigit():
-                            review_id = url_parts[-1]
-                            
-                            # Добавляем только уникальные отзывы
-                            if review_id not in unique_review_ids:
-                                unique_review_ids.add(review_id)
-                                review_links.append(clean_url + '/')
-                                
-            except Exception as e:
-                logger.warning(f"Ошибка при поиске с селектором {selector}: {e}")
-                continue
+                # Добавляем только уникальные отзывы
+                if review_id not in unique_review_ids:
+                    unique_review_ids.add(review_id)
+                    review_links.append(clean_url + '/')
         
         logger.info(f"🎉 Собрано {len(review_links)} уникальных URL отзывов")
         
@@ -194,21 +596,13 @@ class InteractiveGazprombankParser:
             # Убираем лишние пробелы
             date_text = date_text.strip()
             
-            # Словарь для замены месяцев на русском
-            months_ru = {
-                'января': '01', 'февраля': '02', 'марта': '03', 'апреля': '04',
-                'мая': '05', 'июня': '06', 'июля': '07', 'августа': '08',
-                'сентября': '09', 'октября': '10', 'ноября': '11', 'декабря': '12'
-            }
-            
-            # Паттерн для даты вида "23 августа 2024"
-            pattern = r'(\d{1,2})\s+([а-я]+)\s+(\d{4})'
-            match = re.search(pattern, date_text.lower())
+            # Дата вида "23 августа 2024"
+            match = RE_DATE_LONG.search(date_text.lower())
             
             if match:
                 day, month_name, year = match.groups()
-                if month_name in months_ru:
-                    month = months_ru[month_name]
+                if month_name in MONTHS_RU:
+                    month = MONTHS_RU[month_name]
                     # Форматируем в ISO формат
                     formatted_date = f"{year}-{month}-{day.zfill(2)}"
                     return formatted_date
@@ -227,22 +621,23 @@ class InteractiveGazprombankParser:
         
         try:
             # Если дата в формате YYYY-MM-DD
-            if re.match(r'\d{4}-\d{2}-\d{2}', date_str):
+            if RE_DATE_ISO.match(date_str):
                 date_obj = datetime.strptime(date_str, '%Y-%m-%d')
             else:
                 # Пытаемся распарсить другие форматы
                 return True  # Если не можем распарсить, включаем
-                
-            start_date = datetime(2024, 1, 1)
-            end_date = datetime(2025, 5, 31)
             
-            return start_date <= date_obj <= end_date
+            return DATE_RANGE_START <= date_obj <= DATE_RANGE_END
             
         except Exception as e:
             logger.warning(f"Не удалось проверить дату {date_str}: {e}")
             return True  # Если не можем проверить, включаем
 
-    def _extract_rating(self) -> tuple[Optional[int], Optional[str]]:
+    def _is_date_before_range(self, date_str: Optional[str]) -> bool:
+        """Проверяет, что дата в формате YYYY-MM-DD раньше начала диапазона"""
+        return bool(date_str) and RE_DATE_ISO.match(date_str) is not None and date_str[:10] < DATE_RANGE_START_ISO
+
+    def _extract_rating(self, page) -> tuple[Optional[int], Optional[str]]:
         """Извлекает рейтинг и тональность отзыва по количеству закрашенных звёзд"""
         try:
             # Ищем блок с рейтингом
@@ -256,7 +651,7 @@ class InteractiveGazprombankParser:
             
             for selector in rating_selectors:
                 try:
-                    rating_blocks = self.driver.find_elements(By.CSS_SELECTOR, selector)
+                    rating_blocks = page.find_elements(By.CSS_SELECTOR, selector)
                     for rating_block in rating_blocks:
                         # Ищем заполненные звёзды (с атрибутом fill="none" для пустых)
                         filled_stars = rating_block.find_elements(By.CSS_SELECTOR, "svg path[fill='currentColor']")
@@ -270,21 +665,12 @@ class InteractiveGazprombankParser:
                             # Проверяем, что общее количество звёзд разумное (обычно 5)
                             if 1 <= total_stars <= 5 and 0 <= filled_count <= total_stars:
                                 rating = filled_count
-                                
-                                # Определяем тональность
-                                if rating in [1, 2]:
-                                    tonality = "отрицательно"
-                                elif rating == 3:
-                                    tonality = "нейтрально"
-                                elif rating in [4, 5]:
-                                    tonality = "положительно"
-                                else:
-                                    tonality = None
-                                    
-                                logger.info(f"Найден рейтинг: {rating}/5 звёзд, тональность: {tonality}")
+                                tonality = rating_to_tonality(rating)
+                                logger.debug(f"Найден рейтинг: {rating}/5 звёзд, тональность: {tonality}")
                                 return rating, tonality
                             
-                        # Альтернативный способ: по классам звёзд
+                        # Альтернативный способ: по классам звёзд (нужен, например, когда
+                        # у каждой звезды несколько path и подсчет выше дал больше 5)
                         star_elements = rating_block.find_elements(By.CSS_SELECTOR, "svg, .star, [class*='star']")
                         if star_elements and len(star_elements) <= 5:
                             filled_count = 0
@@ -297,17 +683,8 @@ class InteractiveGazprombankParser:
                             
                             if 0 <= filled_count <= 5:
                                 rating = filled_count
-                                
-                                if rating in [1, 2]:
-                                    tonality = "отрицательно"
-                                elif rating == 3:
-                                    tonality = "нейтрально"
-                                elif rating in [4, 5]:
-                                    tonality = "положительно"
-                                else:
-                                    tonality = None
-                                    
-                                logger.info(f"Найден рейтинг (альтернативный способ): {rating}/5 звёзд, тональность: {tonality}")
+                                tonality = rating_to_tonality(rating)
+                                logger.debug(f"Найден рейтинг (альтернативный способ): {rating}/5 звёзд, тональность: {tonality}")
                                 return rating, tonality
                             
                 except Exception as e:
@@ -321,104 +698,208 @@ class InteractiveGazprombankParser:
             logger.error(f"Ошибка при извлечении рейтинга: {e}")
             return None, None
 
-    def parse_single_review(self, review_url: str, product_name: str) -> Optional[Dict[str, str]]:
-        """Парсит один отзыв по URL с извлечением даты, рейтинга и тональности"""
+    def parse_single_review(self, driver, review_url: str, product_name: str) -> Optional[Dict[str, str]]:
+        """Парсит один отзыв по URL с извлечением даты, рейтинга и тональности
+
+        Не использует self.driver: драйвер передается явно, чтобы метод
+        можно было вызывать параллельно из потоков пула
+        """
         try:
             logger.info(f"Парсим отзыв: {review_url}")
-            self.driver.get(review_url)
-            time.sleep(2)
+            self._open(driver, review_url)
+            self._wait_for_page(driver, REVIEW_READY_SELECTOR)
             
-            # Проверяем, что мы на правильной странице
-            current_url = self.driver.current_url
-            if review_url not in current_url and not current_url.endswith(review_url.split('/')[-2] + '/'):
-                logger.warning(f"Неожиданный URL: ожидался {review_url}, получен {current_url}")
-                return None
+            # Весь DOM забираем одним вызовом и дальше разбираем локально: вместо десятков
+            # find_elements/get_attribute через chromedriver на каждый отзыв — один запрос
+            pathname, html = driver.execute_script(PAGE_SNAPSHOT_JS)
             
-            # Ищем текст отзыва
-            text_selectors = [
-                "div[class*='review-card_text__']",
-                "div[class*='review-text']", 
-                "div[class*='content']",
-                "article",
-                "main",
-                "section"
-            ]
-            
-            # Ищем дату отзыва
-            date_selectors = [
-                "div[class*='h-color-D30__1aja02n__1w661f']",  # Основной селектор
-                "div[class*='h-color-D30']",
-                "div[class*='1aja02n']",
-                "div[class*='1w661f']",
-                "span[class*='date']",
-                "time",
-                "[datetime]"
-            ]
+            # Проверяем, что мы на правильной странице (не было редиректа)
+            if pathname.rstrip('/') != urlparse(review_url).path.rstrip('/'):
+                logger.warning(f"Неожиданный URL: ожидался {review_url}, получен путь {pathname}")
+                return None
             
-            full_text = None
-            review_date = None
+            page = parse_static_page(html, review_url)
+            if page is None:
+                logger.warning(f"Не удалось разобрать HTML отзыва {review_url}")
+                return None
+            return self._extract_review(page, review_url, product_name)
             
-            # Парсим текст отзыва
-            for selector in text_selectors:
-                try:
-                    elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                    if elements:
-                        # Берем только первый элемент
-                        elem = elements[0]
-                        text = elem.text.strip()
-                        
-                        if len(text) > 100:
-                            if not any(pattern in text.lower() for pattern in [
-                                'навигация', 'меню', 'войти', 'регистрация',
-                                'подбор кредита', 'сравни в мобильном', 'к списку отзывов',
-                                'другие отзывы', 'оставьте отзыв', 'рейтинг банков', 'комментарий'
-                            ]):
-                                full_text = text
-                                logger.info(f"Найден основной отзыв с селектором {selector}: {len(text)} символов")
-                                break
-                except Exception:
-                    continue
+        except Exception as e:
+            logger.error(f"Ошибка при парсинге отзыва {review_url}: {e}")
+            return None
+
+    def _fetch_static_page(self, review_url: str) -> Optional[StaticElement]:
+        """
+        Скачивает страницу отзыва без браузера
+
+        Args:
+            review_url: URL страницы отзыва
+
+        Returns:
+            Корень документа в обертке StaticElement или None, если нужен браузер
+            (ошибка/403/капча, редирект или текст отзыва не отрендерен на сервере)
+        """
+        try:
+            response = self.session.get(review_url, timeout=HTTP_TIMEOUT)
+        except requests.RequestException as e:
+            logger.debug(f"HTTP-запрос {review_url} не удался: {e}")
+            return None
+        
+        if response.status_code != 200 or response.history:
+            logger.debug(f"HTTP {response.status_code} для {review_url}, переходим на браузер")
+            return None
+        
+        # Sravni.ru отдает UTF-8; без явного декодирования lxml без meta charset прочитает байты как latin-1
+        page = parse_static_page(response.content.decode("utf-8", errors="replace"), review_url)
+        if page is None:
+            return None
+        if not page.next_data and not page.find_elements(By.CSS_SELECTOR, REVIEW_TEXT_SELECTOR):
+            # Например, страница-заглушка с капчей или контент рендерится только на клиенте
+            logger.debug(f"В HTML нет текста отзыва {review_url}, переходим на браузер")
+            return None
+        return page
+
+    def _review_from_next_data(self, page, review_id: str) -> Optional[tuple]:
+        """
+        Достает текст, дату и рейтинг отзыва из __NEXT_DATA__
+
+        Args:
+            page: StaticElement с HTML страницы отзыва
+            review_id: ID отзыва из URL
+
+        Returns:
+            (текст, дата, рейтинг) или None, если состояния нет или отзыв в нем не найден
+        """
+        try:
+            raw = page.next_data
+            if not raw:
+                return None
+            node = find_review_in_state(orjson.loads(raw), review_id)
+        except Exception as e:
+            logger.debug(f"Не удалось прочитать __NEXT_DATA__ отзыва {review_id}: {e}")
+            return None
+        if node is None:
+            return None
+        
+        text = _first_value(node, STATE_TEXT_KEYS, str)
+        if '<' in text:
+            # Текст может храниться с HTML-разметкой абзацев
+            text = element_text(lxml.html.fragment_fromstring(text, create_parent="div"))
+        
+        rating = _first_value(node, STATE_RATING_KEYS, (int, float))
+        rating = int(rating) if rating is not None and 1 <= rating <= 5 else None
+        
+        review_date = None
+        date_raw = _first_value(node, STATE_DATE_KEYS, str)
+        if date_raw:
+            review_date = iso_to_moscow_date(date_raw) if RE_DATE_ISO.match(date_raw) else self._parse_date(date_raw)
+        
+        logger.info(f"Отзыв {review_id} найден в __NEXT_DATA__")
+        return text, review_date, rating
+
+    def _find_review_text(self, page) -> Optional[str]:
+        """Ищет текст отзыва по CSS-селекторам"""
+        text_selectors = [
+            "div[class*='review-card_text__']",
+            "div[class*='review-text']", 
+            "div[class*='content']",
+            "article",
+            "main",
+            "section"
+        ]
+        
+        for selector in text_selectors:
+            try:
+                elements = page.find_elements(By.CSS_SELECTOR, selector)
+                if elements:
+                    # Берем только первый элемент
+                    elem = elements[0]
+                    text = elem.text.strip()
+                    
+                    if len(text) > 100:
+                        if not has_blacklisted_phrase(text.lower()):
+                            logger.info(f"Найден основной отзыв с селектором {selector}: {len(text)} символов")
+                            return text
+            except Exception:
+                continue
+        return None
+
+    def _find_review_date(self, page) -> Optional[str]:
+        """Ищет дату отзыва по CSS-селекторам и приводит ее к формату YYYY-MM-DD"""
+        date_selectors = [
+            "div[class*='h-color-D30__1aja02n__1w661f']",  # Основной селектор
+            "div[class*='h-color-D30']",
+            "div[class*='1aja02n']",
+            "div[class*='1w661f']",
+            "span[class*='date']",
+            "time",
+            "[datetime]"
+        ]
+        
+        for selector in date_selectors:
+            try:
+                elements = page.find_elements(By.CSS_SELECTOR, selector)
+                for elem in elements:
+                    date_text = elem.text.strip()
+                    date_lower = date_text.lower()
+                    # Проверяем, что это похоже на дату
+                    if date_text and (
+                        RE_DATE_LONG.search(date_lower) or  # "23 августа 2024"
+                        RE_DATE_DOT.search(date_text) or  # "23.08.2024"
+                        RE_MONTH_NAME.search(date_lower)
+                    ):
+                        review_date = self._parse_date(date_text)
+                        logger.info(f"Найдена дата отзыва с селектором {selector}: {date_text} -> {review_date}")
+                        return review_date
+            except Exception:
+                continue
+        return None
+
+    def _extract_review(self, page, review_url: str, product_name: str) -> Optional[Dict[str, str]]:
+        """
+        Извлекает текст, дату, рейтинг и тональность с уже загруженной страницы
+
+        Args:
+            page: StaticElement с HTML страницы отзыва (скачанной или взятой из браузера)
+            review_url: URL страницы отзыва
+            product_name: Название продукта
+
+        Returns:
+            Данные отзыва; REVIEW_TOO_OLD, если отзыв старше начала диапазона;
+            None, если отзыв не подходит по другим причинам
+        """
+        try:
+            # Извлекаем ID отзыва из URL
+            review_id = review_id_from_url(review_url)
             
-            # Парсим дату отзыва
-            for selector in date_selectors:
-                try:
-                    elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                    if elements:
-                        for elem in elements:
-                            date_text = elem.text.strip()
-                            # Проверяем, что это похоже на дату
-                            if date_text and (
-                                re.search(r'\d{1,2}\s+[а-я]+\s+\d{4}', date_text.lower()) or  # "23 августа 2024"
-                                re.search(r'\d{1,2}\.\d{1,2}\.\d{4}', date_text) or  # "23.08.2024"
-                                any(month in date_text.lower() for month in [
-                                    'января', 'февраля', 'марта', 'апреля', 'мая', 'июня',
-                                    'июля', 'августа', 'сентября', 'октября', 'ноября', 'декабря'
-                                ])
-                            ):
-                                review_date = self._parse_date(date_text)
-                                logger.info(f"Найдена дата отзыва с селектором {selector}: {date_text} -> {review_date}")
-                                break
-                    if review_date:
-                        break
-                except Exception:
-                    continue
+            # Сначала — готовый объект отзыва из состояния Next.js, CSS-селекторы — запасной путь
+            from_state = self._review_from_next_data(page, review_id)
+            if from_state is not None:
+                full_text, review_date, rating = from_state
+                # Поля, которых нет в состоянии, ищем на самой странице
+                if review_date is None:
+                    review_date = self._find_review_date(page)
+            else:
+                full_text = self._find_review_text(page)
+                review_date = self._find_review_date(page)
+                rating = None
             
             # Проверяем, попадает ли дата в нужный диапазон
             if not self._is_date_in_range(review_date):
                 logger.info(f"Отзыв с датой {review_date} не попадает в диапазон 01.01.2024 - 31.05.2025, пропускаем")
-                return None
+                return REVIEW_TOO_OLD if self._is_date_before_range(review_date) else None
             
             # Извлекаем рейтинг и тональность
-            rating, tonality = self._extract_rating()
+            if rating is not None:
+                tonality = rating_to_tonality(rating)
+            else:
+                rating, tonality = self._extract_rating(page)
             
             if full_text:
                 # Минимальная очистка текста
                 cleaned_text = ' '.join(full_text.split())
                 
                 if len(cleaned_text) > 50:
-                    # Извлекаем ID отзыва из URL
-                    review_id = review_url.rstrip('/').split('/')[-1]
-                    
                     review_data = {
                         "review_id": review_id,
                         "review_text": cleaned_text,
@@ -443,6 +924,48 @@ class InteractiveGazprombankParser:
             logger.error(f"Ошибка при парсинге отзыва {review_url}: {e}")
             return None
 
+    def _parse_in_worker(self, review_url: str, product_name: str) -> Optional[Dict[str, str]]:
+        """Парсит отзыв через HTTP, а при неудаче — драйвером текущего потока пула"""
+        page = self._fetch_static_page(review_url) if self.use_http else None
+        if page is not None:
+            logger.info(f"Парсим отзыв без браузера: {review_url}")
+            review_data = self._extract_review(page, review_url, product_name)
+        else:
+            review_data = self.parse_single_review(self._get_worker_driver(), review_url, product_name)
+        # Небольшая случайная пауза вместо фиксированной секунды между запросами
+        time.sleep(random.uniform(0.2, 0.6))
+        return review_data
+
+    def _load_existing_reviews(self, filename_base: str) -> List[Dict]:
+        """
+        Загружает отзывы прошлых прогонов
+
+        Args:
+            filename_base: Базовое имя файлов результата
+
+        Returns:
+            Отзывы из JSONL-журнала, а если его нет — из итогового JSON
+        """
+        jsonl_path = self.data_dir / f"{filename_base}.jsonl"
+        json_path = self.data_dir / f"{filename_base}.json"
+        reviews = []
+        try:
+            if jsonl_path.exists():
+                with open(jsonl_path, 'rb') as f:
+                    for line in f:
+                        try:
+                            reviews.append(orjson.loads(line))
+                        except orjson.JSONDecodeError:
+                            # Недописанная строка после аварийного завершения
+                            continue
+            elif json_path.exists():
+                with open(json_path, 'rb') as f:
+                    reviews = orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError) as e:
+            logger.warning(f"Не удалось загрузить ранее собранные отзывы: {e}")
+            return []
+        return reviews
+
     def parse_all_reviews(self, main_url: str) -> List[Dict]:
         """Парсит все отзывы со страницы с фильтрацией по датам и извлечением рейтингов"""
         # Определяем информацию о продукте
@@ -452,52 +975,94 @@ class InteractiveGazprombankParser:
         if 'obsluzhivanie' in main_url:
             filename_base = 'obsluzhivanie_rating'
         
-        # Этап 1: Ручная прокрутка и сбор URL
+        # Этап 1: Прокрутка ленты и сбор URL
         print("🔄 ЭТАП 1: СБОР URL ОТЗЫВОВ")
-        review_urls = self.wait_for_manual_scroll(main_url)
+        review_urls = self.collect_review_urls(main_url)
         
         if not review_urls:
             print("❌ Не найдено URL отзывов")
             return []
         
+        # Отзывы прошлых прогонов не парсим заново; review_id в файле перенумерован, поэтому сверяем по URL
+        all_reviews = self._load_existing_reviews(filename_base) if self.resume else []
+        seen_ids = {review_id_from_url(r['url']) for r in all_reviews if r.get('url')}
+        if seen_ids:
+            review_urls = [url for url in review_urls if review_id_from_url(url) not in seen_ids]
+            print(f"♻️  Уже собрано ранее: {len(all_reviews)} отзывов, новых URL: {len(review_urls)}")
+        existing_count = len(all_reviews)
+        
         # Этап 2: Парсинг каждого отзыва с фильтрацией
         print(f"\n🔄 ЭТАП 2: ПАРСИНГ {len(review_urls)} ОТЗЫВОВ С ФИЛЬТРАЦИЕЙ")
         print("📅 Фильтр дат: 01.01.2024 - 31.05.2025")
         print("⭐ Извлекаем рейтинги и тональность")
         
-        all_reviews = []
+        print(f"🧵 Параллельных браузеров: {self.max_workers}")
+        
         skipped_reviews = 0
+        # Ранняя остановка имеет смысл только для ленты, отсортированной по дате
+        stop_on_old = 'orderby=byDate' in main_url
+        old_streak = 0
         
-        for i, review_url in enumerate(review_urls, 1):
-            print(f"📝 Обрабатываем отзыв {i}/{len(review_urls)}")
-            
-            review_data = self.parse_single_review(review_url, product_name)
-            if review_data:
-                review_data["review_id"] = str(len(all_reviews) + 1)  # Перенумеровываем только принятые
-                all_reviews.append(review_data)
-            else:
-                skipped_reviews += 1
-            
-            # Пауза между запросами
-            time.sleep(1)
+        # Каждый принятый отзыв сразу дописывается строкой в JSONL: падение посреди прогона не теряет собранное
+        jsonl_path = self.data_dir / f"{filename_base}.jsonl"
+        jsonl_existed = jsonl_path.exists()
+        
+        # Каждый поток пула держит свой «прогретый» драйвер; map сохраняет
+        # исходный порядок URL, поэтому нумерация принятых отзывов не меняется
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor, \
+                    open(jsonl_path, 'ab' if self.resume else 'wb') as jsonl:
+                if all_reviews and not jsonl_existed:
+                    # Прошлые отзывы пришли из JSON — переносим их в журнал, чтобы он был полным
+                    jsonl.write(b"".join(orjson.dumps(r) + b"\n" for r in all_reviews))
+                results = executor.map(lambda url: self._parse_in_worker(url, product_name), review_urls)
+                for i, review_data in enumerate(results, 1):
+                    print(f"📝 Обработан отзыв {i}/{len(review_urls)}")
+                    
+                    if review_data is REVIEW_TOO_OLD:
+                        skipped_reviews += 1
+                        old_streak += 1
+                        if stop_on_old and old_streak >= OLD_REVIEWS_STOP_STREAK:
+                            remaining = len(review_urls) - i
+                            print(f"⏹️  {old_streak} отзывов подряд старше {DATE_RANGE_START_ISO} — "
+                                  f"остальные {remaining} URL не загружаем")
+                            skipped_reviews += remaining
+                            executor.shutdown(wait=False, cancel_futures=True)
+                            break
+                    elif review_data:
+                        old_streak = 0
+                        review_data["review_id"] = str(len(all_reviews) + 1)  # Перенумеровываем только принятые
+                        all_reviews.append(review_data)
+                        jsonl.write(orjson.dumps(review_data) + b"\n")
+                        jsonl.flush()
+                    else:
+                        skipped_reviews += 1
+        finally:
+            self._close_worker_drivers()
         
         print(f"\n📊 РЕЗУЛЬТАТЫ ФИЛЬТРАЦИИ:")
-        print(f"   ✅ Принято отзывов: {len(all_reviews)}")
+        accepted = len(all_reviews) - existing_count
+        print(f"   ✅ Принято отзывов: {accepted}")
         print(f"   ❌ Пропущено отзывов: {skipped_reviews}")
-        print(f"   📈 Процент принятых: {(len(all_reviews) / len(review_urls) * 100):.1f}%")
+        if review_urls:
+            print(f"   📈 Процент принятых: {(accepted / len(review_urls) * 100):.1f}%")
+        if existing_count:
+            print(f"   ♻️  Всего с учетом прошлых прогонов: {len(all_reviews)}")
+        print(f"   💾 Построчный журнал отзывов: {jsonl_path}")
         
         return all_reviews, filename_base
 
     def save_reviews(self, reviews: List[Dict], filename: str):
-        """Сохраняет отзывы в JSON файл"""
+        """Сохраняет отзывы в JSON файл (итоговый снимок; построчно они уже записаны в .jsonl)"""
         if not reviews:
             logger.warning("Нет отзывов для сохранения")
             return
         
         json_path = self.data_dir / f"{filename}.json"
         try:
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(reviews, f, ensure_ascii=False, indent=2)
+            # orjson пишет UTF-8 напрямую; OPT_INDENT_2 сохраняет прежнее оформление файла
+            with open(json_path, 'wb') as f:
+                f.write(orjson.dumps(reviews, option=orjson.OPT_INDENT_2))
             logger.info(f"Отзывы сохранены в JSON: {json_path}")
             return json_path
         except Exception as e:
@@ -506,9 +1071,71 @@ class InteractiveGazprombankParser:
 
     def close(self):
         """Закрывает веб-драйвер"""
+        self._close_worker_drivers()
+        self.session.close()
         if self.driver:
-            self.driver.quit()
-            logger.info("Веб-драйвер закрыт")
+            # Браузер этапа 1 принадлежит пулу webdriver_setup: он переиспользуется
+            # следующим парсером в этом процессе и закрывается при выходе
+            self.driver = None
+            logger.info("Веб-драйвер возвращен в пул")
+
+
+def print_review_stats(reviews: List[Dict]):
+    """
+    Печатает статистику по собранным отзывам
+
+    Распределения рейтингов и тональности собираются Counter'ом прямо из
+    генераторов, без ручного инкремента словаря на каждой строке.
+
+    Args:
+        reviews: Список отзывов
+    """
+    if not reviews:
+        return
+    
+    total = len(reviews)
+    lengths = np.fromiter((len(review['review_text']) for review in reviews), dtype=np.int32, count=total)
+    dates_found = sum(1 for review in reviews if review.get('review_date'))
+    sample_dates = [review['review_date'] for review in reviews[:5] if review.get('review_date')]
+    rating_distribution = Counter(
+        review['rating'] for review in reviews if review.get('rating') is not None
+    )
+    tonality_distribution = Counter(
+        review['tonality'] for review in reviews if review.get('tonality')
+    )
+    
+    ratings_found = sum(rating_distribution.values())
+    
+    # Собираем весь блок и выводим одной записью в stdout
+    out = [
+        f"\n📈 СТАТИСТИКА:",
+        f"   📏 Средняя длина отзыва: {lengths.mean():.0f} символов",
+        f"   📚 Самый длинный отзыв: {lengths.max()} символов",
+        f"   📄 Самый короткий отзыв: {lengths.min()} символов",
+        f"   📅 Найдено дат: {dates_found}/{total} ({dates_found / total * 100:.1f}%)",
+        f"   ⭐ Найдено рейтингов: {ratings_found}/{total} ({ratings_found / total * 100:.1f}%)",
+    ]
+    
+    # Показываем примеры найденных дат
+    if sample_dates:
+        out.append(f"   📅 Примеры дат: {', '.join(sample_dates[:3])}")
+    
+    # Распределение рейтингов
+    if rating_distribution:
+        out.append(f"\n⭐ РАСПРЕДЕЛЕНИЕ РЕЙТИНГОВ:")
+        for rating in sorted(rating_distribution):
+            count = rating_distribution[rating]
+            out.append(f"   {rating} звёзд: {count} отзывов ({count / total * 100:.1f}%)")
+    
+    # Распределение тональности
+    if tonality_distribution:
+        out.append(f"\n😊 РАСПРЕДЕЛЕНИЕ ТОНАЛЬНОСТИ:")
+        for tonality in ['отрицательно', 'нейтрально', 'положительно']:
+            count = tonality_distribution[tonality]
+            if count > 0:
+                out.append(f"   {tonality.capitalize()}: {count} отзывов ({count / total * 100:.1f}%)")
+    
+    sys.stdout.write("\n".join(out) + "\n")
 
 def main():
     """Основная функция для запуска парсера"""
@@ -533,10 +1160,10 @@ def main():
         url = f"{url}{separator}filterby=all"
         print(f"✅ Добавлен фильтр 'Все': {url}")
     
-    parser = InteractiveGazprombankParser(headless=False)  # Обязательно видимый браузер
+    parser = InteractiveGazprombankParser(headless=True)  # Прокрутка автоматическая, окно браузера не нужно
     
     try:
-        print("\n✅ Ручная прокрутка + автоматический сбор + парсинг дат")
+        print("\n✅ Автоматическая прокрутка + сбор URL + парсинг дат")
         print()
         
         # Парсинг всех отзывов
@@ -550,60 +1177,7 @@ def main():
             print(f"\n🎉 ПАРСИНГ ЗАВЕРШЕН УСПЕШНО!")
             print(f"📊 Собрано {len(reviews)} отзывов")
             
-            if reviews:
-                lengths = [len(r['review_text']) for r in reviews]
-                avg_length = sum(lengths) / len(lengths)
-                
-                # Анализ дат
-                dates_found = len([r for r in reviews if r.get('review_date')])
-                dates_percentage = (dates_found / len(reviews)) * 100
-                
-                # Анализ рейтингов
-                ratings_found = len([r for r in reviews if r.get('rating') is not None])
-                ratings_percentage = (ratings_found / len(reviews)) * 100
-                
-                # Распределение рейтингов
-                rating_distribution = {}
-                tonality_distribution = {}
-                
-                for review in reviews:
-                    rating = review.get('rating')
-                    tonality = review.get('tonality')
-                    
-                    if rating is not None:
-                        rating_distribution[rating] = rating_distribution.get(rating, 0) + 1
-                    
-                    if tonality:
-                        tonality_distribution[tonality] = tonality_distribution.get(tonality, 0) + 1
-                
-                print(f"\n📈 СТАТИСТИКА:")
-                print(f"   📏 Средняя длина отзыва: {avg_length:.0f} символов")
-                print(f"   📚 Самый длинный отзыв: {max(lengths)} символов")
-                print(f"   📄 Самый короткий отзыв: {min(lengths)} символов")
-                print(f"   📅 Найдено дат: {dates_found}/{len(reviews)} ({dates_percentage:.1f}%)")
-                print(f"   ⭐ Найдено рейтингов: {ratings_found}/{len(reviews)} ({ratings_percentage:.1f}%)")
-                
-                # Показываем примеры найденных дат
-                sample_dates = [r.get('review_date') for r in reviews[:5] if r.get('review_date')]
-                if sample_dates:
-                    print(f"   📅 Примеры дат: {', '.join(sample_dates[:3])}")
-                
-                # Распределение рейтингов
-                if rating_distribution:
-                    print(f"\n⭐ РАСПРЕДЕЛЕНИЕ РЕЙТИНГОВ:")
-                    for rating in sorted(rating_distribution.keys()):
-                        count = rating_distribution[rating]
-                        percentage = (count / len(reviews)) * 100
-                        print(f"   {rating} звёзд: {count} отзывов ({percentage:.1f}%)")
-                
-                # Распределение тональности
-                if tonality_distribution:
-                    print(f"\n😊 РАСПРЕДЕЛЕНИЕ ТОНАЛЬНОСТИ:")
-                    for tonality in ['отрицательно', 'нейтрально', 'положительно']:
-                        count = tonality_distribution.get(tonality, 0)
-                        if count > 0:
-                            percentage = (count / len(reviews)) * 100
-                            print(f"   {tonality.capitalize()}: {count} отзывов ({percentage:.1f}%)")
+            print_review_stats(reviews)
             
             if saved_path:
                 print(f"\n💾 Результаты сохранены в: {saved_path}")
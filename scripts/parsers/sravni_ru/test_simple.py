@@ -4,12 +4,12 @@
 """
 
 import time
-from webdriver_setup import setup_chrome_driver
+from webdriver_setup import get_driver, close_all_drivers
 
 def test_driver():
     try:
         print("🧪 Тестируем веб-драйвер...")
-        driver = setup_chrome_driver(headless=False)
+        driver = get_driver("chrome", headless=False)
         
         print("✅ Драйвер создан, открываем тестовую страницу...")
         driver.get("https://www.google.com")
@@ -18,7 +18,7 @@ def test_driver():
         title = driver.title
         print(f"📖 Заголовок страницы: {title}")
         
-        driver.quit()
+        close_all_drivers()
         print("✅ Драйвер успешно закрыт")
         return True
         
@@ -4,9 +4,16 @@
 Модуль для автоматической настройки веб-драйвера
 """
 
+import atexit
 import logging
+import os
 import platform
+import threading
+from functools import lru_cache
+from typing import Dict, Tuple
 from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.chrome.options import Options as ChromeOptions
 from selenium.webdriver.firefox.service import Service as FirefoxService
@@ -15,12 +22,71 @@ from webdriver_manager.chrome import ChromeDriverManager
 
 logger = logging.getLogger(__name__)
 
-def setup_firefox_driver(headless: bool = True) -> webdriver.Firefox:
+# Для парсинга текста не нужны стили, шрифты и счетчики аналитики — блокируем их загрузку
+BLOCKED_URL_PATTERNS = [
+    "*.css",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*mc.yandex.ru*",
+]
+
+# Размер пула HTTP-соединений клиента Selenium к chromedriver/geckodriver (по умолчанию urllib3 — 1)
+COMMAND_POOL_MAXSIZE = 20
+
+# Пул уже запущенных браузеров: (браузер, headless) -> драйвер
+_DRIVER_POOL: Dict[Tuple[str, bool], WebDriver] = {}
+_POOL_LOCK = threading.Lock()
+
+def widen_command_pool(driver: WebDriver, maxsize: int = COMMAND_POOL_MAXSIZE):
+    """
+    Увеличивает пул соединений, через который Selenium отправляет команды драйверу
+
+    В selenium 4.15 нет ClientConfig, поэтому размер задается в уже созданном
+    PoolManager: его таймауты, сертификаты и прокси сохраняются, а открытые пулы
+    пересоздаются при следующей команде.
+    
+    Args:
+        driver: Экземпляр WebDriver
+        maxsize: Число соединений на хост
+    """
+    conn = getattr(driver.command_executor, "_conn", None)
+    if conn is None:  # keep_alive=False — соединение создается на каждую команду
+        return
+    conn.connection_pool_kw["maxsize"] = maxsize
+    conn.clear()
+
+# Скрывает navigator.webdriver от скриптов страницы
+HIDE_WEBDRIVER_JS = "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
+
+# chromedriver, установленный через brew
+BREW_CHROMEDRIVER_PATH = '/opt/homebrew/bin/chromedriver'
+
+@lru_cache(maxsize=1)
+def _chromedriver_path() -> str:
+    """
+    Путь к chromedriver, вычисляется один раз на процесс
+
+    Returns:
+        Системный chromedriver из brew, если он есть; иначе — загруженный
+        webdriver-manager (его install() ходит в сеть и проверяет версию Chrome,
+        поэтому результат кэшируется)
+    """
+    if os.path.exists(BREW_CHROMEDRIVER_PATH):
+        return BREW_CHROMEDRIVER_PATH
+    path = ChromeDriverManager().install()
+    logger.info(f"chromedriver установлен через webdriver-manager: {path}")
+    return path
+
+def setup_firefox_driver(headless: bool = True, block_resources: bool = True) -> webdriver.Firefox:
     """
     Автоматическая настройка Firefox веб-драйвера
     
     Args:
         headless: Запуск в фоновом режиме
+        block_resources: Не загружать картинки и веб-шрифты
         
     Returns:
         Настроенный экземпляр Firefox WebDriver
@@ -28,6 +94,8 @@ def setup_firefox_driver(headless: bool = True) -> webdriver.Firefox:
     try:
         # Настройки Firefox
         firefox_options = FirefoxOptions()
+        # get() возвращает управление на DOMContentLoaded, не дожидаясь картинок и счетчиков
+        firefox_options.page_load_strategy = "eager"
         
         if headless:
             firefox_options.add_argument("--headless")
@@ -40,6 +108,10 @@ def setup_firefox_driver(headless: bool = True) -> webdriver.Firefox:
         firefox_options.set_preference("dom.webdriver.enabled", False)
         firefox_options.set_preference("useAutomationExtension", False)
         
+        if block_resources:
+            firefox_options.set_preference("permissions.default.image", 2)
+            firefox_options.set_preference("gfx.downloadable_fonts.enabled", False)
+        
         # User agent для имитации обычного браузера
         user_agent = get_user_agent()
         firefox_options.set_preference("general.useragent.override", user_agent)
@@ -49,6 +121,7 @@ def setup_firefox_driver(headless: bool = True) -> webdriver.Firefox:
         
         # Создание драйвера
         driver = webdriver.Firefox(service=service, options=firefox_options)
+        widen_command_pool(driver)
         
         logger.info("Firefox веб-драйвер успешно настроен")
         return driver
@@ -57,12 +130,13 @@ def setup_firefox_driver(headless: bool = True) -> webdriver.Firefox:
         logger.error(f"Ошибка при настройке Firefox веб-драйвера: {e}")
         raise
 
-def setup_chrome_driver(headless: bool = True) -> webdriver.Chrome:
+def setup_chrome_driver(headless: bool = True, block_resources: bool = True) -> webdriver.Chrome:
     """
     Автоматическая настройка Chrome веб-драйвера
     
     Args:
         headless: Запуск в фоновом режиме
+        block_resources: Не загружать картинки, стили, шрифты и аналитику
         
     Returns:
         Настроенный экземпляр Chrome WebDriver
@@ -70,13 +144,15 @@ def setup_chrome_driver(headless: bool = True) -> webdriver.Chrome:
     try:
         # Сначала пробуем Firefox как более стабильный вариант
         logger.info("Пытаемся использовать Firefox...")
-        return setup_firefox_driver(headless)
+        return setup_firefox_driver(headless, block_resources)
     except Exception as e:
         logger.warning(f"Firefox не доступен: {e}. Пробуем Chrome...")
         
     try:
         # Настройки Chrome
         chrome_options = ChromeOptions()
+        # get() возвращает управление на DOMContentLoaded, не дожидаясь картинок и счетчиков
+        chrome_options.page_load_strategy = "eager"
         
         if headless:
             chrome_options.add_argument("--headless")
@@ -90,18 +166,31 @@ def setup_chrome_driver(headless: bool = True) -> webdriver.Chrome:
         chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
         chrome_options.add_experimental_option('useAutomationExtension', False)
         
+        if block_resources:
+            chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+            chrome_options.add_experimental_option("prefs", {
+                "profile.managed_default_content_settings.images": 2,
+            })
+        
         # User agent для имитации обычного браузера
         user_agent = get_user_agent()
         chrome_options.add_argument(f"--user-agent={user_agent}")
         
-        # Используем системный chromedriver (установленный через brew)
-        service = ChromeService('/opt/homebrew/bin/chromedriver')
+        # Системный chromedriver (brew) или загруженный webdriver-manager; путь кэшируется
+        service = ChromeService(_chromedriver_path())
         
         # Создание драйвера
         driver = webdriver.Chrome(service=service, options=chrome_options)
+        widen_command_pool(driver)
         
-        # Дополнительные настройки для обхода детекции автоматизации
-        driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        # Дополнительные настройки для обхода детекции автоматизации: скрипт регистрируется
+        # через CDP один раз и выполняется до скриптов страницы на каждом новом документе
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": HIDE_WEBDRIVER_JS})
+        
+        if block_resources:
+            # Стили, шрифты и аналитику отсекаем на сетевом уровне через CDP
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
         
         logger.info("Chrome веб-драйвер успешно настроен")
         return driver
@@ -110,6 +199,56 @@ def setup_chrome_driver(headless: bool = True) -> webdriver.Chrome:
         logger.error(f"Ошибка при настройке Chrome веб-драйвера: {e}")
         raise
 
+def get_driver(browser: str = "chrome", headless: bool = True) -> WebDriver:
+    """
+    Возвращает браузер из пула, запуская его только при первом обращении
+
+    Перед повторной выдачей драйвер проверяется и очищается (cookies, about:blank);
+    если сессия умерла, браузер запускается заново.
+    
+    Args:
+        browser: "chrome" (setup_chrome_driver) или "firefox" (setup_firefox_driver)
+        headless: Запуск в фоновом режиме
+        
+    Returns:
+        Экземпляр WebDriver; закрывать его не нужно — это сделает close_all_drivers при выходе
+    """
+    key = (browser, headless)
+    with _POOL_LOCK:
+        driver = _DRIVER_POOL.get(key)
+        if driver is not None:
+            try:
+                driver.delete_all_cookies()
+                driver.get("about:blank")
+                logger.info(f"Переиспользуем запущенный браузер {browser} (headless={headless})")
+                return driver
+            except WebDriverException as e:
+                # В т.ч. InvalidSessionIdException: браузер закрыли или он упал
+                logger.warning(f"Сессия браузера {browser} недействительна, запускаем заново: {e}")
+                _quit_quietly(driver)
+        
+        factory = setup_firefox_driver if browser == "firefox" else setup_chrome_driver
+        driver = factory(headless)
+        _DRIVER_POOL[key] = driver
+        return driver
+
+def _quit_quietly(driver: WebDriver):
+    """Закрывает драйвер, игнорируя ошибки уже мертвой сессии"""
+    try:
+        driver.quit()
+    except Exception as e:
+        logger.debug(f"Ошибка при закрытии драйвера: {e}")
+
+def close_all_drivers():
+    """Закрывает все браузеры пула (вызывается автоматически при выходе)"""
+    with _POOL_LOCK:
+        drivers = list(_DRIVER_POOL.values())
+        _DRIVER_POOL.clear()
+    for driver in drivers:
+        _quit_quietly(driver)
+
+atexit.register(close_all_drivers)
+
 def get_user_agent() -> str:
     """Возвращает подходящий User-Agent в зависимости от ОС"""
     system = platform.system().lower()
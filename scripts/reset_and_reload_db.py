@@ -21,6 +21,12 @@ from app.utils.stats_builder import StatsBuilder
 from sqlalchemy import text
 import json
 
+# потоковый JSON-парсер (опционально): без него статистика считается через json.load
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
 # Настройка логирования
 logging.basicConfig(
     level=logging.INFO,
@@ -28,6 +34,33 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+def reset_public_schema(conn) -> bool:
+    """
+    Пересоздать схему public одной транзакцией (DROP SCHEMA ... CASCADE)
+    
+    Args:
+        conn: Соединение SQLAlchemy
+        
+    Returns:
+        bool: True, если схема пересоздана; False — если текущая схема не public
+        или не хватает прав (например, схемой владеет другая роль)
+    """
+    current_schema = conn.execute(text("SELECT current_schema()")).scalar()
+    if current_schema != 'public':
+        logger.warning(f"Текущая схема {current_schema}, а не public — удаляем таблицы по одной")
+        return False
+    
+    try:
+        conn.execute(text("DROP SCHEMA public CASCADE"))
+        conn.execute(text("CREATE SCHEMA public"))
+        conn.execute(text("GRANT ALL ON SCHEMA public TO current_user"))
+        conn.commit()
+        return True
+    except Exception as e:
+        conn.rollback()
+        logger.warning(f"Не удалось пересоздать схему public ({e}) — удаляем таблицы по одной")
+        return False
+
 def drop_all_tables():
     """Удалить все таблицы"""
     logger.info("Удаление всех таблиц...")
@@ -51,6 +84,11 @@ def drop_all_tables():
             for table in tables:
                 logger.info(f"  - {table}")
             
+            # Сбрасываем схему целиком: один DDL вместо DROP TABLE на каждую таблицу
+            if reset_public_schema(conn):
+                logger.info("✓ Схема public пересоздана, все таблицы удалены")
+                return
+            
             # Удаляем все таблицы с CASCADE
             for table in tables:
                 logger.info(f"Удаление таблицы {table}...")
@@ -80,9 +118,54 @@ def check_file_exists(file_path: str) -> bool:
     
     return True
 
+# События ijson, с которых начинается очередной элемент массива
+IJSON_ITEM_EVENTS = {'start_map', 'start_array', 'string', 'number', 'boolean', 'null'}
+
+def _count_file_records(file_path: str) -> dict:
+    """
+    Потоковый подсчёт записей без загрузки файла в память
+
+    Args:
+        file_path: Путь к JSON/JSONL файлу
+
+    Returns:
+        dict: Та же статистика, что и в get_file_stats
+    """
+    if Path(file_path).suffix.lower() in ('.jsonl', '.jl'):
+        with open(file_path, 'rb') as f:
+            count = sum(1 for line in f if line.strip())
+        return {'total_records': count, 'structure': 'jsonl'}
+
+    with open(file_path, 'rb') as f:
+        count = 0
+        keys = []
+        structure = 'unknown'
+        items_prefix = {'array': 'item', 'object': 'data.item', 'unknown': None}
+        for prefix, event, value in ijson.parse(f):
+            if prefix == '' and event == 'start_array':
+                structure = 'array'
+            elif prefix == '' and event == 'start_map':
+                structure = 'object'
+            elif prefix == '' and event == 'map_key':
+                keys.append(value)
+            elif event in IJSON_ITEM_EVENTS and prefix == items_prefix[structure]:
+                count += 1
+
+    if structure == 'object':
+        has_data = 'data' in keys
+        return {
+            'total_records': count if has_data else 0,
+            'structure': 'object_with_data' if has_data else 'object',
+            'keys': keys
+        }
+    return {'total_records': count, 'structure': structure}
+
 def get_file_stats(file_path: str) -> dict:
     """Получить статистику файла"""
     try:
+        if ijson is not None:
+            return _count_file_records(file_path)
+
         with open(file_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
         
@@ -141,7 +224,8 @@ def reset_and_reload_database(json_file_path: str, aspects_file_path: str = None
         logger.info("=" * 40)
         logger.info(f"Загрузка данных из {json_file_path}")
         
-        reviews_loaded = etl.load_reviews_from_json(json_file_path)
+        # после сброса таблицы пустые — грузим одним COPY вместо построчных INSERT
+        reviews_loaded = etl.load_reviews_from_json(json_file_path, use_copy=True)
         result = etl.stats
         
         logger.info(f"✓ Загружено продуктов: {result['products_created']}")
@@ -1,7 +1,18 @@
 # -*- coding: utf-8 -*-
+import csv
+from collections import defaultdict
+from multiprocessing import Pool
+
+import numpy as np
 import pandas as pd
 from sentiment_rules import score_clause
 
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv  # опционально: быстрый многопоточный парсер CSV
+except ImportError:
+    pa = None
+
 IN_PATH  = "data/interim/clauses_with_topics.csv"
 OUT_PATH = "data/interim/clauses_with_topics_sentiment.csv"
 
@@ -9,6 +20,25 @@ OUT_PATH = "data/interim/clauses_with_topics_sentiment.csv"
 W_CLAUSE = 0.70
 W_REVIEW = 0.30
 
+# Скоринг клауз по процессам: score_clause — чистый Python (regex), упирается в CPU
+N_WORKERS = None        # None → os.cpu_count()
+SCORE_CHUNKSIZE = 2048  # клауз на одну отправку в воркер
+
+# Скоры лежат в ~[-3, +3] с точностью до сотых — float64 тут избыточен.
+# Средние и смесь округляем до SCORE_DECIMALS знаков: иначе ошибка float32
+# (0.74999994 вместо 0.75) сдвигает значения через пороги бининга
+SCORE_DTYPE = np.float32
+SCORE_DECIMALS = 4
+
+# Вход читается порциями: строк за раз (C-парсер) / размер блока pyarrow (байт)
+READ_CHUNKSIZE = 200_000
+ARROW_BLOCK_SIZE = 8 << 20
+
+# Тип колонок не должен «плавать» между порциями: pyarrow выводит типы по первому
+# блоку, и колонка, пустая в нем (например, topics_pred), становится null и падает
+# на первом непустом значении дальше. Поэтому все колонки, кроме этих, читаются строками
+NUMERIC_COLUMNS = ("clause_id",)
+
 # Бининг в {-2, -1, 0, +1, +2}
 def bin_to_five(score: float) -> int:
     if score >= 1.5:
@@ -26,34 +56,101 @@ def text_label(v: int) -> str:
     if v < 0:  return "neg"
     return "neu"
 
+# Те же пороги для векторного бининга через np.digitize.
+# Отрицательные границы включительные (score <= -0.75 → -1), поэтому считаются с right=True
+NEG_EDGES = np.array([-1.5, -0.75])
+POS_EDGES = np.array([0.75, 1.5])
+BIN_VALUES = np.array([-2, -1, 0, 1, 2], dtype=np.int8)
+BIN_TEXTS  = np.array(["neg", "neg", "neu", "pos", "pos"])
+NEUTRAL_BIN = 2
+
+def bin_index(scores: np.ndarray) -> np.ndarray:
+    """Индекс бина 0..4 для каждого скора (NaN → нейтральный, как в bin_to_five)"""
+    idx = np.digitize(scores, NEG_EDGES, right=True) + np.digitize(scores, POS_EDGES)
+    idx[np.isnan(scores)] = NEUTRAL_BIN
+    return idx
+
+def iter_chunks(path: str):
+    """
+    Отдаёт входной CSV порциями в виде DataFrame.
+
+    С pyarrow файл читается потоково блоками по ARROW_BLOCK_SIZE байт
+    нативным парсером; без него — pd.read_csv(chunksize=READ_CHUNKSIZE).
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        header = next(csv.reader(f), [])
+    str_columns = [c for c in header if c not in NUMERIC_COLUMNS]
+    if pa is None:
+        yield from pd.read_csv(path, chunksize=READ_CHUNKSIZE, dtype={c: str for c in str_columns})
+        return
+    reader = pa_csv.open_csv(
+        path,
+        read_options=pa_csv.ReadOptions(block_size=ARROW_BLOCK_SIZE),
+        convert_options=pa_csv.ConvertOptions(column_types={c: pa.string() for c in str_columns}),
+    )
+    for batch in reader:
+        yield batch.to_pandas()
+
 def main():
-    df = pd.read_csv(IN_PATH)
-    required = {"review_id", "clause_id", "clause"}
-    miss = required - set(df.columns)
-    if miss:
-        raise ValueError(f"Missing required columns: {miss}")
+    """
+    Два потоковых прохода по входу, в памяти — только скоры и суммы по отзывам:
+      1) скорим клаузы и копим сумму/число скоров по review_id;
+      2) перечитываем файл, добавляем среднее по отзыву, смесь и бины,
+         дописываем результат порциями.
+    """
+    # 1) Локальный скор по каждой клаузе + суммы по отзывам
+    local_scores = []
+    sums = defaultdict(float)
+    counts = defaultdict(int)
+    with Pool(N_WORKERS) as pool:
+        for chunk in iter_chunks(IN_PATH):
+            if not local_scores:
+                required = {"review_id", "clause_id", "clause"}
+                miss = required - set(chunk.columns)
+                if miss:
+                    raise ValueError(f"Missing required columns: {miss}")
+
+            clauses = chunk["clause"].astype(str).tolist()
+            sent_local = np.fromiter(pool.imap(score_clause, clauses, chunksize=SCORE_CHUNKSIZE),
+                                     dtype=SCORE_DTYPE, count=len(clauses))
+            local_scores.append(sent_local)
 
-    # 1) Локальный скор по каждой клауза
-    df["sent_local"] = df["clause"].astype(str).map(score_clause)
+            # суммы копим в float64, чтобы не набирать ошибку float32 на длинных отзывах
+            agg = (pd.Series(sent_local, dtype="float64")
+                   .groupby(chunk["review_id"].to_numpy(), sort=False)
+                   .agg(["sum", "count"]))
+            for rid, total, n in zip(agg.index, agg["sum"], agg["count"]):
+                sums[rid] += total
+                counts[rid] += n
 
     # 2) Общий тон по отзыву = средний по клауза́м (можно медиану)
-    review_mean = df.groupby("review_id", sort=False)["sent_local"].mean().rename("sent_review")
-    df = df.merge(review_mean, on="review_id", how="left")
+    review_mean = {rid: sums[rid] / counts[rid] for rid in sums}
+    del sums, counts
+
+    first = True
+    for chunk, sent_local in zip(iter_chunks(IN_PATH), local_scores):
+        chunk["sent_local"] = sent_local
+        sent_review = chunk["review_id"].map(review_mean).round(SCORE_DECIMALS)
+        chunk["sent_review"] = sent_review.astype(SCORE_DTYPE)
 
-    # 3) Смешиваем: final = 0.7*local + 0.3*review
-    df["sentiment_score"] = W_CLAUSE * df["sent_local"] + W_REVIEW * df["sent_review"]
+        # 3) Смешиваем: final = 0.7*local + 0.3*review
+        score = (SCORE_DTYPE(W_CLAUSE) * chunk["sent_local"].to_numpy()
+                 + SCORE_DTYPE(W_REVIEW) * chunk["sent_review"].to_numpy()).round(SCORE_DECIMALS)
+        chunk["sentiment_score"] = score
 
-    # 4) В бины {-2..+2} и текстовую метку
-    df["sentiment_final"] = df["sentiment_score"].map(bin_to_five).astype(int)
-    df["sentiment_text"]  = df["sentiment_final"].map(text_label)
+        # 4) В бины {-2..+2} и текстовую метку (векторно, те же пороги, что в bin_to_five/text_label)
+        idx = bin_index(score)
+        chunk["sentiment_final"] = BIN_VALUES[idx]
+        chunk["sentiment_text"]  = BIN_TEXTS[idx]
 
-    # (опц.) если хочешь считать тон только когда есть тема:
-    # mask_has_topic = df["topics_pred"].fillna("").str.len() > 0
-    # df.loc[~mask_has_topic, ["sentiment_score", "sentiment_final", "sentiment_text"]] = [0.0, 0, "neu"]
+        # (опц.) если хочешь считать тон только когда есть тема:
+        # mask_has_topic = chunk["topics_pred"].fillna("").str.len() > 0
+        # chunk.loc[~mask_has_topic, ["sentiment_score", "sentiment_final", "sentiment_text"]] = [0.0, 0, "neu"]
 
-    # 5) Сохраняем
-    keep_cols = list(df.columns)  # ничего не теряем
-    df.to_csv(OUT_PATH, index=False, encoding="utf-8", columns=keep_cols)
+        # 5) Сохраняем (ничего не теряем: все входные колонки + скоры)
+        chunk.to_csv(OUT_PATH, index=False, encoding="utf-8",
+                     mode="w" if first else "a", header=first)
+        first = False
     print(f"[sentiment_predict_all] wrote → {OUT_PATH}")
 
 if __name__ == "__main__":
@@ -0,0 +1,129 @@
+"""
+Кэш разметки клауз не должен сохранять результаты, завершившиеся ошибкой Ollama
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("msgspec")
+pytest.importorskip("zstandard")
+
+import httpx
+import orjson
+import pandas as pd
+import zstandard
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts" / "labeling"))
+
+import label_clauses_batch
+import label_clauses_ollama
+from label_clauses_ollama import OllamaClauseLabeler
+from label_clauses_batch import BatchClauseProcessor
+
+
+def test_timeout_is_not_cached(tmp_path, monkeypatch):
+    # Ollama не нужна: проверку сервера пропускаем, каждый запрос завершается таймаутом
+    monkeypatch.setattr(OllamaClauseLabeler, "_check_ollama_availability", lambda self, host: None)
+
+    async def chat_timeout(self, *args, **kwargs):
+        raise httpx.TimeoutException("timeout")
+
+    monkeypatch.setattr(OllamaClauseLabeler, "_chat", chat_timeout)
+    # Кэш ответов LLM из reports/ в тесте не трогаем
+    monkeypatch.setattr(label_clauses_ollama, "LLMResponseCache", lambda path: None)
+
+    processor = BatchClauseProcessor(str(tmp_path / "clauses.csv"), str(tmp_path / "out"))
+
+    batch_df = pd.DataFrame({
+        "review_id": [1, 2],
+        "clause_id": [0, 0],
+        "clause": ["Кредитную карту одобрили быстро", "Ипотеку оформляли два месяца"],
+    })
+
+    async def run():
+        try:
+            return await processor.process_batch(batch_df, 0)
+        finally:
+            await processor.labeler.aclose()
+
+    _, llm_errors = asyncio.run(run())
+    assert llm_errors == 2
+
+    keys = [processor.cache_key(clause, review_id)
+            for clause, review_id in zip(batch_df["clause"], batch_df["review_id"])]
+    assert processor.cache.get_many(keys) == {}
+
+    # Батч с ошибками не сохраняется, иначе при возобновлении он считался бы готовым
+    assert not processor.batch_path(0).exists()
+
+    processor.cache.close()
+    processor.labeler.close()
+
+
+def test_merge_ignores_stale_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(OllamaClauseLabeler, "_check_ollama_availability", lambda self, host: None)
+    monkeypatch.setattr(label_clauses_ollama, "LLMResponseCache", lambda path: None)
+
+    processor = BatchClauseProcessor(str(tmp_path / "clauses.csv"), str(tmp_path / "out"))
+    current = {"review_id": 1, "clause_id": 0, "topics": [], "sentiments": []}
+    stale = {"review_id": 99, "clause_id": 0, "topics": [], "sentiments": []}
+    for batch_idx, record in ((0, current), (5, stale)):
+        with open(processor.batch_path(batch_idx), 'wb') as f:
+            f.write(zstandard.ZstdCompressor().compress(orjson.dumps(record) + b'\n'))
+
+    processor.merge_batches(1)
+
+    with open(processor.final_output, 'rb') as f:
+        assert orjson.loads(f.read()) == [current]
+
+    processor.cache.close()
+    processor.labeler.close()
+
+
+def test_failed_batch_is_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(OllamaClauseLabeler, "_check_ollama_availability", lambda self, host: None)
+    monkeypatch.setattr(label_clauses_ollama, "LLMResponseCache", lambda path: None)
+    # Статистику запуска пишем во временную папку, а не в reports/ репозитория
+    monkeypatch.setattr(label_clauses_batch, "__file__", str(tmp_path / "root" / "scripts" / "labeling" / "x.py"))
+
+    chat_calls = []
+    fail = True
+
+    async def chat(self, system_prompt, user_message, *args, **kwargs):
+        chat_calls.append(user_message)
+        if fail:
+            raise httpx.TimeoutException("timeout")
+        return '{"topics": [], "sentiments": []}'
+
+    monkeypatch.setattr(OllamaClauseLabeler, "_chat", chat)
+
+    input_file = tmp_path / "clauses.csv"
+    pd.DataFrame({
+        "review_id": [1, 2],
+        "clause_id": [0, 0],
+        "clause": ["Кредитную карту одобрили быстро", "Ипотеку оформляли два месяца"],
+    }).to_csv(input_file, index=False)
+
+    def run_all():
+        processor = BatchClauseProcessor(str(input_file), str(tmp_path / "out"), micro_batch_size=1)
+        try:
+            processor.process_all_clauses(batch_size=10, max_clauses=None, concurrency=1)
+        finally:
+            processor.cache.close()
+            processor.labeler.close()
+        return processor
+
+    processor = run_all()
+    assert chat_calls
+    assert not processor.final_output.exists()
+
+    chat_calls.clear()
+    fail = False
+    processor = run_all()
+    # Клаузы, упавшие в первом запуске, снова ушли в LLM и попали в итоговый файл
+    assert len(chat_calls) == 2
+    with open(processor.final_output, 'rb') as f:
+        assert [result["review_id"] for result in orjson.loads(f.read())] == [1, 2]
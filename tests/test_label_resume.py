@@ -0,0 +1,74 @@
+"""
+Возобновление разметки клауз по потоковому файлу результатов
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("msgspec")
+
+import httpx
+import orjson
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts" / "labeling"))
+
+import label_clauses_ollama
+from label_clauses_ollama import OllamaClauseLabeler, drop_labeled_clauses, load_labeled_clause_ids
+
+
+def write_jsonl(path: Path, records) -> None:
+    with open(path, 'wb') as f:
+        for record in records:
+            f.write(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE))
+
+
+def test_resume_skips_only_labeled_pairs(tmp_path):
+    results_path = tmp_path / "clauses_labeled.jsonl"
+    labeled = {"review_id": 1, "clause_id": 0, "topics": ["Кредиты"], "sentiments": ["положительно"]}
+    failed = {"review_id": 2, "clause_id": 1, "topics": [], "sentiments": [], "llm_error": True}
+    write_jsonl(results_path, [labeled, failed])
+
+    done_keys = load_labeled_clause_ids(results_path)
+    assert done_keys == {("1", 0)}
+    # Строка с ошибкой убрана из файла, чтобы повторная разметка не задвоила клаузу
+    assert [orjson.loads(line) for line in results_path.read_bytes().splitlines()] == [labeled]
+
+    clauses_df = pd.DataFrame({
+        "review_id": [1, 1, 2, 2, 3],
+        "clause_id": [0, 1, 0, 1, 0],
+        "clause": ["a", "b", "c", "d", "e"],
+    })
+    pending_df = drop_labeled_clauses(clauses_df, done_keys)
+    # clause_id 0 встречается и в других отзывах — они не считаются размеченными
+    assert list(zip(pending_df["review_id"], pending_df["clause_id"])) == [(1, 1), (2, 0), (2, 1), (3, 0)]
+
+
+def test_failed_clauses_are_not_written(tmp_path, monkeypatch):
+    monkeypatch.setattr(OllamaClauseLabeler, "_check_ollama_availability", lambda self, host: None)
+    monkeypatch.setattr(label_clauses_ollama, "LLMResponseCache", lambda path: None)
+
+    async def chat_timeout(self, *args, **kwargs):
+        raise httpx.TimeoutException("timeout")
+
+    monkeypatch.setattr(OllamaClauseLabeler, "_chat", chat_timeout)
+
+    clauses_df = pd.DataFrame({
+        "review_id": [1, 2],
+        "clause_id": [0, 0],
+        "clause": ["Кредитную карту одобрили быстро", "Ипотеку оформляли два месяца"],
+    })
+    results_path = tmp_path / "clauses_labeled.jsonl"
+    labeler = OllamaClauseLabeler()
+    try:
+        with open(results_path, 'ab') as results_file:
+            results = labeler.process_clauses_batch(clauses_df, start_idx=0, batch_size=len(clauses_df),
+                                                    results_file=results_file)
+    finally:
+        labeler.close()
+
+    assert all(result["llm_error"] for result in results)
+    assert results_path.read_bytes() == b''
+    assert len(drop_labeled_clauses(clauses_df, load_labeled_clause_ids(results_path))) == 2